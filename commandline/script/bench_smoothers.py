@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+距離 vs PER 曲線の平滑化バックエンドの計測
+
+機能:
+- smoothers.py の各バックエンドで同じ点を平滑化し、処理時間と、従来の出力
+  (statsmodels の lowess(frac=0.2)) との差 (格子点での最大・平均の絶対誤差) を表示する。
+- 点は interference_2pan_plot_results.py --table で保存した結果表 (全行の distance と up_per / down_per)、
+  または PER に似た合成データ (--points で点数を指定, 複数可)。
+- lowess は点数の2乗に近い時間がかかるので、--max-exact を超える点数では計測せず、差も表示しない
+  (statsmodels が無い環境でも同様)。
+
+実行方法 (commandline/ で実行):
+    python3 ./script/bench_smoothers.py --points 1200 10000 100000
+    python3 ./script/bench_smoothers.py --table sweep_table.npz
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+try:
+    import statsmodels.nonparametric.smoothers_lowess  # noqa: F401  (読み込み時間を計測に含めない)
+    HAVE_STATSMODELS = True
+except ImportError:
+    HAVE_STATSMODELS = False
+
+from smoothers import DEFAULT_FRAC, SMOOTHERS, smooth
+from sweep_table import SweepTable
+
+
+def synthetic_per(num_points, rng):
+    """距離とともに下がる PER に、0 に張り付いた点とばらつきを足した合成データ"""
+    distance = rng.uniform(400.0, 2400.0, num_points)
+    mean = 0.6 * np.exp(-(distance - 400.0) / 600.0)
+    per = np.clip(mean + 0.15 * rng.standard_normal(num_points), 0.0, 1.0)
+    return distance, np.round(per, 3)
+
+
+def time_smoother(method, x, y, frac, repeat):
+    """repeat 回平滑化して最短時間と格子点での値を返す"""
+    best = None
+    values = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        grid, values = smooth(x, y, method, frac)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, grid, values
+
+
+def bench(name, x, y, frac, repeat, max_exact):
+    print(f"{name} ({len(x)} points)")
+    reference = None
+    if HAVE_STATSMODELS and len(x) <= max_exact:
+        sec, _, reference = time_smoother("lowess", x, y, frac, repeat)
+        print(f"  {'lowess':<14} {sec:9.3f} s")
+    for method in SMOOTHERS:
+        if method == "lowess":
+            continue
+        sec, _, values = time_smoother(method, x, y, frac, repeat)
+        line = f"  {method:<14} {sec:9.3f} s"
+        if reference is not None:
+            diff = np.abs(values - reference)
+            line += f"   max |diff| {np.nanmax(diff):.2e}   mean |diff| {np.nanmean(diff):.2e}"
+        print(line)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="距離 vs PER 曲線の平滑化バックエンドの計測")
+    parser.add_argument("--table", help="interference_2pan_plot_results.py --table で保存した結果表 (.npz)")
+    parser.add_argument("--points", type=int, nargs="+", default=[1200, 10000, 100000],
+                        help="合成データの点数 (--table を指定しない場合)")
+    parser.add_argument("--frac", type=float, default=DEFAULT_FRAC, help="LOWESS の平滑化パラメータ")
+    parser.add_argument("--repeat", type=int, default=1, help="各バックエンドの計測回数 (最短時間を表示)")
+    parser.add_argument("--max-exact", type=int, default=20000, help="lowess を計測する最大の点数")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.table:
+        try:
+            table = SweepTable.load(args.table)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Error: cannot read {args.table}: {e}", file=sys.stderr)
+            sys.exit(1)
+        for column in ("up_per", "down_per"):
+            bench(f"{args.table} {column}", table["distance"], table[column], args.frac, args.repeat, args.max_exact)
+        return
+
+    rng = np.random.default_rng(0)
+    for num_points in args.points:
+        x, y = synthetic_per(num_points, rng)
+        bench("synthetic", x, y, args.frac, args.repeat, args.max_exact)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+トレース解析のスループット計測
+
+機能:
+- 指定したトレース (圧縮済みを含む) を、ブロック単位の NumPy 実装 (parse_trace_counters) と
+  行ごとに split する従来の実装 (parse_trace_counters_lines) の両方で解析し、
+  処理時間・スループット [MB/s]・速度比を表示する。両者のカウンタが一致することも確認する。
+  従来の実装は計測区間を考えずに全行を数えるので、この比較は計測区間なし (window=None) で行う。
+- --workers を指定すると、1つのトレースをバイト範囲に分けて並列に数える
+  parse_trace_counters_parallel も計測する (コア数に対するスケーリングの確認用)。
+  並列版は .statconfig の計測区間だけを数えるので、計測区間を指定した parse_trace_counters と比べる。
+- --config / --target-mb を指定すると、fake_sim.py で指定した大きさ (数GB など) の
+  合成トレースを生成してから計測する。
+
+実行方法 (commandline/ で実行):
+    python3 ./script/bench_trace_parser.py interf_coord_dist_1200m_off_load0.1_seed0.trace
+    python3 ./script/bench_trace_parser.py --config interf_coord_dist_1200m_off_load0.1_seed0.config --target-mb 4000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from trace_io import find_trace
+from trace_parser import (COUNTER_NAMES, PER_COUNTER_NAMES, measure_window, parse_trace_counters, parse_trace_counters_lines,
+                          parse_trace_counters_parallel)
+
+# --- Configuration ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CMD_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))  # commandline/
+FAKE_SIM = os.path.join(SCRIPT_DIR, "fake_sim.py")
+DEFAULT_NUM_DEVICE = 12  # interference_2pan_plot_results.py の NUM_DEV_GROUP
+
+
+def generate_trace(config_path, target_mb):
+    """
+    fake_sim.py で合成トレースを生成し、そのパスを返す。
+    .config の中のパスは commandline/ からの相対パスなので (sharded レイアウトを含む)、
+    run_simulations.py と同じく commandline/ で実行し、トレースのパスも commandline/ から解決する
+    """
+    subprocess.run([sys.executable, FAKE_SIM, os.path.relpath(config_path, CMD_DIR), "--target-mb", str(target_mb)],
+                   cwd=CMD_DIR, check=True)
+    with open(config_path, "r") as f:
+        for line in f:
+            if line.strip().startswith("trace-output-file"):
+                return os.path.join(CMD_DIR, line.split("=", 1)[1].strip())
+    raise RuntimeError(f"trace-output-file not found in {config_path}")
+
+
+def time_parser(parse, trace_path, num_device, repeat):
+    """repeat 回解析して最短時間とカウンタを返す"""
+    best = None
+    counters = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        counters = parse(trace_path, num_device)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, counters
+
+
+def bench(trace_path, num_device, repeat, skip_legacy, workers):
+    """計測して、比較したカウンタがすべて一致すれば True を返す (並列版・従来の実装の判定は別々に表示する)"""
+    actual = find_trace(trace_path) or trace_path
+    size_mb = os.path.getsize(actual) / 1e6
+    print(f"{actual} ({size_mb:.1f} MB)")
+    window = measure_window(trace_path)
+
+    def parse_windowed(path, num_device):
+        return parse_trace_counters(path, num_device, window=window)
+    windowed_sec, windowed = time_parser(parse_windowed, trace_path, num_device, repeat)
+    print(f"  {'parse_trace_counters':<28} {windowed_sec:8.2f} s {size_mb / windowed_sec:9.1f} MB/s (window {window})")
+    ok = True
+    if workers > 1:
+        # 並列版も計測区間だけを数えるので、同じ区間のシングルプロセスの結果と比べる
+        def parse_parallel(path, num_device):
+            return parse_trace_counters_parallel(path, num_device, workers)
+        parallel_sec, parallel = time_parser(parse_parallel, trace_path, num_device, repeat)
+        print(f"  {f'parallel ({workers} workers)':<28} {parallel_sec:8.2f} s {size_mb / parallel_sec:9.1f} MB/s")
+        same = all(np.array_equal(windowed[name], parallel[name]) for name in COUNTER_NAMES)
+        print(f"  speedup x{windowed_sec / parallel_sec:.2f}, parallel counters {'match' if same else 'DIFFER'}")
+        ok &= same
+    if skip_legacy:
+        return ok
+    # 従来の実装は全行を数えるので、計測区間なし (window=None) の結果と比べる
+    fast_sec, fast = time_parser(parse_trace_counters, trace_path, num_device, repeat)
+    print(f"  {'parse_trace_counters (all)':<28} {fast_sec:8.2f} s {size_mb / fast_sec:9.1f} MB/s")
+    legacy_sec, legacy = time_parser(parse_trace_counters_lines, trace_path, num_device, repeat)
+    print(f"  {'parse_trace_counters_lines':<28} {legacy_sec:8.2f} s {size_mb / legacy_sec:9.1f} MB/s")
+    same = all(np.array_equal(fast[name], legacy[name]) for name in PER_COUNTER_NAMES)
+    print(f"  speedup x{legacy_sec / fast_sec:.2f}, legacy counters {'match' if same else 'DIFFER'}")
+    ok &= same
+    return ok
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="トレース解析のスループット計測")
+    parser.add_argument("traces", nargs="*", help="計測するトレース (.trace / .trace.gz など)")
+    parser.add_argument("--config", help="合成トレースを生成する .config (fake_sim.py を使う)")
+    parser.add_argument("--target-mb", type=float, default=2000.0, help="生成する合成トレースの大きさ [MB]")
+    parser.add_argument("--num-device", type=int, default=DEFAULT_NUM_DEVICE, help="PAN あたりのデバイス数")
+    parser.add_argument("--repeat", type=int, default=1, help="各実装の計測回数 (最短時間を表示)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="2以上なら、トレースをバイト範囲に分けて並列に数える場合も計測する")
+    parser.add_argument("--skip-legacy", action="store_true", help="従来の実装を計測しない (大きなトレース向け)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    traces = list(args.traces)
+    if args.config:
+        traces.append(generate_trace(args.config, args.target_mb))
+    if not traces:
+        print("Error: no trace given (pass trace files or --config)", file=sys.stderr)
+        sys.exit(1)
+
+    ok = True
+    for trace_path in traces:
+        if find_trace(trace_path) is None:
+            print(f"Error: trace not found: {trace_path}", file=sys.stderr)
+            sys.exit(1)
+        ok &= bench(trace_path, args.num_device, args.repeat, args.skip_legacy, args.workers)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+距離 vs PER 曲線のブートストラップ信頼帯 (シード単位の再標本化)
+
+機能:
+- 同じシードの点 (1ラン分のデバイス) をまとめて復元抽出する、クラスタ単位のブートストラップ。
+- 曲線は固定の格子点で評価する局所線形回帰 (tricube 重み, 帯域は LOWESS の frac と同じ近傍点数から決める)。
+  描く曲線 (ロバスト LOWESS) と同じ推定量にするため、各点に全点での LOWESS のロバスト化の bisquare 重み
+  (smoothers.binned_lowess_fit の最後の反復の重み) を掛ける。重みは反復ごとに求め直さない (1段階の近似)。
+  局所線形回帰は重み付きの和 (Σw, Σw·dx, Σw·dx², Σw·y, Σw·dx·y) だけで決まるので、
+  シードごとの和 (シード × 格子点 × 和の種類) を1回だけ求めれば、
+  各反復の和は「反復 × シード」の抽出回数の行列との積 (matmul) でまとめて得られる。
+- 反復はブロックに分けてプロセスプールで並列に計算する。点数 N, 格子点 G, シード数 S, 反復 B に対して
+  O(N·G + B·S·G) なので、10万点・数千反復でも数秒で終わる (反復ごとに lowess を呼ぶ必要がない)。
+- 帯は各格子点での反復の分位点 (パーセンタイル法)。近傍に点が無い格子点は NaN。
+"""
+
+import concurrent.futures
+import warnings
+
+import numpy as np
+
+from smoothers import binned_lowess_fit, grid_for, span_bandwidth
+
+DEFAULT_LEVEL = 0.95
+CHUNK_POINTS = 4096  # シードごとの和を求めるときに一度に扱う点数
+BLOCK_REPLICATES = 256  # 1タスクで計算する反復の数
+
+
+def seed_sums(x, ys, groups, num_groups, grid, bandwidth, weights=None):
+    """
+    シードごとの重み付きの和 (シード, 格子点, 5, 曲線数)。
+    和の種類: Σw, Σw·dx, Σw·dx², Σw·y, Σw·dx·y。w は tricube 重み × 点の重み (weights: (点数, 曲線数), 省略時は 1)、
+    dx は点 - 格子点
+    """
+    x = np.asarray(x, dtype=float)
+    ys = np.asarray(ys, dtype=float).reshape(len(x), -1)
+    num_curves = ys.shape[1]
+    weights = np.ones(ys.shape) if weights is None else np.asarray(weights, dtype=float).reshape(ys.shape)
+    sums = np.zeros((num_groups, len(grid) * 5 * num_curves))
+    # シードの順に並べ、チャンク内の連続する同じシードの点を reduceat で足す
+    order = np.argsort(groups, kind="stable")
+    for start in range(0, len(x), CHUNK_POINTS):
+        rows = order[start:start + CHUNK_POINTS]
+        dx = x[rows, None] - grid[None, :]
+        u = np.clip(np.abs(dx) / bandwidth[None, :], 0.0, 1.0)
+        w = ((1.0 - u ** 3) ** 3)[:, :, None] * weights[rows, None, :]  # (点, 格子点, 曲線)
+        wy = w * ys[rows, None, :]
+        dx = dx[:, :, None]
+        terms = np.stack([w, w * dx, w * dx * dx, wy, wy * dx], axis=2)
+        chunk_groups, first = np.unique(groups[rows], return_index=True)
+        sums[chunk_groups] += np.add.reduceat(terms.reshape(len(rows), -1), first, axis=0)
+    return sums.reshape(num_groups, len(grid), 5, num_curves)
+
+
+def local_linear(sums):
+    """重み付きの和 (..., 格子点, 5, 曲線数) から格子点での局所線形回帰の値 (..., 格子点, 曲線数)"""
+    s0, s1, s2, t0, t1 = (sums[..., i, :] for i in range(5))
+    det = s0 * s2 - s1 * s1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fit = (s2 * t0 - s1 * t1) / det
+        # 近傍の点がほぼ1か所に集まっている格子点は局所平均
+        fit = np.where(det > 1e-12 * np.maximum(s0 * s2, 1e-300), fit, t0 / s0)
+    return fit
+
+
+def robust_weights(x, ys, grid, frac):
+    """
+    全点での LOWESS のロバスト化の重み (点数, 曲線数)。
+    描く曲線 (smoothers.binned_lowess_fit) の最後の反復の bisquare 重みをそのまま使う
+    """
+    ys = np.asarray(ys, dtype=float).reshape(len(x), -1)
+    return np.column_stack([binned_lowess_fit(x, ys[:, j], grid, frac)[1] for j in range(ys.shape[1])])
+
+
+def _replicate_fits(sums, num_groups, replicates, rng_seed):
+    """replicates 回の再標本化 (シードの抽出回数の行列) と、それぞれの格子点での値"""
+    rng = np.random.default_rng(rng_seed)
+    counts = rng.multinomial(num_groups, np.full(num_groups, 1.0 / num_groups), size=replicates)
+    flat = sums.reshape(num_groups, -1)
+    return local_linear((counts @ flat).reshape((replicates,) + sums.shape[1:]))
+
+
+def bootstrap_bands(x, ys, seeds, frac=0.2, replicates=1000, level=DEFAULT_LEVEL, grid=None,
+                    workers=1, rng_seed=0, robust=True):
+    """
+    シード単位のブートストラップによる信頼帯。
+    robust なら全点の LOWESS のロバスト化の重み (robust_weights) を掛けた局所線形回帰を再標本化する
+    (描く曲線 lowess / binned_lowess と同じ推定量。False なら重みなしの局所線形回帰)。
+    x: 距離, ys: 曲線の値 (点数,) または (点数, 曲線数), seeds: 点ごとのシード
+    戻り値: (格子点, 下限, 上限)。下限・上限は (格子点, 曲線数)
+    """
+    x = np.asarray(x, dtype=float)
+    ys = np.asarray(ys, dtype=float).reshape(len(x), -1)
+    grid = grid_for(x) if grid is None else np.asarray(grid, dtype=float)
+    if len(x) < 2 or replicates <= 0:
+        nan = np.full((len(grid), ys.shape[1]), np.nan)
+        return grid, nan, nan.copy()
+
+    _, groups = np.unique(np.asarray(seeds), return_inverse=True)
+    num_groups = int(groups.max()) + 1
+    bandwidth = span_bandwidth(x, grid, frac)
+    weights = robust_weights(x, ys, grid, frac) if robust else None
+    sums = seed_sums(x, ys, groups, num_groups, grid, bandwidth, weights)
+
+    # 反復をブロックに分け、ブロックごとに別の乱数列で計算する (並列数によらず同じ結果)
+    num_blocks = -(-replicates // BLOCK_REPLICATES)
+    sizes = np.full(num_blocks, BLOCK_REPLICATES)
+    sizes[-1] = replicates - BLOCK_REPLICATES * (num_blocks - 1)
+    block_seeds = np.random.SeedSequence(rng_seed).spawn(num_blocks)
+    if workers > 1 and num_blocks > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            fits = list(pool.map(_replicate_fits, [sums] * num_blocks, [num_groups] * num_blocks,
+                                 sizes.tolist(), block_seeds))
+    else:
+        fits = [_replicate_fits(sums, num_groups, size, seed) for size, seed in zip(sizes.tolist(), block_seeds)]
+    fits = np.concatenate(fits)
+
+    tail = (1.0 - level) / 2.0 * 100.0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # 全反復が NaN の格子点
+        lower, upper = np.nanpercentile(fits, [tail, 100.0 - tail], axis=0)
+    return grid, lower, upper
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+ランカタログ (スイープ点 → 入出力ファイルのパス) の読み書き
+
+機能:
+- 設定生成時に、各スイープ点 (pattern, distance, offered_load, seed) のラベルを記録する。
+  .config / .pos / .statconfig / .stat / .trace のパスはラベルから導出する。
+- 生成スクリプト・実行スクリプト・解析スクリプトはカタログを引くだけでファイルを特定でき、
+  ディレクトリの走査や部分文字列によるフィルタが不要になる。
+- カタログが無い古い (フラットな) 出力ディレクトリは from_directory で一度だけ走査して構築する。
+
+ラベルは commandline/ からの相対パス (拡張子なし) で、シミュレータもこのディレクトリで実行する。
+"""
+
+import glob
+import json
+import os
+import re
+
+CATALOG_VERSION = 1
+CATALOG_FILE = "run_catalog.json"
+
+# 種別 → 拡張子
+FILE_KINDS = {
+    "config": ".config",
+    "pos": ".pos",
+    "statconfig": ".statconfig",
+    "stat": ".stat",
+    "trace": ".trace",
+    "counters": ".counters.npz",
+}
+
+LAYOUTS = ("flat", "sharded")
+
+# ファイル名からスイープ点を復元する (カタログが無い場合のみ使用)
+CONFIG_NAME_RE = re.compile(
+    r"^(?P<pattern>.+)_coord_dist_(?P<distance>[\d.]+)m_off_load(?P<load>[\d.]+)_seed(?P<seed>\d+)\.config$"
+)
+
+
+def run_label(layout, pattern, distance_m, offered_load, prefix):
+    """
+    スイープ点のラベル (commandline/ からの相対パス, 拡張子なし) を返す。
+    sharded: runs/<pattern>/dist<d>m/load<load>/<prefix>
+    """
+    if layout == "flat":
+        return prefix
+    if layout == "sharded":
+        return "/".join(["runs", pattern, f"dist{distance_m}m", f"load{offered_load}", prefix])
+    raise ValueError(f"Unknown layout: {layout} (expected one of {LAYOUTS})")
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() and "." not in text else value
+
+
+def _key(pattern, distance_m, offered_load, seed):
+    return (pattern, float(distance_m), round(float(offered_load), 6), int(seed))
+
+
+class RunCatalog:
+    """スイープ点 → ラベルの対応表。(pattern, distance, load, seed) と (pattern, load) で引ける。"""
+
+    def __init__(self, root, entries=()):
+        self.root = root
+        self._entries = {}
+        self._by_load = {}
+        self._by_label = {}
+        for entry in entries:
+            self.add(**entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def add(self, pattern, distance_m, offered_load, seed, label, num_nodes=None, placement=None):
+        key = _key(pattern, distance_m, offered_load, seed)
+        entry = {
+            "pattern": pattern,
+            "distance_m": distance_m,
+            "offered_load": offered_load,
+            "seed": int(seed),
+            "label": label,
+            "num_nodes": num_nodes,
+            "placement": placement,  # ノード配置の入力のハッシュ (interference_2pan_config.hash_placement)
+        }
+        if key not in self._entries:
+            self._by_load.setdefault(key[0:1] + key[2:3], []).append(key)
+        self._entries[key] = entry
+        self._by_label[label] = entry
+        return entry
+
+    def update(self, other):
+        for entry in other:
+            self.add(**entry)
+
+    def lookup(self, pattern, distance_m, offered_load, seed):
+        """スイープ点のエントリを返す (無ければ None)"""
+        return self._entries.get(_key(pattern, distance_m, offered_load, seed))
+
+    def by_label(self, label):
+        """ラベルからエントリを返す (無ければ None)"""
+        return self._by_label.get(label)
+
+    def select(self, pattern=None, offered_load=None, distance_m=None):
+        """条件に合うエントリを seed 順で返す"""
+        if pattern is not None and offered_load is not None:
+            keys = self._by_load.get((pattern, round(float(offered_load), 6)), [])
+            entries = [self._entries[k] for k in keys]
+        else:
+            entries = [
+                e for e in self._entries.values()
+                if (pattern is None or e["pattern"] == pattern)
+                and (offered_load is None or round(float(e["offered_load"]), 6) == round(float(offered_load), 6))
+            ]
+        if distance_m is not None:
+            entries = [e for e in entries if float(e["distance_m"]) == float(distance_m)]
+        return sorted(entries, key=lambda e: (float(e["distance_m"]), e["seed"]))
+
+    def patterns(self):
+        """カタログにあるパターン名 (登録順)"""
+        return list(dict.fromkeys(e["pattern"] for e in self._entries.values()))
+
+    def offered_loads(self, pattern=None):
+        """カタログにある offered load (昇順)。pattern を指定するとそのパターンのものだけ"""
+        return sorted({key[2] for key in self._entries if pattern is None or key[0] == pattern})
+
+    def path(self, entry, kind):
+        """エントリの種別ごとのファイルパス"""
+        return os.path.join(self.root, entry["label"] + FILE_KINDS[kind])
+
+    def save(self, path):
+        """一時ファイル経由で原子的に書き出す"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CATALOG_VERSION, "entries": list(self._entries.values())}, f, indent=1)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_file(cls, root, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(root, data.get("entries", []))
+
+    @classmethod
+    def from_directory(cls, root):
+        """カタログの無い出力ディレクトリを走査して .config からカタログを組み立てる"""
+        catalog = cls(root)
+        for dirpath, dirnames, filenames in os.walk(root):
+            # 生成物以外のディレクトリは走査しない
+            rel_dir = os.path.relpath(dirpath, root)
+            if rel_dir == ".":
+                dirnames[:] = [d for d in dirnames if d == "runs"]
+            for filename in filenames:
+                match = CONFIG_NAME_RE.match(filename)
+                if not match:
+                    continue
+                label = os.path.splitext(filename)[0]
+                if rel_dir != ".":
+                    label = "/".join([rel_dir.replace(os.sep, "/"), label])
+                catalog.add(
+                    pattern=match.group("pattern"),
+                    distance_m=_number(match.group("distance")),
+                    offered_load=float(match.group("load")),
+                    seed=int(match.group("seed")),
+                    label=label,
+                )
+        return catalog
+
+
+def catalog_files(root):
+    """root にあるカタログファイル (スイープ範囲ごとのものを含む)"""
+    base, ext = os.path.splitext(CATALOG_FILE)
+    return sorted(glob.glob(os.path.join(root, base + "*" + ext)))
+
+
+def load_catalog(root):
+    """
+    root のカタログを読み込む。スイープ範囲ごとに分かれたカタログはまとめて1つにする。
+    カタログが無ければディレクトリを一度だけ走査して組み立てる。
+    """
+    paths = catalog_files(root)
+    if not paths:
+        return RunCatalog.from_directory(root)
+    catalog = RunCatalog(root)
+    for path in paths:
+        catalog.update(RunCatalog.from_file(root, path))
+    return catalog
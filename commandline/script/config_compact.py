@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+.config のレンジ圧縮モジュール
+
+機能:
+- ノード単位の行 ([id] key = value, [id;instance] key = value) を
+  (インスタンス名, パラメータ名) ごとにまとめ、値が同じで ID が連続するノードを
+  [a-b] 形式の1行に圧縮する。
+- 値がノードごとに異なるパラメータだけがノード単位の行として残る。
+- ノード単位でない行 (グローバル設定, [1-N] のレンジ行, チャネル定義など) はそのまま残す。
+
+インターフェース名がノードIDを含む場合 (driot_3_1 など) は行をまとめられないため、
+テンプレートの shared_interface_names を有効にして全ノード共通の名前 (driot_<k>) にしておくこと。
+
+注意:
+- [a-b;instance] のレンジ行と全ノード共通のインターフェース名 driot_<k> は fake_sim.py で読めることしか
+  確かめておらず、実際の ./sim (Scenargie) が圧縮前の .config と同じ設定として読むかは照合していない。
+  実機で使う前に、圧縮前の .config で実行した結果と比べること。
+"""
+
+import re
+
+# [id] key = value / [id;instance] key = value
+NODE_LINE_RE = re.compile(r"^\[(\d+)(?:;([^\]]+))?\]\s*(\S+)\s*=\s*(.*?)\s*$")
+# ノードごとのセクションコメント (#Instance driot_3, #Component ... (Interface): driot_3_1 など)
+NODE_COMMENT_RE = re.compile(r"^#(Instance driot_\d+|Component .*\((Node|Interface)\)|Component (driot)?cbr\d+ App)")
+
+
+def _id_runs(node_values):
+    """(node_id, value) の列を、ID が連続し値が同じ区間 (first, last, value) に分割する"""
+    runs = []
+    for node_id, value in sorted(node_values):
+        if runs and runs[-1][1] + 1 == node_id and runs[-1][2] == value:
+            runs[-1][1] = node_id
+        else:
+            runs.append([node_id, node_id, value])
+    return runs
+
+
+def _scope(first, last, instance):
+    ids = str(first) if first == last else f"{first}-{last}"
+    return f"[{ids};{instance}]" if instance else f"[{ids}]"
+
+
+def compact_config(text):
+    """描画済みの .config 本文をレンジ圧縮して返す"""
+    head = []
+    tail = []
+    groups = {}  # (instance, key) -> [(node_id, value), ...] (初出順を保持)
+    for line in text.splitlines():
+        match = NODE_LINE_RE.match(line)
+        if match:
+            node_id, instance, key, value = match.groups()
+            groups.setdefault((instance, key), []).append((int(node_id), value))
+            continue
+        if NODE_COMMENT_RE.match(line):
+            continue
+        # 最初のノード行より前は head、後ろは tail に置く
+        (tail if groups else head).append(line)
+
+    body = ["#Per-node parameters (range-compressed)"]
+    for (instance, key), node_values in groups.items():
+        for first, last, value in _id_runs(node_values):
+            body.append(f"{_scope(first, last, instance)} {key} = {value}")
+
+    lines = head + body + [""] + [line for line in tail if line.strip()]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+解析済みカウンタの永続キャッシュ (trace_counters_cache.npz)
+
+機能:
+- 解析スクリプトが求めたランごとのカウンタ (trace_parser.COUNTER_NAMES × ノードID) を、
+  列ごとの配列 (パス, 大きさ, 更新時刻, 計測区間, カウンタ) として1つの .npz にまとめて保存する。
+- エントリはトレースのパス・大きさ・更新時刻 (ns)・.statconfig の計測区間とパーサのバージョンで引く。
+  トレースが書き換わる・圧縮される・計測区間やパーサが変わると一致しなくなり、自動的に解析し直す。
+- プロットの見た目だけを変えて描き直すときは、トレースを読まずにキャッシュから集計できる。
+"""
+
+import os
+
+import numpy as np
+
+from trace_io import find_trace
+from trace_parser import COUNTER_NAMES, PARSER_VERSION, counters_path, measure_window, window_from_array, window_to_array
+
+CACHE_FILE = "trace_counters_cache.npz"
+CACHE_VERSION = 2
+
+
+def fingerprint(trace_path):
+    """
+    ランの結果ファイルの指紋 (実際のパス, 大きさ, 更新時刻 [ns])。
+    トレース (圧縮済みを含む) が無ければカウンタファイルを見る。どちらも無ければ None。
+    """
+    actual = find_trace(trace_path) or counters_path(trace_path)
+    try:
+        st = os.stat(actual)
+    except OSError:
+        return None
+    return actual, st.st_size, st.st_mtime_ns
+
+
+class CountersCache:
+    """トレースのパス → カウンタ配列 (len(COUNTER_NAMES), 3 * num_device) のキャッシュ"""
+
+    def __init__(self, path, num_device):
+        self.path = path
+        self.num_device = num_device
+        self._entries = {}
+        self._dirty = False
+        self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        try:
+            with np.load(self.path) as data:
+                if (int(data["cache_version"]) != CACHE_VERSION or int(data["parser_version"]) != PARSER_VERSION
+                        or int(data["num_device"]) != self.num_device
+                        or tuple(data["counter_names"].tolist()) != COUNTER_NAMES):
+                    return
+                counters = data["counters"]
+                windows = [window_from_array(window) for window in data["window"]]
+                keys = zip(data["actual_path"].tolist(), data["size"].tolist(), data["mtime_ns"].tolist(), windows)
+                for i, (trace_path, key) in enumerate(zip(data["trace_path"].tolist(), keys)):
+                    self._entries[trace_path] = (key, counters[i])
+        except (OSError, KeyError, ValueError):
+            self._entries = {}
+
+    def key(self, trace_path):
+        """エントリを引く鍵 (指紋 + .statconfig の計測区間)。結果ファイルが無ければ None"""
+        key = fingerprint(trace_path)
+        return None if key is None else key + (measure_window(trace_path),)
+
+    def get(self, trace_path, key):
+        """指紋 key が一致すればカウンタ配列、しなければ None"""
+        entry = self._entries.get(trace_path)
+        if entry is None or entry[0] != key:
+            return None
+        return entry[1]
+
+    def put(self, trace_path, key, counters):
+        self._entries[trace_path] = (key, np.asarray(counters, dtype=np.int64))
+        self._dirty = True
+
+    def save(self):
+        """変更があれば一時ファイル経由で原子的に書き出す"""
+        if not self._dirty:
+            return
+        trace_paths = sorted(self._entries)
+        keys = [self._entries[p][0] for p in trace_paths]
+        size = 3 * self.num_device
+        counters = (np.stack([self._entries[p][1] for p in trace_paths]) if trace_paths
+                    else np.zeros((0, len(COUNTER_NAMES), size), dtype=np.int64))
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            cache_version=CACHE_VERSION,
+            parser_version=PARSER_VERSION,
+            num_device=self.num_device,
+            counter_names=np.asarray(COUNTER_NAMES),
+            trace_path=np.asarray(trace_paths, dtype=str),
+            actual_path=np.asarray([k[0] for k in keys], dtype=str),
+            size=np.asarray([k[1] for k in keys], dtype=np.int64),
+            mtime_ns=np.asarray([k[2] for k in keys], dtype=np.int64),
+            window=np.asarray([window_to_array(k[3]) for k in keys]).reshape(len(keys), 2),
+            counters=counters,
+        )
+        os.replace(tmp_path, self.path)
+        self._dirty = False
@@ -0,0 +1,37 @@
+#!/bin/bash
+
+# sbatch のローカル用の代用品 (sbatch_jobs.sh の動作確認用)
+# --array=A-B[%N] と --cpus-per-task=C を解釈し、各配列タスクをバックグラウンドで実行して待つ。
+# それ以外のオプションは無視する。--array が無い場合はスクリプトを1回だけ実行する。
+#
+# 使い方: SBATCH=./script/fake_sbatch.sh CMD_DIR=$(pwd) bash ./script/sbatch_jobs.sh
+
+ARRAY=""
+CPUS=1
+while [[ "$1" == -* ]]; do
+  case "$1" in
+    --array=*) ARRAY="${1#--array=}" ;;
+    --cpus-per-task=*) CPUS="${1#--cpus-per-task=}" ;;
+  esac
+  shift
+done
+SCRIPT=$1
+shift
+
+JOB_ID=$$
+echo "Submitted batch job $JOB_ID"
+
+if [ -z "$ARRAY" ]; then
+  bash "$SCRIPT" "$@"
+  exit $?
+fi
+
+RANGE=${ARRAY%%%*}
+FIRST=${RANGE%-*}
+LAST=${RANGE#*-}
+mkdir -p logs
+for ((i = FIRST; i <= LAST; i++)); do
+  SLURM_ARRAY_JOB_ID=$JOB_ID SLURM_ARRAY_TASK_ID=$i SLURM_CPUS_PER_TASK=$CPUS \
+    bash "$SCRIPT" "$@" > "logs/fake_${JOB_ID}_${i}.out" 2> "logs/fake_${JOB_ID}_${i}.err" &
+done
+wait
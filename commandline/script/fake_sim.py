@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scenargie ./sim のローカル用の代用品 (合成 DR-IoT トレース生成器)
+
+機能:
+- 生成済みの .config / .pos / .statconfig を読み、CBR トラフィックを模擬して
+  .trace と .stat を書き出す。Scenargie が無い環境でも生成・実行・解析・描画の
+  パイプライン全体を負荷試験・ベンチマークできるようにするためのもの。
+- PER は自PANのコーディネータとの距離と、同じ周波数帯を使う他PANのコーディネータとの
+  距離・offered load から決める (統計的にそれらしい値になる程度の簡易モデル)。
+- --rate-scale / --target-mb でトレースの大きさ (イベントレート) を調整できる。
+
+トレースの1行 (空白区切り, node_parse_trace_file が参照する列):
+    parts[0]  時刻 [s]
+    parts[1]  トレースタグ (Mac / Application)
+    parts[3]  ノードID
+    parts[5]  モデル名 (DrIotMac / DrIotCbr)
+    parts[7]  インスタンス名
+    parts[9]  イベント名 (DataFrameDequeued, Tx-DATA, RxFrame, ChannelAccessFailure, ...)
+    parts[11] パケットID (<送信元ノード>_<シーケンス番号>)
+    parts[13] 再送回数
+    parts[15] DataFrameDequeued: 宛先ノードID / RxFrame: フレーム種別 (Data / ACK)
+
+.stat の1行:
+    <統計名> <ノードID> <インスタンス名> <値>
+    (DrIotCbr_PacketsSent / DrIotCbr_PacketsReceived はインスタンス名 driotcbr_<src>_<dst> で
+     送信元・宛先の両方で数える。計測区間は .statconfig の INF_TIME <start> <end>)
+
+使い方 (commandline/ で実行):
+    python3 ./script/run_simulations.py --sim ./script/fake_sim.py
+    ./script/fake_sim.py <config> [--rate-scale F | --target-mb N]
+"""
+
+import argparse
+import math
+import os
+import re
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+SCOPE_LINE_RE = re.compile(r"^\[(\d+)(?:-(\d+))?(?:;([^\]]+))?\]\s*(\S+)\s*=\s*(.*?)\s*$")
+GLOBAL_LINE_RE = re.compile(r"^([A-Za-z][\w-]*)\s*=\s*(.*?)\s*$")
+BAND_LINE_RE = re.compile(r"^\[(\w+)\]\s*channel-(\d+)-(frequency|bandwidth)-mhz\s*=\s*(\S+)")
+WINDOW_LINE_RE = re.compile(r"^\*\s+\S+\s+INF_TIME\s+(\S+)\s+(\S+)")
+
+WINDOW_SEC = 1.0           # トレースを書き出す時間窓
+MAX_FRAME_RETRIES = 3
+RETRY_INTERVAL_SEC = 0.05
+ACK_LOSS_PROB = 0.02
+BYTES_PER_EVENT_LINE = 120  # --target-mb の換算用の目安
+PHY_BPS = 50000.0          # offered load の換算に使う PHY レート (200 kHz 帯)
+RANGE_M = 1200.0
+INTERFERENCE_DECAY_M = 1500.0
+
+# イベント種別
+EV_APP_SENT, EV_DEQUEUED, EV_CSMA_FAIL, EV_TX, EV_RX_DATA, EV_RX_ACK, EV_APP_RECEIVED = range(7)
+EVENT_FORMATS = {
+    EV_APP_SENT: "{t:.9f} Application Node= {node} Model= DrIotCbr Instance= driotcbr_{src}_{dst} Event= PacketSent PktId= {src}_{seq} Retry= 0 Frame= Data\n",
+    EV_DEQUEUED: "{t:.9f} Mac Node= {node} Model= DrIotMac Instance= driot_{node}_1 Event= DataFrameDequeued PktId= {src}_{seq} Retry= 0 Frame= {dst}\n",
+    EV_CSMA_FAIL: "{t:.9f} Mac Node= {node} Model= DrIotMac Instance= driot_{node}_1 Event= ChannelAccessFailure PktId= {src}_{seq} Retry= 0 Frame= Data\n",
+    EV_TX: "{t:.9f} Mac Node= {node} Model= DrIotMac Instance= driot_{node}_1 Event= Tx-DATA PktId= {src}_{seq} Retry= {retry} Frame= Data\n",
+    EV_RX_DATA: "{t:.9f} Mac Node= {node} Model= DrIotMac Instance= driot_{node}_1 Event= RxFrame PktId= {src}_{seq} Retry= {retry} Frame= Data\n",
+    EV_RX_ACK: "{t:.9f} Mac Node= {node} Model= DrIotMac Instance= driot_{node}_1 Event= RxFrame PktId= {src}_{seq} Retry= {retry} Frame= ACK\n",
+    EV_APP_RECEIVED: "{t:.9f} Application Node= {node} Model= DrIotCbr Instance= driotcbr_{src}_{dst} Event= PacketReceived PktId= {src}_{seq} Retry= 0 Frame= Data\n",
+}
+APP_EVENTS = (EV_APP_SENT, EV_APP_RECEIVED)
+
+
+def parse_config(config_path):
+    """
+    .config から全体設定・ノードごとの設定・CBRアプリ・チャネル定義を読む。
+    [a-b;instance] のレンジ行 (--compact で生成した .config) にも対応する。
+    """
+    global_params = {}
+    node_params = defaultdict(dict)
+    apps = defaultdict(dict)  # (node, instance) -> params
+    band = defaultdict(dict)  # channel -> {frequency, bandwidth}
+    with open(config_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            match = BAND_LINE_RE.match(line)
+            if match:
+                band[int(match.group(2))][match.group(3)] = float(match.group(4))
+                continue
+            match = SCOPE_LINE_RE.match(line)
+            if match:
+                first, last, instance, key, value = match.groups()
+                for node_id in range(int(first), int(last or first) + 1):
+                    if instance and "cbr" in instance:
+                        apps[(node_id, instance)][key] = value
+                    else:
+                        node_params[node_id][key] = value
+                continue
+            match = GLOBAL_LINE_RE.match(line)
+            if match:
+                global_params[match.group(1)] = match.group(2)
+    return global_params, node_params, apps, band
+
+
+def parse_positions(pos_path):
+    """.pos の各ノードの初期座標"""
+    positions = {}
+    with open(pos_path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 4 and parts[1] == "0":
+                positions.setdefault(int(parts[0]), (float(parts[2]), float(parts[3])))
+    return positions
+
+
+def parse_measure_window(statconfig_path, default):
+    try:
+        with open(statconfig_path, "r") as f:
+            for line in f:
+                match = WINDOW_LINE_RE.match(line.strip())
+                if match:
+                    return float(match.group(1)), float(match.group(2))
+    except OSError:
+        pass
+    return default
+
+
+def channels_overlap(band, ch_a, ch_b):
+    """2つのチャネルの周波数帯が重なるか"""
+    a, b = band.get(ch_a), band.get(ch_b)
+    if not a or not b:
+        return ch_a == ch_b
+    half = (a["bandwidth"] + b["bandwidth"]) / 2.0
+    return abs(a["frequency"] - b["frequency"]) < half
+
+
+class Link:
+    """1本のCBRフロー (送信元 → 宛先)"""
+
+    def __init__(self, src, dst, bps, payload, start, end, jitter, attempt_fail, csma_fail, rng, rate_scale):
+        self.src = src
+        self.dst = dst
+        self.interval = payload * 8.0 / max(bps * rate_scale, 1e-9)
+        self.first = start + rng.uniform(0.0, jitter)
+        self.end = end
+        self.attempt_fail = attempt_fail
+        self.csma_fail = csma_fail
+        self.num_packets = max(0, int(math.ceil((end - self.first) / self.interval)))
+        # パケットIDのシーケンス番号は送信ノードごとに一意にする (seq * stride + offset)
+        self.seq_stride = 1
+        self.seq_offset = 0
+
+    def packets_in(self, w0, w1):
+        """時間窓 [w0, w1) に生成されるパケットのシーケンス番号"""
+        k0 = max(0, int(math.ceil((w0 - self.first) / self.interval)))
+        k1 = min(self.num_packets, int(math.ceil((w1 - self.first) / self.interval)))
+        return np.arange(k0, max(k0, k1))
+
+
+def build_links(config_path, rng, rate_scale):
+    global_params, node_params, apps, band = parse_config(config_path)
+    pos_path = node_params[1].get("mobility-trace-file") or global_params.get("mobility-trace-file")
+    positions = parse_positions(pos_path)
+
+    pan_of = {n: int(p["driot-pan-id"]) for n, p in node_params.items() if "driot-pan-id" in p}
+    channel_of = {n: int(p["driot-initial-channel-number"]) for n, p in node_params.items()
+                  if "driot-initial-channel-number" in p}
+    coordinators = {pan_of[n]: n for n, p in node_params.items() if p.get("driot-mode") == "Coordinator"}
+
+    def distance(a, b):
+        (xa, ya), (xb, yb) = positions[a], positions[b]
+        return math.hypot(xa - xb, ya - yb)
+
+    # PANごとの offered load (送信レートの合計 / PHYレート)
+    pan_bps = defaultdict(float)
+    for (node_id, _), params in apps.items():
+        pan_bps[pan_of[node_id]] += float(params.get("driot-cbr-traffic-bps", 0))
+
+    links = []
+    for (node_id, instance), params in sorted(apps.items()):
+        dst = int(params["driot-cbr-destination"])
+        pan = pan_of[node_id]
+        device = dst if node_id == coordinators[pan] else node_id
+        own = distance(device, coordinators[pan])
+        p_own = 0.01 + 0.25 * min(1.0, own / RANGE_M) ** 4
+        p_interf = 0.0
+        for other_pan, other_coord in coordinators.items():
+            if other_pan == pan or not channels_overlap(band, channel_of[device], channel_of[other_coord]):
+                continue
+            other_load = min(1.0, pan_bps[other_pan] / PHY_BPS)
+            p_interf = 1.0 - (1.0 - p_interf) * (1.0 - 0.9 * other_load * math.exp(-distance(device, other_coord) / INTERFERENCE_DECAY_M))
+        attempt_fail = 1.0 - (1.0 - p_own) * (1.0 - p_interf)
+        csma_fail = min(0.5, 0.01 + 0.2 * p_interf)
+        links.append(Link(
+            src=node_id,
+            dst=dst,
+            bps=float(params["driot-cbr-traffic-bps"]),
+            payload=float(params["driot-cbr-payload-size-bytes"]),
+            start=float(params["driot-cbr-traffic-start-time"]),
+            end=float(params["driot-cbr-traffic-end-time"]),
+            jitter=float(params.get("driot-cbr-traffic-start-time-max-jitter", 0.0)),
+            attempt_fail=attempt_fail,
+            csma_fail=csma_fail,
+            rng=rng,
+            rate_scale=rate_scale,
+        ))
+    per_sender = defaultdict(list)
+    for link in links:
+        per_sender[link.src].append(link)
+    for sender_links in per_sender.values():
+        for offset, link in enumerate(sender_links):
+            link.seq_stride = len(sender_links)
+            link.seq_offset = offset
+    return global_params, links
+
+
+def simulate_window(links, w0, w1, rng):
+    """
+    時間窓内の全イベントを生成する。
+    戻り値: 列ごとの配列 (time, kind, node, src, dst, seq, retry)
+    """
+    cols = defaultdict(list)
+
+    def emit(t, kind, node, src, dst, seq, retry):
+        n = len(t)
+        cols["t"].append(t)
+        cols["kind"].append(np.full(n, kind))
+        cols["node"].append(np.broadcast_to(node, n))
+        cols["src"].append(np.full(n, src))
+        cols["dst"].append(np.full(n, dst))
+        cols["seq"].append(seq)
+        cols["retry"].append(np.broadcast_to(retry, n))
+
+    for link in links:
+        k = link.packets_in(w0, w1)
+        if len(k) == 0:
+            continue
+        t = link.first + k * link.interval
+        seq = k * link.seq_stride + link.seq_offset
+        emit(t, EV_APP_SENT, link.src, link.src, link.dst, seq, 0)
+        emit(t + 0.001, EV_DEQUEUED, link.src, link.src, link.dst, seq, 0)
+
+        csma = rng.random(len(seq)) < link.csma_fail
+        emit(t[csma] + 0.005, EV_CSMA_FAIL, link.src, link.src, link.dst, seq[csma], 0)
+
+        # 成功するまでの送信回数 (最大 1 + MAX_FRAME_RETRIES 回)
+        tx_seq, tx_t = seq[~csma], t[~csma]
+        tries = rng.geometric(1.0 - link.attempt_fail, len(tx_seq))
+        success = tries <= 1 + MAX_FRAME_RETRIES
+        attempts = np.minimum(tries, 1 + MAX_FRAME_RETRIES)
+        retry = np.arange(attempts.sum()) - np.repeat(np.cumsum(attempts) - attempts, attempts)
+        emit(np.repeat(tx_t, attempts) + 0.002 + retry * RETRY_INTERVAL_SEC, EV_TX,
+             link.src, link.src, link.dst, np.repeat(tx_seq, attempts), retry)
+
+        rx_t = tx_t[success] + 0.012 + (attempts[success] - 1) * RETRY_INTERVAL_SEC
+        rx_seq, rx_retry = tx_seq[success], attempts[success] - 1
+        emit(rx_t, EV_RX_DATA, link.dst, link.src, link.dst, rx_seq, rx_retry)
+        emit(rx_t + 0.0005, EV_APP_RECEIVED, link.dst, link.src, link.dst, rx_seq, 0)
+        ack = rng.random(len(rx_seq)) >= ACK_LOSS_PROB
+        emit(rx_t[ack] + 0.003, EV_RX_ACK, link.src, link.src, link.dst, rx_seq[ack], rx_retry[ack])
+
+    if not cols:
+        return None
+    out = {k: np.concatenate(v) for k, v in cols.items()}
+    order = np.argsort(out["t"], kind="stable")
+    return {k: v[order] for k, v in out.items()}
+
+
+class StatCounter:
+    """計測区間内のイベントを .stat の統計に集計する"""
+
+    def __init__(self, window):
+        self.window = window
+        self.node = defaultdict(lambda: defaultdict(int))  # node -> stat -> value
+        self.app = defaultdict(lambda: defaultdict(int))   # (node, instance) -> stat -> value
+
+    def add(self, ev):
+        # 半開区間 [開始, 終了): trace_parser の計測区間と同じ境界にする
+        in_window = (ev["t"] >= self.window[0]) & (ev["t"] < self.window[1])
+        node_stats = {
+            EV_DEQUEUED: "DrIotMac_DataFramesDequeued",
+            EV_CSMA_FAIL: "DrIotMac_ChannelAccessFailures",
+            EV_TX: "DrIotMac_DataFramesTransmitted",
+            EV_RX_DATA: "DrIotMac_DataFramesReceived",
+            EV_RX_ACK: "DrIotMac_AckFramesReceived",
+        }
+        for kind, name in node_stats.items():
+            mask = in_window & (ev["kind"] == kind)
+            for node, count in zip(*np.unique(ev["node"][mask], return_counts=True)):
+                self.node[int(node)][name] += int(count)
+        retries = in_window & (ev["kind"] == EV_TX) & (ev["retry"] > 0)
+        for node, count in zip(*np.unique(ev["node"][retries], return_counts=True)):
+            self.node[int(node)]["DrIotMac_FrameRetries"] += int(count)
+        for kind, name in ((EV_APP_SENT, "DrIotCbr_PacketsSent"), (EV_APP_RECEIVED, "DrIotCbr_PacketsReceived")):
+            mask = in_window & (ev["kind"] == kind)
+            keys = np.stack([ev["node"][mask], ev["src"][mask], ev["dst"][mask]], axis=1)
+            for (node, src, dst), count in zip(*np.unique(keys, axis=0, return_counts=True)):
+                self.app[(int(node), f"driotcbr_{src}_{dst}")][name] += int(count)
+
+    def write(self, path, label):
+        with open(path, "w") as f:
+            f.write(f"# statistics for {label} (window {self.window[0]} - {self.window[1]})\n")
+            for node in sorted(self.node):
+                for name, value in sorted(self.node[node].items()):
+                    f.write(f"{name} {node} driot_{node}_1 {value}\n")
+            for (node, instance) in sorted(self.app):
+                for name, value in sorted(self.app[(node, instance)].items()):
+                    f.write(f"{name} {node} {instance} {value}\n")
+
+
+def format_events(ev, enabled_tags):
+    """イベント配列をトレース行に整形する"""
+    keep = np.ones(len(ev["t"]), dtype=bool)
+    if "Application" not in enabled_tags:
+        keep &= ~np.isin(ev["kind"], APP_EVENTS)
+    if "Mac" not in enabled_tags:
+        keep &= np.isin(ev["kind"], APP_EVENTS)
+    columns = [ev[k][keep].tolist() for k in ("t", "kind", "node", "src", "dst", "seq", "retry")]
+    return "".join(
+        EVENT_FORMATS[kind].format(t=t, node=node, src=src, dst=dst, seq=seq, retry=retry)
+        for t, kind, node, src, dst, seq, retry in zip(*columns)
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scenargie ./sim の代用品 (合成トレース生成)")
+    parser.add_argument("config", help=".config ファイル")
+    parser.add_argument("--rate-scale", type=float, default=float(os.environ.get("FAKE_SIM_RATE_SCALE", 1.0)),
+                        help="CBR のパケットレートに掛ける倍率 (トレースの大きさ・イベントレートが比例する)")
+    parser.add_argument("--target-mb", type=float, default=float(os.environ.get("FAKE_SIM_TARGET_MB", 0)),
+                        help="トレースのおおよその大きさ [MB] (指定時は --rate-scale より優先)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    global_params, node_params, _, _ = parse_config(args.config)
+    seed = int(global_params.get("seed", global_params.get("mobility-seed", 0)))
+    sim_time = float(global_params["simulation-time"])
+    label = os.path.splitext(global_params["trace-output-file"])[0]
+    enabled_tags = set(node_params[1].get("trace-enabled-tags", "").split())
+
+    rate_scale = args.rate_scale
+    if args.target_mb > 0:
+        # 1パケットあたり約6行として換算する
+        base_links = build_links(args.config, np.random.default_rng(seed), 1.0)[1]
+        base_lines = 6.0 * sum(link.num_packets for link in base_links)
+        rate_scale = args.target_mb * 1e6 / max(base_lines * BYTES_PER_EVENT_LINE, 1.0)
+
+    rng = np.random.default_rng(seed)
+    _, links = build_links(args.config, rng, rate_scale)
+    window = parse_measure_window(global_params.get("statistics-configuration-file", ""), (0.0, sim_time))
+    stats = StatCounter(window)
+
+    trace = None
+    if enabled_tags:
+        trace = open(global_params["trace-output-file"], "w", buffering=1 << 20)
+    try:
+        w0 = 0.0
+        while w0 < sim_time:
+            w1 = min(w0 + WINDOW_SEC, sim_time)
+            ev = simulate_window(links, w0, w1, rng)
+            if ev is not None:
+                stats.add(ev)
+                if trace is not None:
+                    trace.write(format_events(ev, enabled_tags))
+            w0 = w1
+    finally:
+        if trace is not None:
+            trace.close()
+    stats.write(global_params["statistics-output-file"], label)
+    print(f"fake_sim: {args.config} done (rate scale {rate_scale:.3g})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
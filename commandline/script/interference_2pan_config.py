@@ -4,17 +4,45 @@ driot_measure_communication_dist シナリオ用の設定ファイル生成ス
 
 機能:
 - テンプレートが期待するデータ構造を生成する。
-- 距離とチャネル帯域幅の全組み合わせに対応する設定ファイルを生成する。
+- スイープ仕様ファイル (spec/*.json) に記述されたN個のPAN・チャネルパターン・
+  距離・offered load・seed の全組み合わせに対応する設定ファイルを生成する。
+- スイープ点はプランナーから遅延的に取り出し、通し番号の範囲 (shard) で分割できる。
 - 生成されたファイルは、一つ上の階層のディレクトリ (commandline/) に出力される。
+- テンプレートは一度だけコンパイルし、スイープ点をプロセスプールに分配して
+  バッチ単位で描画・書き出しを行う。
+- スイープ点ごとに入力ハッシュと出力ハッシュをマニフェストに記録し、
+  入力が変化した点のファイルだけを書き換える (変化のない点はmtimeも変わらない)。
+- デバイス座標は placement モジュールで全seed分を一括生成し、全ノードの座標と PAN 番号を
+  node_positions.npy (距離 × seed × ノードID × xy) に書き出す (解析は .pos を読まずにこれを使う)。
+- 各スイープ点の入出力ファイルのパスをランカタログ (run_catalog.json) に記録する。
+  --layout sharded を指定すると runs/<pattern>/dist<d>m/load<load>/ に振り分けて出力する。
+- --compact を指定すると、全ノード共通の値を [a-b] のレンジ行にまとめた .config を出力する
+  (config_compact.py。インターフェース名は全ノード共通の driot_<k>)。[a-b;instance] の行と共通の
+  インターフェース名は fake_sim.py でしか確かめておらず、実際の ./sim で読めるかは照合していない。
+- --no-trace を指定すると、トレース出力を無効にした .config を出力する
+  (解析は .stat の DrIotMac_* / DrIotCbr_* の統計から行う。実験的な機能で、集計時に
+  --source stat --experimental-stat-source が必要)。
 """
 
 import os
 import sys
+import time
 import random
 import math
+import argparse
+import collections
+import hashlib
+import json
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from jinja2 import Environment, FileSystemLoader, StrictUndefined
 
+import catalog
+import config_compact
+import placement
+import sweep
+from positions_table import save_positions_table
+
 # --- パラメータ定義 ---
 
 CHANNELS = {
@@ -22,13 +50,6 @@ CHANNELS = {
     1:  {"ch": 1, "bandwidth": 150.0, "bitrate": 50e3,   "frame_size": 255,  "preamble_power": -97.0, "range_km": 1.4414098800604656, "ed_threshold_dbm": -87.0}, #周波数921MHz
     2:  {"ch": 2, "bandwidth": 600.0, "bitrate": 200e3,  "frame_size": 511,  "preamble_power": -90.97940008672037, "range_km": 1.0192307006600434, "ed_threshold_dbm": -80.97940008672037},#周波数920MHz
 }
-TARGET_BANDWIDTH_PATTERNS = [[0, 2],[1, 2]]
-NUM_DEVICE = 12
-DEVICE_ID_1 = list(range(3, NUM_DEVICE + 3))
-DEVICE_ID_2= list(range(NUM_DEVICE + 3, NUM_DEVICE + NUM_DEVICE + 3))
-
-DISTANCES_M = 1200
-SIMULATION_SEEDS = 100
  
 MEASURE_START_SEC = 10.0
 MEASURE_DURATION_SEC = 50.0
@@ -42,12 +63,24 @@ MY_TRACE_TAGS = ['Application', 'Mac']
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATE_DIR = os.path.join(SCRIPT_DIR, "../template/")  # commandline/template/
 OUTPUT_DIR = os.path.join(SCRIPT_DIR, "..")  # commandline/
+# スイープ仕様 (PAN数, チャネルパターン, offered load, seed, 格子配置, 距離)
+# チャネルパターンは CHANNELS のキーで指定する
+DEFAULT_SPEC_FILE = os.path.join(SCRIPT_DIR, "../spec/interference_2pan.json")
 
 # テンプレートファイル名
 CONFIG_TEMPLATE = "TEMPLATE.config.j2"
 POS_TEMPLATE = "TEMPLATE.pos.j2"
 STAT_TEMPLATE = "TEMPLATE.statconfig.j2"
 
+# 並列生成の設定
+DEFAULT_BATCH_SIZE = 50  # 1タスクあたりのスイープ点数
+WRITE_BUFFER_BYTES = 1 << 20  # 書き出しバッファ (1 MiB)
+
+# インクリメンタル生成用のマニフェスト
+MANIFEST_VERSION = 1
+MANIFEST_FILE = os.path.join(OUTPUT_DIR, "sweep_manifest.json")
+STALE_LIST_FILE = os.path.join(OUTPUT_DIR, "stale_configs.txt")
+
 """
 極座標変換を用いて、半径Rの円内に一様なランダム座標を生成する。
 """
@@ -68,212 +101,437 @@ STAT_TEMPLATE = "TEMPLATE.statconfig.j2"
                 
 #         return points
 
+def load_templates():
+    """
+    Jinja2テンプレートを一度だけコンパイルして (config, pos, statconfig) の順で返す。
+    """
+    try:
+        # undefined=StrictUndefined: 未定義変数があればエラーで停止
+        # lstrip_blocks=True: タグの前の空白を削除し、不要な空行を抑制
+        env = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            trim_blocks=True,
+            lstrip_blocks=True,
+            undefined=StrictUndefined,
+        )
+        config_template = env.get_template(CONFIG_TEMPLATE)
+        pos_template = env.get_template(POS_TEMPLATE)
+        stat_template = env.get_template(STAT_TEMPLATE)
+    except Exception as e:
+        print(
+            f"Error: Failed to load template files.\n  Location: {TEMPLATE_DIR}\n  Details: {e}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    return config_template, pos_template, stat_template
+
+
+def cbr_application(dst, channel_info, offered_load, num_device):
+    """CBRアプリケーション1本分の定義"""
+    return {
+        "dst": dst,
+        "bps": (channel_info["bitrate"]/(num_device +1)) * offered_load,
+        "start": MEASURE_START_SEC,
+        "end": MEASURE_END_SEC,
+        "jitter": 1.0,
+        "payload_size": channel_info["frame_size"] - 15,  # MACヘッダを引いたサイズ
+        "is_ack_required": True,
+    }
+
+
+def build_context(point):
+    """1つのスイープ点に対するファイル名prefix, ラベル (出力パス) とテンプレートコンテキストを返す"""
+    planner = _PLANNER
+    num_device = planner.num_device
+    prefix = planner.prefix(point)
+    label = catalog.run_label(_LAYOUT, point.pattern, point.distance_m, point.offered_load, prefix)
+    coordinator_xy = planner.coordinator_xy(point.distance_m)
+    # PANごとのデバイス相対座標 [pan, device, xy]
+    offsets = _OFFSETS[_SEED_ROWS[point.seed]]
+
+    coordinators = []
+    devices = []
+    for pan, channel in enumerate(point.channels):
+        c_info = CHANNELS[channel]
+        coordinator_id = planner.coordinator_id(pan)
+        device_ids = planner.device_ids(pan)
+        coord_x, coord_y = coordinator_xy[pan]
+
+        # Coordinatorノードの定義
+        coordinators.append({
+            "id": coordinator_id,
+            "pan_id": pan,
+            "mode": "coordinator",
+            "pos_list": [{"time": 0, "x": coord_x, "y": coord_y}],
+            "interfaces": [{"mode": "PanCoordinator", "init_ch": c_info["ch"]}],
+            "associated_device_table": device_ids,  # PAN内のデバイスを静的に関連付け
+            "init_block_index": 0,
+            "init_block_count": 1,
+            "desired_channel_bandwidth": c_info["bandwidth"],
+            "desired_block_count": 1,
+            "cbr_applications": [
+                cbr_application(dev_id, c_info, point.offered_load, num_device) for dev_id in device_ids
+            ],
+            "preamble_power": c_info["preamble_power"],
+            "ed_threshold_dbm": c_info["ed_threshold_dbm"],
+        })
+
+        for k, dev_id in enumerate(device_ids):
+            devices.append({
+                "id": dev_id,
+                "pan_id": pan,
+                "mode": "device",
+                "pos_list": [{"time": 0,
+                              "x": float(coord_x + offsets[pan, k, 0]),
+                              "y": float(coord_y + offsets[pan, k, 1])}],
+                "interfaces": [{"mode": "Device", "init_ch": c_info["ch"]}],
+                "associated": True,  # 静的に関連付け済み
+                "cbr_applications": [cbr_application(coordinator_id, c_info, point.offered_load, num_device)],
+                "preamble_power": c_info["preamble_power"],
+                "ed_threshold_dbm": c_info["ed_threshold_dbm"],
+            })
+
+    # ノードはID順 (コーディネータ, PAN1のデバイス, PAN2のデバイス, ...)
+    all_nodes = coordinators + devices
+
+    # テンプレートに渡すメインのコンテキスト
+    context = {
+        "label": label,
+        "config_filename_prefix": prefix,
+        "seed": point.seed,
+        "sim_time": MEASURE_END_SEC,
+        "mobility_seed": point.seed,
+        "band_name": "DrIotTestBand",
+        "measure_start": MEASURE_START_SEC,
+        "measure_end": SIM_DURATION_SEC - 10.0,
+        "is_6lowpan_enabled": False,
+        "advertising_channel_number": 0,
+        "nodes": all_nodes,
+        "tx_power": 13.010299956639813, # dBm
+        "trace_tags": _TRACE_TAGS,
+        "cca_mode": "ED_or_CS",
+        "shared_interface_names": _COMPACT,
+    }
+    return prefix, label, context
+
+
+def render_context(label, context, templates):
+    """コンテキストを描画し、(出力パス, 本文) のリストを返す"""
+    config_template, pos_template, stat_template = templates
+    config_text = config_template.render(context)
+    if _COMPACT:
+        config_text = config_compact.compact_config(config_text)
+    return [
+        (os.path.join(OUTPUT_DIR, f"{label}.config"), config_text),
+        (os.path.join(OUTPUT_DIR, f"{label}.pos"), pos_template.render(context)),
+        (os.path.join(OUTPUT_DIR, f"{label}.statconfig"), stat_template.render(context)),
+    ]
+
+
+def write_files(rendered):
+    """描画済みファイルをまとめて書き出す (1ファイル1回のwrite)"""
+    created_dirs = set()
+    for path, text in rendered:
+        dirname = os.path.dirname(path)
+        if dirname not in created_dirs:
+            os.makedirs(dirname, exist_ok=True)
+            created_dirs.add(dirname)
+        with open(path, "w", buffering=WRITE_BUFFER_BYTES) as f:
+            f.write(text)
+    return len(rendered)
+
+
+def sha256_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_templates():
+    """テンプレートのソースをまとめたハッシュ (テンプレート変更時に全点を再描画するため)"""
+    h = hashlib.sha256()
+    for name in (CONFIG_TEMPLATE, POS_TEMPLATE, STAT_TEMPLATE):
+        with open(os.path.join(TEMPLATE_DIR, name), "rb") as f:
+            h.update(name.encode("utf-8"))
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def hash_params(context, template_hash):
+    """スイープ点の入力 (コンテキスト + テンプレート) のハッシュ"""
+    payload = json.dumps(context, sort_keys=True, separators=(",", ":"))
+    return sha256_text(template_hash + payload)
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f).get("points", {})
+    except (OSError, ValueError) as e:
+        print(f"Warning: Ignoring unreadable manifest '{path}': {e}", file=sys.stderr)
+        return {}
+
+
+def save_manifest(path, points):
+    """マニフェストを一時ファイル経由で原子的に書き換える"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "points": points}, f, sort_keys=True, indent=1)
+    os.replace(tmp_path, path)
+
+
+def hash_placement(planner, method):
+    """ノード座標を決める入力 (配置方法・乱数のエントロピー・PAN数・格子・コーディネータ配置) のハッシュ"""
+    payload = json.dumps({
+        "method": method,
+        "entropy": placement.PLACEMENT_ENTROPY,
+        "num_pan": planner.num_pan,
+        "lattice": planner.lattice,
+        "coordinator_layout": planner.spec.get("coordinator_layout", "line"),
+    }, sort_keys=True, separators=(",", ":"))
+    return sha256_text(payload)
+
+
+def write_positions_table(planner, offsets, placement_hash):
+    """全距離・全seedのノード座標の表を書き出す (shape = [distance, seed, node, xy])"""
+    distances = list(planner.distances)
+    tables = [placement.node_positions(offsets, planner.coordinator_xy(d)) for d in distances]
+    positions = np.stack([t[0] for t in tables])
+    return save_positions_table(OUTPUT_DIR, distances, list(planner.seeds), positions, tables[0][1], placement_hash)
+
+
+def compute_offsets(planner, method):
+    """全seedのデバイス相対座標を一度に生成する (shape = [seed, pan, device, xy])"""
+    lattice = planner.lattice
+    return placement.place_devices(
+        planner.seeds, lattice["unit_x"], lattice["unit_y"],
+        lattice["width_m"], lattice["offset_m"], num_pan=planner.num_pan, method=method,
+    )
+
+
+# ワーカープロセス内で共有する状態
+# (コンパイル済みテンプレート, 前回のマニフェスト, スイーププランナー, デバイス相対座標, 圧縮モード, 出力レイアウト)
+_TEMPLATES = None
+_PREVIOUS = {}
+_TEMPLATE_HASH = ""
+_PLANNER = None
+_OFFSETS = None
+_SEED_ROWS = {}  # seed → _OFFSETS の行 (仕様の seeds は連続・昇順とは限らない)
+_COMPACT = False
+_LAYOUT = "flat"
+_TRACE_TAGS = MY_TRACE_TAGS
+
+
+def _init_worker(previous, template_hash, spec, offsets, compact, layout, trace_tags):
+    global _TEMPLATES, _PREVIOUS, _TEMPLATE_HASH, _PLANNER, _OFFSETS, _SEED_ROWS, _COMPACT, _LAYOUT, _TRACE_TAGS
+    _TEMPLATES = load_templates()
+    _PREVIOUS = previous
+    _TEMPLATE_HASH = template_hash
+    _PLANNER = sweep.SweepPlanner(spec)
+    _OFFSETS = offsets
+    _SEED_ROWS = {int(seed): row for row, seed in enumerate(_PLANNER.seeds)}
+    _COMPACT = compact
+    _LAYOUT = layout
+    _TRACE_TAGS = trace_tags
+
+
+def generate_point(point, pending):
+    """
+    1つのスイープ点を処理する。
+    入力ハッシュが前回と同じで出力が揃っていれば描画自体を省略し、
+    描画した場合も内容が変わったファイルだけを pending に積む。
+    戻り値: (prefix, マニフェストエントリ, 出力が変化したか, カタログエントリ)
+    """
+    prefix, label, context = build_context(point)
+    run_entry = {
+        "pattern": point.pattern,
+        "distance_m": point.distance_m,
+        "offered_load": point.offered_load,
+        "seed": point.seed,
+        "label": label,
+        "num_nodes": len(context["nodes"]),
+    }
+    params_hash = hash_params(context, _TEMPLATE_HASH)
+    previous = _PREVIOUS.get(prefix)
+    if previous is not None and previous["params"] == params_hash:
+        if all(os.path.exists(os.path.join(OUTPUT_DIR, name)) for name in previous["outputs"]):
+            return prefix, previous, False, run_entry
+
+    outputs = {}
+    changed = False
+    for path, text in render_context(label, context, _TEMPLATES):
+        # マニフェストには commandline/ からの相対パスで記録する
+        name = os.path.relpath(path, OUTPUT_DIR).replace(os.sep, "/")
+        outputs[name] = sha256_text(text)
+        old_hash = previous["outputs"].get(name) if previous is not None else None
+        if old_hash == outputs[name] and os.path.exists(path):
+            continue
+        pending.append((path, text))
+        changed = True
+    return prefix, {"params": params_hash, "outputs": outputs}, changed, run_entry
+
+
+def generate_batch(points):
+    """
+    スイープ点のバッチを処理し、変化したファイルだけを最後にまとめて書き出す。
+    戻り値: ([(prefix, エントリ, 変化したか, カタログエントリ), ...], 書き出したファイル数)
+    """
+    pending = []
+    records = [generate_point(point, pending) for point in points]
+    return records, write_files(pending)
+
+
+def iter_batches(points, batch_size):
+    batch = []
+    for point in points:
+        batch.append(point)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def imap_bounded(executor, fn, iterable, max_pending):
+    """
+    executor.map と同じ順序で結果を返すが、投入済みタスクを max_pending 個までに抑える。
+    (executor.map は入力を全て先に投入するため、巨大なスイープではメモリを使い切る)
+    """
+    pending = collections.deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def output_paths(start, stop, total):
+    """
+    マニフェスト, 再シミュレーション一覧, ランカタログのパス。
+    スイープの一部 (shard) だけを生成する場合は範囲ごとに別ファイルにする。
+    """
+    paths = (MANIFEST_FILE, STALE_LIST_FILE, os.path.join(OUTPUT_DIR, catalog.CATALOG_FILE))
+    if start == 0 and stop == total:
+        return paths
+    suffix = f".{start}-{stop}"
+    return tuple(os.path.splitext(p)[0] + suffix + os.path.splitext(p)[1] for p in paths)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="interference 2PAN シナリオの設定ファイルを生成する")
+    parser.add_argument("--spec", default=DEFAULT_SPEC_FILE,
+                        help="スイープ仕様ファイル (JSON)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="生成に使うプロセス数 (1ならシングルプロセス)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="1タスクで描画・書き出しするスイープ点の数")
+    parser.add_argument("--force", action="store_true",
+                        help="マニフェストを無視して全ファイルを再生成する")
+    parser.add_argument("--placement", choices=placement.PLACEMENT_METHODS, default="seedsequence",
+                        help="デバイス配置の乱数方式 (legacy は np.random.seed を使っていた旧実装の配置を再現する)")
+    parser.add_argument("--compact", action="store_true",
+                        help="全ノードで値が同じパラメータを [a-b] 形式の行にまとめた .config を出力する "
+                             "(インターフェース名は全ノード共通の driot_<k>。fake_sim.py でしか確かめておらず、"
+                             "実際の ./sim で読めるかは未照合)")
+    parser.add_argument("--no-trace", action="store_true",
+                        help="トレース出力を無効にする (解析は .stat の統計から行う。出力 I/O が大幅に減る。"
+                             "実験的な機能で、集計時に --source stat --experimental-stat-source が必要)")
+    parser.add_argument("--layout", choices=catalog.LAYOUTS, default="flat",
+                        help="出力レイアウト (sharded: runs/<pattern>/dist<d>m/load<load>/ に振り分ける)")
+    parser.add_argument("--start", type=int, default=0,
+                        help="生成するスイープ点の通し番号の開始 (含む)")
+    parser.add_argument("--stop", type=int, default=None,
+                        help="生成するスイープ点の通し番号の終了 (含まない)")
+    parser.add_argument("--shard", default=None,
+                        help="'i/n' 形式で指定すると、スイープをn等分したi番目の範囲だけを生成する")
+    return parser.parse_args()
+
+
 def main():
-    
     """メイン処理"""
-    for bandwidth_pattern in TARGET_BANDWIDTH_PATTERNS:
-        c1_info = CHANNELS[bandwidth_pattern[0]]
-        c2_info = CHANNELS[bandwidth_pattern[1]]
-        if c1_info == CHANNELS[0]:
-            interference = 1
+    args = parse_args()
+    try:
+        spec = sweep.load_spec(args.spec)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: Failed to load sweep spec '{args.spec}'.\n  Details: {e}", file=sys.stderr)
+        sys.exit(1)
+    planner = sweep.SweepPlanner(spec)
+    total = len(planner)
+    if args.shard is not None:
+        start, stop = planner.shard_range(*sweep.parse_shard(args.shard))
+    else:
+        start, stop = args.start, min(args.stop if args.stop is not None else total, total)
+    manifest_file, stale_list_file, catalog_file = output_paths(start, stop, total)
+
+    print(
+        f"Starting to generate configuration files...\nOutput directory: {os.path.abspath(OUTPUT_DIR)}"
+    )
+    print(f"Sweep: {spec.get('name', args.spec)} ({total} points, generating [{start}, {stop}))")
+
+    previous = {} if args.force else load_manifest(manifest_file)
+    template_hash = hash_templates()
+    trace_tags = [] if args.no_trace else MY_TRACE_TAGS
+    offsets = compute_offsets(planner, args.placement)
+    placement_hash = hash_placement(planner, args.placement)
+    batches = iter_batches(planner.iter_points(start, stop), max(1, args.batch_size))
+    manifest = {}
+    run_catalog = catalog.RunCatalog(OUTPUT_DIR)
+    stale = []
+    total_points = 0
+    total_files = 0
+    start_time = time.perf_counter()
+    executor = None
+    try:
+        if args.workers <= 1:
+            _init_worker(previous, template_hash, spec, offsets, args.compact, args.layout, trace_tags)
+            results = map(generate_batch, batches)
         else:
-            interference = 0
-        
-        for offered_load in np.arange(0.1, 1.1, 0.1):
-            OFFERED_LOAD = round(float(offered_load), 1)
-            for seed in range(SIMULATION_SEEDS):
-                np.random.seed(seed)
-                try:
-                    # undefined=StrictUndefined: 未定義変数があればエラーで停止
-                    # lstrip_blocks=True: タグの前の空白を削除し、不要��空行を抑制
-                    env = Environment(
-                        loader=FileSystemLoader(TEMPLATE_DIR),
-                        trim_blocks=True,
-                        lstrip_blocks=True,
-                        undefined=StrictUndefined,
-                    )
-                    config_template = env.get_template(CONFIG_TEMPLATE)
-                    pos_template = env.get_template(POS_TEMPLATE)
-                    stat_template = env.get_template(STAT_TEMPLATE)
-                except Exception as e:
-                    print(
-                        f"Error: Failed to load template files.\n  Location: {TEMPLATE_DIR}\n  Details: {e}",
-                        file=sys.stderr,
-                    )
-                    sys.exit(1)
-
-                # print(
-                #     f"Starting to generate configuration files...\nOutput directory: {os.path.abspath(OUTPUT_DIR)}"
-                # )
-                
-                device_x_unit = [ -3, -2, -2, -2, -1, -1, -1, -1,  0,  0, 0,  1]
-                device_y_unit = [ -1,  0, -1, -2, 1, 0, -2, -3, 0, -1, -2, -1]
-                lattice_width = 240
-                lattice_offset = 120
-                device_x = []
-                device_y = []
-                num_pan = 2
-                for _ in range(num_pan):
-                    for x, y in zip(device_x_unit, device_y_unit): 
-                        device_x.append(np.random.uniform(x*lattice_width +lattice_offset, x*lattice_width +lattice_width +lattice_offset))
-                        device_y.append(np.random.uniform(y*lattice_width +lattice_offset, y*lattice_width +lattice_width +lattice_offset))
-
-                print("offered_load:", OFFERED_LOAD, "seed:", seed)
-                # print(device_x)
-                # print(device_y)
-
-                total_files = 0
-                
-                if interference == 1:
-                    prefix = f"interf_coord_dist_{DISTANCES_M}m_off_load{OFFERED_LOAD}_seed{seed}"
-                else:
-                    prefix = f"no_interf_coord_dist_{DISTANCES_M}m_off_load{OFFERED_LOAD}_seed{seed}"
-                all_nodes = [] # 新しいノードリストを初期化
-
-                # Coordinatorノードの定義
-                coordinator_node_1= {
-                    "id": 1,
-                    "pan_id": 0,
-                    "mode": "coordinator",
-                    "pos_list": [{"time": 0, "x": 0, "y": 0}],
-                    "interfaces": [{"mode": "PanCoordinator", "init_ch": c1_info["ch"]}],
-                    "associated_device_table": DEVICE_ID_1,  # Device ID 2を静的に関連付け
-                    "init_block_index": 0,
-                    "init_block_count": 1,
-                    "desired_channel_bandwidth": c1_info["bandwidth"],
-                    "desired_block_count": 1,
-                    "cbr_applications": [],
-                    "preamble_power": c1_info["preamble_power"],
-                    "ed_threshold_dbm": c1_info["ed_threshold_dbm"],
-                }
-                for dev_id in DEVICE_ID_1:
-                    coordinator_node_1["cbr_applications"].append({
-                            "dst": dev_id,  # Coordinator 1宛て
-                            "bps": (c1_info["bitrate"]/(NUM_DEVICE +1)) * OFFERED_LOAD,
-                            "start": MEASURE_START_SEC,
-                            "end": MEASURE_END_SEC,
-                            "jitter": 1.0,
-                            "payload_size": c1_info["frame_size"] - 15,  # MACヘッダを引いたサイズ
-                            "is_ack_required": True,
-                    })
-                all_nodes.append(coordinator_node_1)
-
-                coordinator_node_2 = {
-                    "id": 2,
-                    "pan_id": 1, # PAN IDを2に設定（衝突回避のため）
-                    "mode": "coordinator",
-                    "pos_list": [{"time": 0, "x": DISTANCES_M, "y": 0}], 
-                    "interfaces": [{"mode": "PanCoordinator", "init_ch": c2_info["ch"]}],
-                    "associated_device_table": DEVICE_ID_2,
-                    "init_block_index": 0,
-                    "init_block_count": 1,
-                    "desired_channel_bandwidth": c2_info["bandwidth"],
-                    "desired_block_count": 1,
-                    "cbr_applications": [],
-                    "preamble_power": c2_info["preamble_power"],
-                    "ed_threshold_dbm": c2_info["ed_threshold_dbm"],
-                }
-                for dev_id in DEVICE_ID_2:
-                    coordinator_node_2["cbr_applications"].append({
-                            "dst": dev_id,  # Coordinator 1宛て
-                            "bps": (c2_info["bitrate"]/(NUM_DEVICE +1)) * OFFERED_LOAD,
-                            "start": MEASURE_START_SEC,
-                            "end": MEASURE_END_SEC,
-                            "jitter": 1.0,
-                            "payload_size": c2_info["frame_size"] - 15,  # MACヘッダを引いたサイズ
-                            "is_ack_required": True,
-                    })
-                all_nodes.append(coordinator_node_2)
-
-                for dev_id in DEVICE_ID_1: 
-                    device_node_1 = {
-                        "id": dev_id,
-                        "pan_id": 0,
-                        "mode": "device",
-                        "pos_list": [{"time": 0, "x": device_x[dev_id -3], "y": device_y[dev_id -3]}],
-                        "interfaces": [{"mode": "Device", "init_ch": c1_info["ch"]}],
-                        "associated": True,  # 静的に関連付け済み
-                        "cbr_applications": [{
-                            "dst": 1,  # Coordinator 1宛て
-                            "bps": (c1_info["bitrate"]/(NUM_DEVICE +1)) * OFFERED_LOAD,
-                            "start": MEASURE_START_SEC,
-                            "end": MEASURE_END_SEC,
-                            "jitter": 1.0,
-                            "payload_size": c1_info["frame_size"] - 15,  # MACヘッダを引いたサイズ
-                            "is_ack_required": True,
-                        }],
-                        "preamble_power": c1_info["preamble_power"],
-                        "ed_threshold_dbm": c1_info["ed_threshold_dbm"],
-                    }
-                    all_nodes.append(device_node_1)
-
-
-                for dev_id in DEVICE_ID_2: 
-                    device_node_2 = {
-                        "id": dev_id,
-                        "pan_id": 1,
-                        "mode": "device",
-                        "pos_list": [{"time": 0, "x": (DISTANCES_M) + device_x[dev_id - 3], "y": 0 + device_y[dev_id - 3]}],
-                        "interfaces": [{"mode": "Device", "init_ch": c2_info["ch"]}],
-                        "associated": True,  # 静的に関連付け済み
-                        "cbr_applications": [{
-                            "dst": 2,  # Coordinator 1宛て
-                            "bps": (c2_info["bitrate"]/(NUM_DEVICE +1)) * OFFERED_LOAD,
-                            "start": MEASURE_START_SEC,
-                            "end": MEASURE_END_SEC,
-                            "jitter": 1.0,
-                            "payload_size": c2_info["frame_size"] - 15,  # MACヘッダを引いたサイズ
-                            "is_ack_required": True,
-                        }],
-                        "preamble_power": c2_info["preamble_power"],
-                        "ed_threshold_dbm": c2_info["ed_threshold_dbm"],
-                    }
-                    all_nodes.append(device_node_2)
-
-
-                    # テンプレートに渡すfメインのコンテキスト
-                context = {
-                    "label": prefix,
-                    "config_filename_prefix": prefix,
-                    "seed": seed,
-                    "sim_time": MEASURE_END_SEC,
-                    "mobility_seed": seed,
-                    "band_name": "DrIotTestBand",
-                    "measure_start": MEASURE_START_SEC,
-                    "measure_end": SIM_DURATION_SEC - 10.0,
-                    "is_6lowpan_enabled": False,
-                    "advertising_channel_number": 0,
-                    "nodes": all_nodes,
-                    "tx_power": 13.010299956639813, # dBm
-                    "trace_tags": MY_TRACE_TAGS,
-                    "cca_mode": "ED_or_CS",
-                }
-
-                # --- ファイル生成 ---
-                try:
-                    # .config
-                    with open(os.path.join(OUTPUT_DIR, f"{prefix}.config"), "w") as f:
-                        f.write(config_template.render(context))
-                    # .pos
-                    with open(os.path.join(OUTPUT_DIR, f"{prefix}.pos"), "w") as f:
-                        f.write(pos_template.render(context))
-                    # .statconfig
-                    with open(os.path.join(OUTPUT_DIR, f"{prefix}.statconfig"), "w") as f:
-                        f.write(stat_template.render(context))
-
-                    total_files += 3
-                except Exception as e:
-                    print(
-                        f"\nError: Problem occurred while generating files for {prefix}.",
-                        file=sys.stderr,
-                    )
-                    print(f"  Details: {e}", file=sys.stderr)
-                    sys.exit(1)
-
-                print(
-                    f"\nCompleted: Generated total {total_files} files."
-                )
+            executor = ProcessPoolExecutor(
+                max_workers=args.workers,
+                initializer=_init_worker,
+                initargs=(previous, template_hash, spec, offsets, args.compact, args.layout, trace_tags),
+            )
+            results = imap_bounded(executor, generate_batch, batches, 4 * args.workers)
+        for records, num_files in results:
+            for prefix, entry, changed, run_entry in records:
+                manifest[prefix] = entry
+                # 座標の表 (node_positions.npy) と同じ配置で生成したランかを解析側で確かめられるようにする
+                run_catalog.add(placement=placement_hash, **run_entry)
+                if changed:
+                    stale.append(run_entry["label"] + ".config")
+            total_points += len(records)
+            total_files += num_files
+            print(f"  processed {total_points}/{stop - start} points ({len(stale)} changed)")
+    except Exception as e:
+        print(
+            f"\nError: Problem occurred while generating files.",
+            file=sys.stderr,
+        )
+        print(f"  Details: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    save_manifest(manifest_file, manifest)
+    run_catalog.save(catalog_file)
+    positions_file = write_positions_table(planner, offsets, placement_hash)
+    # 再シミュレーションが必要な設定ファイルの一覧 (今回の実行で内容が変化したもの)
+    with open(stale_list_file, "w") as f:
+        for config_name in stale:
+            f.write(config_name + "\n")
+
+    elapsed = time.perf_counter() - start_time
+    rate = total_points / elapsed if elapsed > 0 else float("inf")
+    print(
+        f"\nCompleted: Wrote {total_files} files for {len(stale)} changed points "
+        f"({total_points} points in {elapsed:.2f} s, {rate:.1f} points/s)."
+    )
+    print(f"Manifest: {manifest_file}")
+    print(f"Run catalog: {catalog_file} ({len(run_catalog)} runs)")
+    print(f"Node positions: {positions_file}")
+    print(f"Points to re-simulate: {len(stale)} (listed in {stale_list_file})")
 
 if __name__ == "__main__":
     main()
-
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse
 import os
 import sys
 import re
@@ -9,8 +10,16 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mtick
 from collections import defaultdict
-from sklearn.kernel_ridge import KernelRidge
-from statsmodels.nonparametric.smoothers_lowess import lowess
+
+import catalog
+from bootstrap_bands import DEFAULT_LEVEL, bootstrap_bands
+from counters_cache import CACHE_FILE, CountersCache
+from smoothers import DEFAULT_METHOD, SMOOTHERS, smooth
+from stat_reader import EXPERIMENTAL_ERROR, EXPERIMENTAL_FLAG, METRIC_LABEL, stat_counters
+from positions_table import POSITIONS_FILE, load_positions_table, run_positions
+from sweep_stats import STATS_FILE, SweepStats, run_fingerprint
+from sweep_table import build_table
+from trace_parser import COUNTER_NAMES, counters_array, has_run_result, parse_runs
 
 # ★修正：scipyのインポートを削除
 # from scipy import stats 
@@ -20,227 +29,229 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 STATS_DIR = os.path.join(SCRIPT_DIR, "..")  # commandline/
 PLOT_OUTPUT_DIR = os.path.join(STATS_DIR, "plots")
 
-# Regular expression to parse parameters from filenames
-#interf_coord_dist_([\d.]+)m_off_load([\d.]+)_seed(\d+)
-FILENAME_STAT = re.compile(r"coord_dist_([\d.]+)m_off_load([\d.]+)_seed(\d+)\.stat")
-FILENAME_TRACE = re.compile(r"coord_dist_([\d.]+)m_off_load([\d.]+)_seed(\d+)\.trace")
-FILENAME_POS = re.compile(r"coord_dist_([\d.]+)m_off_load([\d.]+)_seed(\d+)\.pos")
-
-# 新しいリスト定義
-FILE_PREFIXES = ["interf", "no_interf"]
+# パターン名と offered load はランカタログ (スイープ仕様から生成したラン) から取る
 # --- Main Logic ---
 
 NUM_COORD = 2
 NUM_DEV_GROUP = 12 # 各グループのデバイス数
 C1_DEV_RANGE = range(NUM_COORD + 1, NUM_COORD + NUM_DEV_GROUP + 1)  # 3 ~ 14
 C2_DEV_RANGE = range(NUM_COORD + NUM_DEV_GROUP + 1, NUM_COORD + (2 * NUM_DEV_GROUP) + 1) # 15 ~ 26
+# (PAN番号, デバイスID, 干渉源のコーディネータID): PAN1 のデバイスは node 2、PAN2 のデバイスは node 1 までの距離
+PANS = [(1, C1_DEV_RANGE, 2), (2, C2_DEV_RANGE, 1)]
 BW1_kHZ = 150.0
 BW2_kHZ = 600.0
 FONT_SIZE = 45
 PATTERN =2
+# 信頼帯 (bootstrap_bands のロバスト LOWESS) と同じ推定量の平滑化
+BAND_SMOOTHERS = ("lowess", "binned_lowess")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="interference 2PAN シナリオの結果を集計・プロットする")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="トレースの解析に使うプロセス数 (1ならシングルプロセス)")
+    parser.add_argument("--source", choices=("trace", "stat"), default="trace",
+                        help="PER の計算に使う出力 (stat: .stat の DrIotMac_* / DrIotCbr_* 統計。トレース不要。"
+                             f"PER は CBR の送受信数から求めるアプリケーション層の値で、図のファイル名・凡例に '{METRIC_LABEL}' を付ける。"
+                             f"実験的な機能なので {EXPERIMENTAL_FLAG} も必要)")
+    parser.add_argument(EXPERIMENTAL_FLAG, action="store_true",
+                        help="実験的な --source stat を使う (.stat の形式・統計名は fake_sim.py に合わせたもので、"
+                             "実際の ./sim の .stat とはまだ照合していない)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"解析済みカウンタのキャッシュ ({CACHE_FILE}) を使わずに全トレースを解析し直す")
+    parser.add_argument("--smoother", choices=tuple(SMOOTHERS), default=DEFAULT_METHOD,
+                        help="距離 vs PER 曲線の平滑化の方法 (既定 binned_lowess。従来の statsmodels の出力は lowess で、点数が多いと遅い。"
+                             "凡例に方法の名前を出す)")
+    parser.add_argument("--bootstrap", type=int, default=0,
+                        help="LOWESS 曲線の信頼帯を求めるシード単位のブートストラップの反復回数 (既定 0 で帯を描かない。"
+                             f"--smoother が {'/'.join(BAND_SMOOTHERS)} のときだけ描く)")
+    parser.add_argument("--table", help="全ランの結果表 (prefix, distance_m, load, seed, pan, node, distance, up_per, down_per) を保存する .npz")
+    args = parser.parse_args()
+    if args.source == "stat" and not args.experimental_stat_source:
+        parser.error(EXPERIMENTAL_ERROR)
+    return args
+
+
+def parse_all_traces(run_catalog, workers, use_cache=True):
+    """
+    カタログの全ラン (全パターン・全 offered load) のトレースをまとめて並列に解析する。
+    use_cache なら、トレースが変わっていないランはキャッシュのカウンタを使う。
+    戻り値: ラベル → カウンタ配列 (len(COUNTER_NAMES), ノードID)
+    """
+    runs = [e for e in run_catalog if has_run_result(run_catalog.path(e, "trace"))]
+    print(f"Parsing {len(runs)} trace files with {workers} workers")
+    cache = CountersCache(os.path.join(STATS_DIR, CACHE_FILE), NUM_DEV_GROUP) if use_cache else None
+    counters = parse_runs([run_catalog.path(e, "trace") for e in runs], NUM_DEV_GROUP, workers, cache=cache)
+    if cache is not None:
+        cache.save()
+    return {e["label"]: counters[i] for i, e in enumerate(runs)}
+
+
+def load_all_stats(run_catalog):
+    """
+    カタログの全ラン (全パターン・全 offered load) の .stat からカウンタを求める (トレースを読まない)。
+    戻り値: ラベル → カウンタ配列 (len(COUNTER_NAMES), ノードID)
+    """
+    runs = [e for e in run_catalog if os.path.exists(run_catalog.path(e, "stat"))]
+    print(f"Reading {len(runs)} stat files")
+    try:
+        return {e["label"]: counters_array(stat_counters(run_catalog.path(e, "stat"), NUM_DEV_GROUP)) for e in runs}
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def build_sweep_table(run_catalog, run_counters, source):
+    """
+    カタログの全ラン (全パターン・全 offered load) の結果表 (1行 = 1ラン × 1デバイス) を作る。
+    カウンタ (ラン × カウンタ × ノードID) と座標 (ラン × ノードID × xy) を積み、距離・PER をまとめて求める。
+    座標は設定生成時の node_positions.npy から引き、表に無いランだけ .pos を読む。
+    戻り値: (結果表, SweepStats.run_key → ランの内容の指紋)
+    """
+    positions_table = load_positions_table(STATS_DIR)
+    runs = []
+    for prefix_name in run_catalog.patterns():
+        for off_load in run_catalog.offered_loads(prefix_name):
+            for run in run_catalog.select(pattern=prefix_name, offered_load=off_load):
+                if run["label"] not in run_counters:
+                    print(f"Skipping seed {run['seed']}: trace file not found")
+                    continue
+                runs.append(run)
+    size = 3 * NUM_DEV_GROUP
+    positions, found, keep = run_positions(run_catalog, runs, size, positions_table)
+    runs = [run for run, k in zip(runs, keep) if k]
+    counters = np.stack([run_counters[run["label"]] for run in runs]) if runs else np.zeros((0, len(COUNTER_NAMES), size))
+    print(f"Node positions: {int(found[keep].sum())} runs from {POSITIONS_FILE}, {int((~found[keep]).sum())} from .pos files")
+    fingerprints = {SweepStats.run_key(run["pattern"], run["distance_m"], run["offered_load"], run["seed"]):
+                    run_fingerprint(counters[i], source) for i, run in enumerate(runs)}
+    return build_table(runs, counters, positions[keep], PANS), fingerprints
+
+
+def distance_tag(distance_m, distances):
+    """コーディネータ間距離が複数あるときに図のファイル名に付ける文字列 (1つなら従来のファイル名のまま)"""
+    return f"_coord_dist_{distance_m:g}m" if len(distances) > 1 else ""
+
 
 def main():
-    for prefix_name in FILE_PREFIXES:
+    args = parse_args()
+    if not os.path.isdir(STATS_DIR):
+        print(
+            f"Error: Statistics directory not found at '{STATS_DIR}'", file=sys.stderr
+        )
+        sys.exit(1)
+
+    # 入出力ファイルはランカタログから引く (カタログが無い場合は一度だけ走査して作る)
+    run_catalog = catalog.load_catalog(STATS_DIR)
+    print(f"Loaded run catalog: {len(run_catalog)} runs")
+    if args.source == "stat":
+        run_counters = load_all_stats(run_catalog)
+    else:
+        run_counters = parse_all_traces(run_catalog, args.workers, not args.no_cache)
+    # .stat の PER はトレースの (MAC の) PER とは別の指標なので、図のファイル名・凡例で区別する
+    metric = METRIC_LABEL if args.source == "stat" else None
+    tag = f"_{metric}" if metric else ""
+    if args.bootstrap > 0 and args.smoother not in BAND_SMOOTHERS:
+        print(f"Note: --bootstrap is ignored with --smoother {args.smoother} "
+              f"(the bands are for {'/'.join(BAND_SMOOTHERS)})", file=sys.stderr)
+        args.bootstrap = 0
+    table, fingerprints = build_sweep_table(run_catalog, run_counters, args.source)
+    print(f"Built sweep table: {len(table)} rows")
+    # コーディネータ間距離ごとに分けて描く (別の配置のランを同じ曲線に混ぜない)
+    distances = np.unique(table["distance_m"]).tolist()
+    if args.table:
+        table.save(args.table)
+        print(f"Saved sweep table to {args.table}")
+
+    # 相関係数・平均 PER は要約統計から求める。統計は毎回この結果表から集計し直すので、
+    # 再実行したラン・計測区間の変更・--source の切り替えも必ず反映される (保存するのは merge / show 用)
+    stats = SweepStats()
+    stats.add_table(table, fingerprints)
+    stats.save(os.path.join(STATS_DIR, STATS_FILE))
+    print(f"Summary stats: {len(stats)} runs (saved to {STATS_FILE})")
+
+    for prefix_name in run_catalog.patterns():
 
         print(f"\n===== Processing {prefix_name} files =====\n")
 
         """Main execution function."""
         print("--- Starting Result Aggregation and Plotting ---")
 
-        corr_up1_list = []
-        corr_down1_list = []
-        corr_up2_list = []
-        corr_down2_list = []
-
-        for off_load in np.round(np.arange(0.1, 1.1, 0.1),1):
+        offered_loads = run_catalog.offered_loads(prefix_name)
+        for off_load in offered_loads:
             print("start offered_load:", off_load)
-            distance_to_interference_pan1 = []
-            up_per_all_pan1 = []
-            down_per_all_pan1 = []
-            
-            distance_to_interference_pan2 = []
-            up_per_all_pan2 = []
-            down_per_all_pan2 = []
-
-            if not os.path.isdir(STATS_DIR):
-                print(
-                    f"Error: Statistics directory not found at '{STATS_DIR}'", file=sys.stderr
-                )
-                sys.exit(1)
-
-            # Find all .stat files
-            stat_files = [f for f in os.listdir(STATS_DIR) 
-                                if f.endswith(".stat") and f.startswith(prefix_name) and f"off_load{off_load}" in f]
-            trace_files = [f for f in os.listdir(STATS_DIR) 
-                                    if f.endswith(".trace") and f.startswith(prefix_name) and f"off_load{off_load}" in f]
-            pos_files = [f for f in os.listdir(STATS_DIR) 
-                                if f.endswith(".pos") and f.startswith(prefix_name) and f"off_load{off_load}" in f]
+            # Find all .stat, .trace and .pos files of this offered load
+            runs = run_catalog.select(pattern=prefix_name, offered_load=off_load)
+            stat_files = [e for e in runs if os.path.exists(run_catalog.path(e, "stat"))]
+            # トレースを削除・圧縮済みでも、カウンタ (.counters.npz) があれば結果として使う
+            trace_files = [e for e in runs if has_run_result(run_catalog.path(e, "trace"))]
+            pos_files = [e for e in runs if os.path.exists(run_catalog.path(e, "pos"))]
             if not (stat_files or trace_files or pos_files):
-                print("Warning: No .stat, .trace, or _seed0.pos files found. Nothing to plot.", file=sys.stderr)
-                return
+                print(f"Warning: No .stat, .trace, or .pos files found for {prefix_name} at load {off_load}. Nothing to plot.",
+                      file=sys.stderr)
+                continue
 
             print(f"Found {len(stat_files)} stat files to process.")
             print(f"Found {len(trace_files)} trace files to process.")
             print(f"Found {len(pos_files)} pos files to process.")
 
-            # Data container for all runs
-            results = {
-                "up_data_pdr_list":collections.defaultdict(list),
-                "down_data_pdr_list":collections.defaultdict(list),
-            }
-
-            #seedごとの統計情報をtraceファイルから取り、perを計算し格納
-            for filename in trace_files:
-                match = FILENAME_TRACE.match(filename.replace(f"{prefix_name}_", ""))
-                if not match:
-                    print(f"Skipping file with unexpected name format: {filename}")
-                    continue
-                off_load = round(float(match.group(2)), 1)
-                seed = int(match.group(3))
-
-                filepath = os.path.join(STATS_DIR, filename)
-                #print(filepath)
-                up_data_pdr_list, down_data_pdr_list= node_parse_trace_file(filepath, NUM_DEV_GROUP)
-                #print(up_data_pdr_list, down_data_pdr_list)
-                results["up_data_pdr_list"][seed]=up_data_pdr_list
-                results["down_data_pdr_list"][seed]=down_data_pdr_list
-
-            #print(filename)
-            #print(results)
-            #print(results["up_data_pdr_list"])    
-            """
-            距離ごとのシミュレーション回数分の結果が出ているので、距離ごとで平均をとる
-            """
-            # average_up_data_pdr_dict = calculate_node_seed_average(
-            #         results["up_data_pdr_list"]
-            # )
-            # average_down_data_pdr_dict = calculate_node_seed_average(
-            #         results["down_data_pdr_list"]
-            # )
-
-            """
-            pdrの比
-            """
-            # up_down_pdr_diff = defaultdict(list)
-            # for seed in list(range(10)):
-            #     for node_id in range(33):
-            #         diff = round(average_down_data_pdr_dict[seed][node_id]/average_up_data_pdr_dict[seed][node_id],2)
-            #         up_down_pdr_diff[seed].append(diff)
-
-
-            #求めた距離ごとのノードの平均を二次元平面上にプロット
-            #print(results)
-            for filename in pos_files:
-                print(filename)
-                match = FILENAME_POS.match(filename.replace(f"{prefix_name}_", ""))
-                if not match:
-                    print(f"Skipping file with unexpected name format: {filename}")
-                    continue
-
-                off_load = round(float(match.group(2)), 1)
-                seed = int(match.group(3))
-
-                #posファイルから場所を特定
-                positions = parse_pos_file(filename)
-                # print(positions)
-                for device_id in C1_DEV_RANGE:
-                    d = np.sqrt((positions[device_id][0] - positions[2][0])**2 + (positions[device_id][1] - positions[2][1])**2)
-                    distance_to_interference_pan1.append(d)
-                    up_per_all_pan1.append(results["up_data_pdr_list"][seed][device_id])
-                    down_per_all_pan1.append(results["down_data_pdr_list"][seed][device_id])
-
-                # print("seed:",seed)
-                # print(positions)
-                # print(distance_to_interference_pan1)
-                # print(per_all_pan1)
-                
-                for device_id in C2_DEV_RANGE:
-                    d = np.sqrt((positions[device_id][0] - positions[1][0])**2 + (positions[device_id][1] - positions[1][1])**2)
-                    distance_to_interference_pan2.append(d)
-                    up_per_all_pan2.append(results["up_data_pdr_list"][seed][device_id])
-                    down_per_all_pan2.append(results["down_data_pdr_list"][seed][device_id])
-
-                #print(distance_to_interference_pan2)
-
-                """
-                グラフのプロット
-                """
-                # plot_positions_and_values(positions, f"{prefix_name}_seed{seed}_up_data_pdr_plot.png", average_up_data_pdr_dict[seed], BW1_kHZ, BW2_kHZ)
-                # plot_positions_and_values(positions, f"{prefix_name}_seed{seed}_down_data_pdr_plot.png", average_down_data_pdr_dict[seed], BW1_kHZ, BW2_kHZ)
-                #plot_positions_and_values(positions, f"{prefix_name}_seed{seed}_pdr_diff_plot.png", up_down_pdr_diff[seed], BW1_kHZ, BW2_kHZ)
-            
-            plot_distance_vs_per(distance_to_interference_pan1, up_per_all_pan1, f"{off_load}_{prefix_name}_up_data_per_pan1.png","blue")
-            plot_distance_vs_per(distance_to_interference_pan1, down_per_all_pan1, f"{off_load}_{prefix_name}_down_data_per_pan1.png", "red")
-            plot_distance_vs_per_up_down(distance_to_interference_pan1,up_per_all_pan1,down_per_all_pan1,f"{off_load}_{prefix_name}_per_pan1.png")
-            plot_distance_vs_per(distance_to_interference_pan2, up_per_all_pan2, f"{off_load}_{prefix_name}_up_data_per_pan2.png", "blue")
-            plot_distance_vs_per(distance_to_interference_pan2, down_per_all_pan2, f"{off_load}_{prefix_name}_down_data_per_pan2.png", "red")
-            plot_distance_vs_per_up_down(distance_to_interference_pan2,up_per_all_pan2,down_per_all_pan2,f"{off_load}_{prefix_name}_per_pan2.png")
-            
-            distance_to_interference_pan1 = np.asarray(distance_to_interference_pan1)
-            up_per_all_pan1 = np.asarray(up_per_all_pan1)
-            down_per_all_pan1 = np.asarray(down_per_all_pan1)
-
-            idx = np.argsort(distance_to_interference_pan1)
-            distance_pan1_sorted = distance_to_interference_pan1[idx]
-            up_per_pan1_sorted = up_per_all_pan1[idx]
-            down_per_pan1_sorted = down_per_all_pan1[idx]
-
-
-            plot_distance_vs_per_lowess(
-                distance_pan1_sorted,
-                up_per_pan1_sorted,
-                down_per_pan1_sorted,
-                f"{off_load}_{prefix_name}_pan1_lowess.png"
-            )
-            distance_to_interference_pan2 = np.asarray(distance_to_interference_pan2)
-            up_per_all_pan2 = np.asarray(up_per_all_pan2)
-            down_per_all_pan2 = np.asarray(down_per_all_pan2)
-            idx = np.argsort(distance_to_interference_pan2)
-            distance_pan2_sorted = distance_to_interference_pan2[idx]
-            up_per_pan2_sorted = up_per_all_pan2[idx]
-            down_per_pan2_sorted = down_per_all_pan2[idx]
-            plot_distance_vs_per_lowess(
-                distance_pan2_sorted,
-                up_per_pan2_sorted,
-                down_per_pan2_sorted,
-                f"{off_load}_{prefix_name}_pan2_lowess.png"
-            )
-
-
-
-            corr = np.corrcoef(distance_to_interference_pan1, up_per_all_pan1)[0, 1]
-            corr_up1_list.append(corr)
-            
-            corr = np.corrcoef(distance_to_interference_pan1, down_per_all_pan1)[0, 1]
-            corr_down1_list.append(corr)
-
-            corr = np.corrcoef(distance_to_interference_pan2, up_per_all_pan2)[0, 1]
-            corr_up2_list.append(corr)
-
-            corr = np.corrcoef(distance_to_interference_pan2, down_per_all_pan2)[0, 1]
-            corr_down2_list.append(corr)
+            # このパターン・offered load の行を結果表から取り出し、コーディネータ間距離・PAN ごとに描く
+            load_rows = table.select(prefix=prefix_name, load=off_load)
+            for distance_m in distances:
+                rows = load_rows.select(distance_m=distance_m)
+                name = f"{off_load}_{prefix_name}{tag}{distance_tag(distance_m, distances)}"
+                for pan, _, _ in PANS:
+                    pan_rows = rows.select(pan=pan)
+                    distance, up_per, down_per = pan_rows["distance"], pan_rows["up_per"], pan_rows["down_per"]
+                    plot_distance_vs_per(distance, up_per, f"{name}_up_data_per_pan{pan}.png", "blue")
+                    plot_distance_vs_per(distance, down_per, f"{name}_down_data_per_pan{pan}.png", "red")
+                    plot_distance_vs_per_up_down(distance, up_per, down_per, f"{name}_per_pan{pan}.png", metric=metric)
+
+                    sorted_rows = pan_rows.sorted_by("distance")
+                    bands = None
+                    if args.bootstrap > 0:
+                        bands = bootstrap_bands(distance, np.column_stack([up_per, down_per]), pan_rows["seed"],
+                                                replicates=args.bootstrap, workers=args.workers)
+                    plot_distance_vs_per_lowess(
+                        sorted_rows["distance"],
+                        sorted_rows["up_per"],
+                        sorted_rows["down_per"],
+                        f"{name}_pan{pan}_lowess.png",
+                        bands=bands,
+                        smoother=args.smoother,
+                        metric=metric
+                    )
+
+                for pan, _, _ in PANS:
+                    print(f"  {distance_m:g} m pan{pan}: "
+                          f"mean PER up {stats.mean_per(prefix_name, distance_m, off_load, pan, 'up'):.4f}, "
+                          f"down {stats.mean_per(prefix_name, distance_m, off_load, pan, 'down'):.4f}")
 
             print(f"{off_load}_{prefix_name}__per.png finish")
 
-        x = np.arange(0.1, 1.1, 0.1)
+        x = offered_loads
+        for distance_m in distances:
+            corr_up_lists = {pan: [stats.correlation(prefix_name, distance_m, load, pan, "up") for load in x]
+                             for pan, _, _ in PANS}
+            corr_down_lists = {pan: [stats.correlation(prefix_name, distance_m, load, pan, "down") for load in x]
+                               for pan, _, _ in PANS}
 
-        plt.figure(figsize=(8, 6))
+            plt.figure(figsize=(8, 6))
 
-        plt.plot(x, corr_up1_list, marker='o', label='corr_up1_list')
-        plt.plot(x, corr_down1_list, marker='s', label='corr_down1_list')
-        plt.plot(x, corr_up2_list, marker='^', label='corr_up2_list')
-        plt.plot(x, corr_down2_list, marker='x', label='corr_down2_list')
+            plt.plot(x, corr_up_lists[1], marker='o', label='corr_up1_list')
+            plt.plot(x, corr_down_lists[1], marker='s', label='corr_down1_list')
+            plt.plot(x, corr_up_lists[2], marker='^', label='corr_up2_list')
+            plt.plot(x, corr_down_lists[2], marker='x', label='corr_down2_list')
 
-        plt.xlabel("Offered Load")
-        plt.ylabel("Correlation Coefficient")
-        plt.title("Correlation vs Offered Load")
+            plt.xlabel("Offered Load")
+            plt.ylabel("Correlation Coefficient")
+            plt.title("Correlation vs Offered Load")
 
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
+            plt.legend()
+            plt.grid(True)
+            plt.tight_layout()
 
-        plt.savefig(f"{prefix_name}__correlation_vs_offered_load.png", dpi=300)
-        plt.show()
+            plt.savefig(f"{prefix_name}{tag}{distance_tag(distance_m, distances)}__correlation_vs_offered_load.png", dpi=300)
+            plt.show()
 
 
 def plot_distance_vs_per_lowess(
@@ -250,7 +261,10 @@ def plot_distance_vs_per_lowess(
     filename,
     frac=0.2,
     point_size=50,
-    alpha=0.2
+    alpha=0.2,
+    bands=None,
+    smoother=DEFAULT_METHOD,
+    metric=None
 ):
     """
     距離 vs PER の散布図と LOWESS 曲線（uplink / downlink）を描画する
@@ -271,27 +285,42 @@ def plot_distance_vs_per_lowess(
         散布図の点サイズ
     alpha : float
         散布図の透過率
+    bands : tuple or None
+        bootstrap_bands の戻り値 (格子点, 下限, 上限)。列は uplink, downlink の順。None なら帯を描かない
+    smoother : str
+        曲線の平滑化の方法 (smoothers.SMOOTHERS のキー)
+    metric : str or None
+        PER の種類 (stat_reader.METRIC_LABEL など)。指定すると凡例に付ける
     """
     
 
 
-    # LOWESS
-    lowess_ul = lowess(up_per, distance, frac=frac, return_sorted=True)
-    lowess_dl = lowess(down_per, distance, frac=frac, return_sorted=True)
+    # 平滑化曲線 (既定は binned_lowess。格子点で評価する)
+    grid_ul, curve_ul = smooth(distance, up_per, smoother, frac)
+    grid_dl, curve_dl = smooth(distance, down_per, smoother, frac)
 
+    suffix = f" ({metric} PER)" if metric else ""
     plt.figure(figsize=(13, 10))
 
     # Scatter
     plt.scatter(distance, up_per,
-                s=point_size, alpha=alpha, color="blue", label="Uplink")
+                s=point_size, alpha=alpha, color="blue", label=f"Uplink{suffix}")
     plt.scatter(distance, down_per,
-                s=point_size, alpha=alpha, color="red", label="Downlink")
-
-    # LOWESS lines
-    plt.plot(lowess_ul[:, 0], lowess_ul[:, 1],
-             color="blue", linewidth=2, label="Uplink (LOWESS)")
-    plt.plot(lowess_dl[:, 0], lowess_dl[:, 1],
-             color="red", linewidth=2, label="Downlink (LOWESS)")
+                s=point_size, alpha=alpha, color="red", label=f"Downlink{suffix}")
+
+    # Bootstrap confidence bands
+    if bands is not None:
+        grid, lower, upper = bands
+        plt.fill_between(grid, lower[:, 0], upper[:, 0], color="blue", alpha=0.25, linewidth=0,
+                         label=f"Uplink ({DEFAULT_LEVEL:.0%} CI)")
+        plt.fill_between(grid, lower[:, 1], upper[:, 1], color="red", alpha=0.25, linewidth=0,
+                         label=f"Downlink ({DEFAULT_LEVEL:.0%} CI)")
+
+    # Smoothed lines (凡例には選んだ平滑化の方法を出す)
+    plt.plot(grid_ul, curve_ul,
+             color="blue", linewidth=2, label=f"Uplink ({smoother})")
+    plt.plot(grid_dl, curve_dl,
+             color="red", linewidth=2, label=f"Downlink ({smoother})")
 
     #plt.xlabel("d [m]", fontsize=FONT_SIZE + 20)
     #plt.ylabel("PER",fontsize=FONT_SIZE+20)
@@ -319,10 +348,11 @@ def plot_distance_vs_per_lowess(
     plt.close()
 
 
-def plot_distance_vs_per_up_down(distance, up_per, down_per, filename):
+def plot_distance_vs_per_up_down(distance, up_per, down_per, filename, metric=None):
+    suffix = f" ({metric} PER)" if metric else ""
     plt.figure(figsize=(13, 10))
-    plt.scatter(distance, up_per, color='blue', marker='o', s=50, label='UpLink')
-    plt.scatter(distance, down_per, color='red', marker='o', s=50, label='DownLink')
+    plt.scatter(distance, up_per, color='blue', marker='o', s=50, label=f'UpLink{suffix}')
+    plt.scatter(distance, down_per, color='red', marker='o', s=50, label=f'DownLink{suffix}')
 
     #plt.xlabel("d [m]",fontsize=65)
     #plt.ylabel("PER",fontsize=65)
@@ -428,74 +458,6 @@ def parse_pos_file(filepath):
     return positions
 
 
-def node_parse_trace_file(filepath,num_device):
-    #device → coordinator
-    coordinator_receive_list = [0 for _ in range(3 * num_device)]
-    device_dequed_list = [0 for _ in range(3 * num_device)]
-    device_received_ack_list = [0 for _ in range(3 * num_device)]
-
-    #coordinator → device
-    coordinator_dequed_list = [0 for _ in range(3 * num_device)]
-    device_receive_list = [0 for _ in range(3 * num_device)]
-
-    up_data_pdr_list = [0 for _ in range(3 * num_device)]
-    down_data_pdr_list = [0 for _ in range(3 * num_device)]
-
-    SENDER_ID_RANGE1 = [int(i) for i in range(3, num_device + 3)] 
-
-    with open(filepath, "r") as f:
-        for line in f:
-            parts = line.split()
-            if not parts:
-                continue
-
-            #coordinator
-            if "DrIotMac" in parts[5] and ( "1" == parts[3] or  "2" == parts[3]):
-                #coordinatorが送信機
-                if "DataFrameDequeued" in parts[9]:
-                    devicenum_ber = int(parts[15])
-                    coordinator_dequed_list[devicenum_ber] += 1
-
-                #coordinatorが受信機
-                if "RxFrame" in parts[9]:
-                    pkt_id = parts[11]
-                    devicenum_ber = int(pkt_id.split('_')[0])
-                    if "Data" in parts[15]:
-                        coordinator_receive_list[devicenum_ber] += 1
-                        if devicenum_ber in SENDER_ID_RANGE1:
-                            coordinator_receive_list[1] += 1
-                        else:
-                            coordinator_receive_list[2] += 1
-
-            #device
-            if "DrIotMac" in parts[5] and parts[3]!= "1" and parts[3]!= "2":
-                devicenum_ber = int(parts[3])
-                # if "Tx-DATA" in parts[9]:
-                #     num_retry =  int(parts[13])
-                #     device_currentRetry_list[devicenum_ber] = num_retry
-
-                if "DataFrameDequeued" in parts[9] :
-                    device_dequed_list[devicenum_ber] += 1
-                    if devicenum_ber in SENDER_ID_RANGE1:
-                        device_dequed_list[1] += 1
-                    else:
-                        device_dequed_list[2] += 1
-
-                if "RxFrame" in parts[9]: 
-                    if "ACK" in parts[15]:
-                        device_received_ack_list[devicenum_ber] += 1
-                    
-                    if "Data" in parts[15]:
-                        device_receive_list[devicenum_ber] +=  1
-
-        for device_id in range(3 * num_device):
-            if device_dequed_list[device_id]  != 0 and coordinator_dequed_list[device_id] != 0:
-                up_data_pdr_list[device_id] =  round((device_dequed_list[device_id] - coordinator_receive_list[device_id])/device_dequed_list[device_id],3)
-                down_data_pdr_list[device_id] =  round((coordinator_dequed_list[device_id] - device_receive_list[device_id])/coordinator_dequed_list[device_id],3)
-        
-        return up_data_pdr_list, down_data_pdr_list
-
-
 def plot_positions_and_values(positions, filename, metric_values, bw1_khz, bw2_khz):
     """
     ノードの位置をプロットし、対応する値を座標の隣にオーバーレイする。
@@ -2,7 +2,9 @@
 # -*- coding: utf-8 -*-
 """
 Simulation Position Plotting Script
-This script reads .pos files, plots node positions, and saves the plots.
+This script reads node positions, plots them, and saves the plots.
+Positions come from node_positions.npy written by interference_2pan_config.py;
+.pos files are parsed only for runs that are not in that table.
 """
 
 import os
@@ -13,6 +15,9 @@ import numpy as np
 import matplotlib.ticker as ticker
 from matplotlib.ticker import MultipleLocator
 
+import catalog
+from positions_table import POSITIONS_FILE, load_positions_table
+
 # --- Configuration ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 # 修正: プロットの出力先をスクリプトの1つ上の階層に設定
@@ -43,6 +48,18 @@ def parse_pos_file(filepath):
                     positions[node_id] = (x, y)
     return positions
 
+def table_positions(positions_table, run):
+    """Looks up node positions (km) of a run in the positions table, or None
+    (also None if the run was generated with a different placement than the table)."""
+    if positions_table is None:
+        return None
+    xy = positions_table.get_run(run)
+    if xy is None:
+        return None
+    return {node_id: (x / 1000.0, y / 1000.0) for node_id, (x, y) in enumerate(xy.tolist())
+            if not np.isnan(x)}
+
+
 def plot_positions(positions, filename):
     """
     Plots node positions with different markers for coordinators and devices.
@@ -137,27 +154,34 @@ def main():
         print(f"Error: Position directory not found at '{POS_DIR}'", file=sys.stderr)
         sys.exit(1)
 
-    pos_files = [f for f in os.listdir(POS_DIR) if f.endswith(".pos")]
-    if not pos_files:
-        print("Warning: No .pos files found. Nothing to plot.", file=sys.stderr)
+    # .posファイルはランカタログから引く (seed 0 のみ描画する)
+    run_catalog = catalog.load_catalog(POS_DIR)
+    positions_table = load_positions_table(POS_DIR)
+    runs = []
+    num_from_table = 0
+    for e in run_catalog:
+        if e["seed"] != 0:
+            continue
+        positions = table_positions(positions_table, e)
+        if positions is not None:
+            num_from_table += 1
+        elif not os.path.exists(run_catalog.path(e, "pos")):
+            continue
+        runs.append((e, positions))
+    if not runs:
+        print("Warning: No node positions or .pos files found. Nothing to plot.", file=sys.stderr)
         return
 
-    print(f"Found {len(pos_files)} position files to process.")
+    print(f"Found {len(runs)} runs to process ({num_from_table} from {POSITIONS_FILE}, "
+          f"{len(runs) - num_from_table} from .pos files).")
     # plotsディレクトリを作成しないように、os.makedirsを削除
     
-    for pos_file in pos_files:
-        match = FILENAME_RE.match(pos_file)
-        if not match:
-            print(f"Skipping file with unexpected name format: {pos_file}"); continue
-        
-        seed = int(match.group(3))
-        if seed == 0:
-            filepath = os.path.join(POS_DIR, pos_file)
+    for run, positions in runs:
+        filepath = run_catalog.path(run, "pos")
+        if positions is None:
             positions = parse_pos_file(filepath)
-            if positions:
-                plot_positions(positions, pos_file)
-        else:
-            print(f"Skipping file: {pos_file} (seed != 0)")
+        if positions:
+            plot_positions(positions, os.path.basename(filepath))
 
     print("\n--- Script finished successfully. ---")
 
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+ノード座標の表 (node_positions.npy)
+
+機能:
+- 設定生成時に placement で作った全 seed 分の座標を、スイープごとに1つのバイナリ (.npy) に書き出す。
+  配列は [距離, seed, ノードID, xy] (m)。添字はノードIDそのもので、ID 0 (未使用) は NaN。
+- 距離・seed の一覧とノードごとの PAN 番号 (0 始まり, ID 0 は -1)、配置の入力のハッシュ
+  (配置方法・格子など。interference_2pan_config.hash_placement) は node_positions_index.npz に置く。
+- 表は (距離, seed) だけで引くので、カタログのランの placement が表のハッシュと一致するときだけ表を使う。
+  前の生成で作られたまま残っているランや、ハッシュを持たない古いカタログ・表のランは .pos から読む。
+- 解析側は np.load(mmap_mode="r") で開き、(距離, seed) の組を配列の添字で引くだけで座標が得られる。
+  ランごとの .pos を開いて1行ずつ解析する必要がない。
+"""
+
+import os
+
+import numpy as np
+
+from sweep_table import read_positions
+
+POSITIONS_FILE = "node_positions.npy"
+POSITIONS_INDEX_FILE = "node_positions_index.npz"
+
+
+def save_positions_table(root, distances, seeds, positions, pan_of_node, placement_hash):
+    """
+    座標の表を一時ファイル経由で原子的に書き出す。
+    positions: [距離, seed, ノード, xy] (ノードはID順で ID 1 から), pan_of_node: [ノード] の PAN 番号,
+    placement_hash: 配置の入力のハッシュ (カタログの各ランの placement と照合する)
+    """
+    positions = np.asarray(positions, dtype=float)
+    num_distance, num_seed, num_nodes, _ = positions.shape
+    table = np.full((num_distance, num_seed, num_nodes + 1, 2), np.nan)
+    table[:, :, 1:, :] = positions
+    pans = np.concatenate([[-1], np.asarray(pan_of_node, dtype=np.int64)])
+
+    path = os.path.join(root, POSITIONS_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, table)
+    os.replace(tmp_path, path)
+    index_path = os.path.join(root, POSITIONS_INDEX_FILE)
+    tmp_path = index_path + ".tmp.npz"
+    np.savez(tmp_path, distances_m=np.asarray(distances, dtype=float),
+             seeds=np.asarray(seeds, dtype=np.int64), pan_of_node=pans, placement_hash=str(placement_hash))
+    os.replace(tmp_path, index_path)
+    return path
+
+
+class PositionsTable:
+    """(距離, seed) → ノードIDを添字とする座標 [ノードID, xy] (m)"""
+
+    def __init__(self, positions, distances, seeds, pan_of_node, placement_hash=None):
+        self.positions = positions
+        self.distances = np.asarray(distances, dtype=float)
+        self.seeds = np.asarray(seeds, dtype=np.int64)
+        self.pan_of_node = np.asarray(pan_of_node, dtype=np.int64)
+        self.placement_hash = placement_hash
+
+    def matches(self, run):
+        """カタログのランが表と同じ配置で生成されたか (どちらかにハッシュが無ければ False)"""
+        return self.placement_hash is not None and run.get("placement") == self.placement_hash
+
+    @property
+    def num_nodes(self):
+        return self.positions.shape[2] - 1
+
+    def lookup(self, distances, seeds):
+        """
+        (距離, seed) の組ごとの座標をまとめて引く。
+        戻り値: (座標 [組, ノードID, xy], 表にあるか [組])。無い組の座標は NaN
+        """
+        distances = np.asarray(distances, dtype=float)
+        seeds = np.asarray(seeds, dtype=np.int64)
+        d = np.searchsorted(self.distances, distances)
+        d = np.clip(d, 0, len(self.distances) - 1)
+        s = np.clip(np.searchsorted(self.seeds, seeds), 0, len(self.seeds) - 1)
+        found = np.isclose(self.distances[d], distances) & (self.seeds[s] == seeds)
+        out = np.full((len(distances),) + self.positions.shape[2:], np.nan)
+        out[found] = self.positions[d[found], s[found]]
+        return out, found
+
+    def get(self, distance_m, seed):
+        """1ランの座標 [ノードID, xy]。表に無ければ None"""
+        positions, found = self.lookup([distance_m], [seed])
+        return positions[0] if found[0] else None
+
+    def get_run(self, run):
+        """カタログのランの座標 [ノードID, xy]。表に無いか、配置のハッシュが合わなければ None"""
+        return self.get(run["distance_m"], run["seed"]) if self.matches(run) else None
+
+
+def run_positions(run_catalog, runs, size, positions_table=None):
+    """
+    カタログのランのノード座標をまとめて求める。表にあって配置のハッシュが一致するランは表から、
+    それ以外のランは .pos から読む。
+    戻り値: (座標 [ラン, ノードID (size 個), xy], 表から引いたか [ラン], 座標があるか [ラン])
+    """
+    positions = np.full((len(runs), size, 2), np.nan)
+    found = np.zeros(len(runs), dtype=bool)
+    if positions_table is not None and runs:
+        table_positions, found = positions_table.lookup([run["distance_m"] for run in runs],
+                                                        [run["seed"] for run in runs])
+        found &= np.array([positions_table.matches(run) for run in runs], dtype=bool)
+        table_positions[~found] = np.nan
+        num_ids = min(size, table_positions.shape[1])
+        positions[:, :num_ids] = table_positions[:, :num_ids]
+    available = found.copy()
+    for i in np.flatnonzero(~found):
+        pos_path = run_catalog.path(runs[i], "pos")
+        if os.path.exists(pos_path):
+            positions[i] = read_positions(pos_path, size)
+            available[i] = True
+    return positions, found, available
+
+
+def load_positions_table(root):
+    """root の座標の表をメモリマップで開く。無い・読めなければ None"""
+    try:
+        positions = np.load(os.path.join(root, POSITIONS_FILE), mmap_mode="r")
+        with np.load(os.path.join(root, POSITIONS_INDEX_FILE)) as index:
+            distances, seeds, pans = index["distances_m"], index["seeds"], index["pan_of_node"]
+            placement_hash = str(index["placement_hash"]) if "placement_hash" in index else None
+    except (OSError, KeyError, ValueError):
+        return None
+    order_d, order_s = np.argsort(distances), np.argsort(seeds)
+    if not (np.array_equal(order_d, np.arange(len(distances))) and np.array_equal(order_s, np.arange(len(seeds)))):
+        # 距離・seed を昇順に並べ替える (searchsorted で引くため。並べ替えた分はメモリに読み込む)
+        positions = np.asarray(positions)[order_d][:, order_s]
+        distances, seeds = distances[order_d], seeds[order_s]
+    return PositionsTable(positions, distances, seeds, pans, placement_hash)
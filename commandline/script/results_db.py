@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全スイープの結果データベース (SQLite, results.sqlite)
+
+機能:
+- ランのメタデータ (スイープ, ラベル, pattern, 距離, offered load, seed) を runs 表に、
+  ノードごとの配置 (座標, 自PAN・干渉源のコーディネータまでの距離)、カウンタ (trace_parser.COUNTER_NAMES)、
+  指標 (metrics_from_counters) を nodes 表に入れる。
+- runs は (pattern, offered_load, seed)、nodes は (pan, node) と (run_id, node) の索引を持つ。
+- ingest はカタログの各ランの結果 (トレース・カウンタ、または .stat) の大きさ・更新時刻を記録し、
+  変わっていないランは読み直さない。トレースの解析は parse_runs とカウンタのキャッシュを使う。
+  複数のスイープ (出力ディレクトリ) を --sweep の名前で区別して1つのデータベースに入れられる。
+  runs は (スイープ, ラベル, source) ごとに1行で、同じランの trace と stat の結果は別の行として共存する
+  (PER の意味が違うので、集計では source で選ぶ)。--source stat は実験的な機能で --experimental-stat-source が必要。
+- ResultsDB.nodes / sweep_table で条件に合う行を列ごとの NumPy 配列 (または SweepTable) として取り出せる。
+  query で任意の SQL を実行できる。
+
+実行方法 (commandline/ で実行):
+    python3 ./script/results_db.py ingest
+    python3 ./script/results_db.py ingest --root /data/sweep2 --sweep sweep2
+    python3 ./script/results_db.py query "SELECT pattern, offered_load, pan, AVG(up_per) FROM nodes JOIN runs USING (run_id) WHERE role = 'device' AND source = 'trace' GROUP BY 1, 2, 3"
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+import catalog
+from counters_cache import CACHE_FILE, CountersCache, fingerprint
+from positions_table import load_positions_table, run_positions
+from stat_reader import EXPERIMENTAL_ERROR, EXPERIMENTAL_FLAG, stat_counters
+from sweep_table import SweepTable, per_arrays
+from trace_parser import COORDINATOR_IDS, COUNTER_NAMES, counters_array, counters_dict, has_run_result, metrics_from_counters, parse_runs
+
+# --- Configuration ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROOT = os.path.join(SCRIPT_DIR, "..")  # commandline/
+DB_FILE = "results.sqlite"
+DB_VERSION = 2
+DEFAULT_NUM_DEVICE = 12  # interference_2pan_plot_results.py の NUM_DEV_GROUP
+
+METRIC_NAMES = ("up_per", "down_per", "ack_ratio", "retries_per_frame", "access_failure_rate",
+                "coordinator_retries_per_frame", "coordinator_access_failure_rate")
+NODE_COLUMNS = (("node", "INTEGER NOT NULL"), ("pan", "INTEGER NOT NULL"), ("role", "TEXT NOT NULL"),
+                ("x", "REAL"), ("y", "REAL"), ("distance_to_coordinator", "REAL"), ("distance_to_interferer", "REAL")) \
+    + tuple((name, "INTEGER") for name in COUNTER_NAMES) + tuple((name, "REAL") for name in METRIC_NAMES)
+RUN_FILTERS = ("sweep", "pattern", "distance_m", "offered_load", "seed", "source")
+NODE_FILTERS = ("pan", "node", "role")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    sweep TEXT NOT NULL,
+    label TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    distance_m REAL NOT NULL,
+    offered_load REAL NOT NULL,
+    seed INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    result_size INTEGER,
+    result_mtime_ns INTEGER,
+    ingested_at REAL,
+    UNIQUE (sweep, label, source)
+);
+CREATE INDEX IF NOT EXISTS runs_pattern_load_seed ON runs (pattern, offered_load, seed);
+CREATE TABLE IF NOT EXISTS nodes (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    {", ".join(f"{name} {kind}" for name, kind in NODE_COLUMNS)},
+    PRIMARY KEY (run_id, node)
+);
+CREATE INDEX IF NOT EXISTS nodes_pan_node ON nodes (pan, node);
+"""
+
+
+def _key_load(value):
+    """offered load は小数第6位に丸めて保存・検索する (浮動小数の誤差で一致しなくなるのを防ぐ)"""
+    return round(float(value), 6)
+
+
+def node_rows(counters, positions, num_device):
+    """
+    1ランのノードごとの行 (NODE_COLUMNS の順)。
+    counters: カウンタ (len(COUNTER_NAMES), ノードID), positions: 座標 [ノードID, xy]
+    """
+    coordinators = [int(node) for node in COORDINATOR_IDS]
+    num_pan = len(coordinators)
+    metrics = metrics_from_counters(counters_dict(counters))
+    rows = []
+    for node in range(1, num_pan * (num_device + 1) + 1):
+        if node <= num_pan:
+            pan, role = node, "coordinator"
+        else:
+            pan, role = (node - num_pan - 1) // num_device + 1, "device"
+        own = coordinators[pan - 1]
+        interferer = coordinators[pan % num_pan]
+        x, y = positions[node]
+        values = [node, pan, role, x, y,
+                  float(np.hypot(x - positions[own, 0], y - positions[own, 1])),
+                  float(np.hypot(x - positions[interferer, 0], y - positions[interferer, 1]))]
+        values += [int(counters[i][node]) for i in range(len(COUNTER_NAMES))]
+        values += [float(metrics[name][node]) for name in METRIC_NAMES]
+        rows.append(tuple(None if isinstance(v, float) and np.isnan(v) else v for v in values))
+    return rows
+
+
+def result_path(run_catalog, run, source):
+    return run_catalog.path(run, "stat" if source == "stat" else "trace")
+
+
+def result_fingerprint(path, source):
+    """結果ファイルの (大きさ, 更新時刻 [ns])。無ければ None"""
+    if source == "stat":
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+    key = fingerprint(path)
+    return None if key is None else key[1:]
+
+
+class ResultsDB:
+    """結果データベース。ingest で取り込み、nodes / sweep_table / query で引く"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, DB_VERSION):
+            raise ValueError(f"{path}: database version {version} (expected {DB_VERSION}); remove it and ingest again")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {DB_VERSION}")
+
+    def close(self):
+        self.conn.close()
+
+    def ingest(self, root, sweep, source="trace", num_device=DEFAULT_NUM_DEVICE, workers=1, use_cache=True):
+        """
+        root のカタログの全ランを source の結果として取り込む。同じ source の結果ファイルの大きさ・更新時刻が
+        前回と同じランは飛ばす。ほかの source で取り込んだ行はそのまま残す。
+        戻り値: (取り込んだラン数, 変化がなく飛ばしたラン数)
+        """
+        run_catalog = catalog.load_catalog(root)
+        known = {label: (size, mtime) for label, size, mtime in self.conn.execute(
+            "SELECT label, result_size, result_mtime_ns FROM runs WHERE sweep = ? AND source = ?", (sweep, source))}
+        runs = []
+        keys = []
+        skipped = 0
+        for run in run_catalog:
+            path = result_path(run_catalog, run, source)
+            if not (os.path.exists(path) if source == "stat" else has_run_result(path)):
+                continue
+            key = result_fingerprint(path, source)
+            if key is not None and known.get(run["label"]) == tuple(key):
+                skipped += 1
+                continue
+            runs.append(run)
+            keys.append(key)
+        if not runs:
+            return 0, skipped
+
+        if source == "stat":
+            counters = np.stack([counters_array(stat_counters(result_path(run_catalog, run, source), num_device))
+                                 for run in runs])
+        else:
+            cache = CountersCache(os.path.join(root, CACHE_FILE), num_device) if use_cache else None
+            counters = parse_runs([result_path(run_catalog, run, source) for run in runs], num_device, workers,
+                                  cache=cache)
+            if cache is not None:
+                cache.save()
+        size = counters.shape[2]
+        positions, _, available = run_positions(run_catalog, runs, size, load_positions_table(root))
+
+        placeholders = ", ".join("?" * (len(NODE_COLUMNS) + 1))
+        node_sql = f"INSERT INTO nodes (run_id, {', '.join(name for name, _ in NODE_COLUMNS)}) VALUES ({placeholders})"
+        now = time.time()
+        with self.conn:
+            for i, run in enumerate(runs):
+                self.conn.execute("DELETE FROM runs WHERE sweep = ? AND label = ? AND source = ?",
+                                  (sweep, run["label"], source))
+                size_ns = keys[i] if keys[i] is not None else (None, None)
+                cursor = self.conn.execute(
+                    "INSERT INTO runs (sweep, label, pattern, distance_m, offered_load, seed, source,"
+                    " result_size, result_mtime_ns, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sweep, run["label"], run["pattern"], float(run["distance_m"]), _key_load(run["offered_load"]),
+                     int(run["seed"]), source, size_ns[0], size_ns[1], now))
+                run_positions_i = positions[i] if available[i] else np.full_like(positions[i], np.nan)
+                self.conn.executemany(node_sql, [(cursor.lastrowid,) + row
+                                                 for row in node_rows(counters[i], run_positions_i, num_device)])
+        # 索引の選択に使う統計を更新する
+        self.conn.execute("ANALYZE")
+        return len(runs), skipped
+
+    def query(self, sql, params=()):
+        """SQL を実行し、(列名, 行のリスト) を返す"""
+        cursor = self.conn.execute(sql, params)
+        names = [d[0] for d in cursor.description] if cursor.description else []
+        return names, cursor.fetchall()
+
+    def nodes(self, columns=("pattern", "offered_load", "seed", "pan", "node", "distance_to_interferer",
+                             "up_per", "down_per"), **filters):
+        """
+        条件 (RUN_FILTERS / NODE_FILTERS の列 = 値) に合うノードの行を列ごとの NumPy 配列で返す。
+        NULL (分母が 0 の指標など) は NaN
+        """
+        where = []
+        params = []
+        for name, value in filters.items():
+            if name not in RUN_FILTERS + NODE_FILTERS:
+                raise ValueError(f"unknown filter: {name}")
+            where.append(f"{'runs' if name in RUN_FILTERS else 'nodes'}.{name} = ?")
+            params.append(_key_load(value) if name == "offered_load" else value)
+        sql = (f"SELECT {', '.join(columns)} FROM nodes JOIN runs USING (run_id)"
+               + (f" WHERE {' AND '.join(where)}" if where else "")
+               + " ORDER BY runs.run_id, nodes.node")
+        rows = self.conn.execute(sql, params).fetchall()
+        result = {}
+        for j, name in enumerate(columns):
+            values = [row[j] for row in rows]
+            if values and all(isinstance(v, str) for v in values):
+                result[name] = np.asarray(values, dtype=str)
+            else:
+                result[name] = np.asarray([np.nan if v is None else v for v in values], dtype=float)
+        return result
+
+    def sweep_table(self, source="trace", **filters):
+        """
+        source で取り込んだデバイスの行を sweep_table.SweepTable にして返す
+        (interference_2pan_plot_results.py の結果表と同じ形)。
+        PER は per_from_counters と同じく小数第3位に丸め、送信数が 0 なら 0
+        """
+        columns = ("pattern", "distance_m", "offered_load", "seed", "pan", "node", "distance_to_interferer") + COUNTER_NAMES
+        data = self.nodes(columns, role="device", source=source, **filters)
+        counters = np.stack([data[name] for name in COUNTER_NAMES])[None]
+        up, down = per_arrays(counters)
+        return SweepTable({
+            "prefix": data["pattern"].astype(str),
+            "distance_m": data["distance_m"],
+            "load": data["offered_load"],
+            "seed": data["seed"].astype(np.int64),
+            "pan": data["pan"].astype(np.int64),
+            "node": data["node"].astype(np.int64),
+            "distance": data["distance_to_interferer"],
+            "up_per": up[0],
+            "down_per": down[0],
+        })
+
+
+def print_rows(names, rows):
+    print("\t".join(names))
+    for row in rows:
+        print("\t".join("" if v is None else (f"{v:.6g}" if isinstance(v, float) else str(v)) for v in row))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="全スイープの結果データベース (SQLite) への取り込みと検索")
+    parser.add_argument("--db", default=os.path.join(DEFAULT_ROOT, DB_FILE), help="データベースファイル")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="出力ディレクトリのランを取り込む (変化のないランは飛ばす)")
+    ingest.add_argument("--root", default=DEFAULT_ROOT, help="ランカタログのある出力ディレクトリ")
+    ingest.add_argument("--sweep", default=None, help="スイープの名前 (既定は出力ディレクトリの絶対パス)")
+    ingest.add_argument("--source", choices=("trace", "stat"), default="trace",
+                        help="カウンタを求める出力 (stat: .stat の統計。トレース不要。"
+                             "up_per / down_per は CBR の送受信数から求めるアプリケーション層の PER で、trace の MAC の PER とは別の指標。"
+                             f"実験的な機能なので {EXPERIMENTAL_FLAG} も必要)")
+    ingest.add_argument(EXPERIMENTAL_FLAG, action="store_true",
+                        help="実験的な --source stat を使う (.stat の形式・統計名は fake_sim.py に合わせたもので、"
+                             "実際の ./sim の .stat とはまだ照合していない)")
+    ingest.add_argument("--num-device", type=int, default=DEFAULT_NUM_DEVICE, help="PAN あたりのデバイス数")
+    ingest.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="トレースの解析に使うプロセス数")
+    ingest.add_argument("--no-cache", action="store_true", help=f"解析済みカウンタのキャッシュ ({CACHE_FILE}) を使わない")
+    query = sub.add_parser("query", help="SQL を実行して結果をタブ区切りで表示する")
+    query.add_argument("sql", help="SQL (runs / nodes 表)")
+    args = parser.parse_args()
+    if args.command == "ingest" and args.source == "stat" and not args.experimental_stat_source:
+        ingest.error(EXPERIMENTAL_ERROR)
+    return args
+
+
+def main():
+    args = parse_args()
+    try:
+        db = ResultsDB(args.db)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        start = time.perf_counter()
+        if args.command == "ingest":
+            if not os.path.isdir(args.root):
+                print(f"Error: Output directory not found at '{args.root}'", file=sys.stderr)
+                sys.exit(1)
+            sweep = args.sweep or os.path.abspath(args.root)
+            added, skipped = db.ingest(args.root, sweep, args.source, args.num_device, args.workers,
+                                       not args.no_cache)
+            print(f"Ingested {added} runs into {args.db} ({skipped} unchanged, sweep {sweep}) "
+                  f"in {time.perf_counter() - start:.2f} s")
+        else:
+            names, rows = db.query(args.sql)
+            print_rows(names, rows)
+            print(f"{len(rows)} rows in {(time.perf_counter() - start) * 1e3:.1f} ms", file=sys.stderr)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,14 @@
 
 # 機能:
 # ../ ディレクトリ（commandline/）内の全 .config ファイルを対象に、
-# シミュレーションを最大5つまで並列で実行する。
+# シミュレーションを並列で実行する。
+# 実際の処理は run_simulations.py が行う（並列数はコア数と空きメモリから自動決定、
+# 完了済みのランはスキップ、重いランから順に実行、中断後の再実行に対応）。
 #
 # 実行方法:
 # commandline/script/ ディレクトリから ./run_all_simulations.sh を実行するか、
 # プロジェクトルートから commandline/script/run_all_simulations.sh を実行する。
+# 引数はそのまま run_simulations.py に渡される（例: --workers 5, --configs-from stale_configs.txt）。
 
 # スクリプト自身の場所を基準にcommandlineディレクトリのパスを決定
 SCRIPT_DIR=$(cd -- "$(dirname -- "${BASH_SOURCE[0]}")" &> /dev/null && pwd)
@@ -15,24 +18,4 @@ CMD_DIR=$(cd -- "$SCRIPT_DIR/.." &> /dev/null && pwd)
 # commandline ディレクトリに移動して実行
 cd "$CMD_DIR" || exit
 
-# .config ファイルの数をチェック
-NUM_CONFIGS=$(ls -1 *.config 2>/dev/null | wc -l)
-if [ "$NUM_CONFIGS" -eq 0 ]; then
-  echo "警告: 実行対象の .config ファイルが '$CMD_DIR' 内に見つかりません。"
-  exit 0
-fi
-
-echo "シミュレーションを開始します... (最大5並列)"
-echo "対象ディレクトリ: $CMD_DIR"
-echo "対象ファイル数: $NUM_CONFIGS"
-echo "--------------------------------------------------"
-
-# lsで.configファイルをリストし、xargsで並列実行
-# -P 5: 最大5プロセスで並列実行
-# -n 1: 一度に1つの引数（ファイル名）をコマンドに渡す
-# --no-run-if-empty: 入力がない場合はコマンドを実行しない
-# ./sim: 実行するシミュレーションコマンド
-ls -1 *.config | sort | xargs --no-run-if-empty -P 5 -n 1 ./sim
-
-echo "--------------------------------------------------"
-echo "全てのシミュレーションが完了しました。"
+exec python3 "$SCRIPT_DIR/run_simulations.py" "$@"
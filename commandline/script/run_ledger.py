@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ランごとの資源使用量の台帳 (run_ledger.jsonl)
+
+機能:
+- run_simulations.py が ./sim の各ランについて、実行時間 (wall / user / sys)、最大RSS、
+  終了コード、出力サイズ (.trace, .stat) をスイープ点 (pattern, distance, offered_load, seed)
+  とともに追記する。Slurm の配列タスクごとに別ファイル (run_ledger.<job>_<task>.jsonl) に書く。
+- summary: offered load × パターンごとのコストを表示する。
+- sbatch: 台帳から 1配列タスクあたりの --mem-per-cpu / --time の目安を出力する (sbatch_jobs.sh が使う)。
+- run_simulations.py は台帳の実績から並列数 (メモリ) と実行順 (実行時間) を決める。
+
+実行方法 (commandline/ で実行):
+    python3 ./script/run_ledger.py summary
+    python3 ./script/run_ledger.py sbatch --runs-per-cpu 16
+"""
+
+import argparse
+import collections
+import glob
+import json
+import math
+import os
+import sys
+import threading
+
+import numpy as np
+
+# --- Configuration ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CMD_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))  # commandline/
+LEDGER_FILE = os.path.join(CMD_DIR, "run_ledger.jsonl")
+KEY_FIELDS = ("pattern", "distance_m", "offered_load", "seed")
+MEM_MARGIN = 1.25   # 最大RSS の実績に掛ける余裕
+TIME_MARGIN = 1.5   # 実行時間の実績に掛ける余裕
+RSS_PERCENTILE = 95
+
+
+def ledger_path():
+    """Slurm のジョブ (配列タスク) ごとに台帳を分ける (共有FS上での同時追記を避ける)"""
+    base, ext = os.path.splitext(LEDGER_FILE)
+    task_id = os.environ.get("SLURM_ARRAY_TASK_ID")
+    if task_id is None:
+        job_id = os.environ.get("SLURM_JOB_ID")
+        return f"{base}.{job_id}{ext}" if job_id else LEDGER_FILE
+    job_id = os.environ.get("SLURM_ARRAY_JOB_ID", "local")
+    return f"{base}.{job_id}_{task_id}{ext}"
+
+
+class Ledger:
+    """追記専用の台帳 (JSON Lines)"""
+
+    def __init__(self, path=None):
+        self.path = path or ledger_path()
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        line = json.dumps(record, sort_keys=True) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def load():
+        """全ての台帳 (配列タスクごとのものを含む) の記録"""
+        records = []
+        base, ext = os.path.splitext(LEDGER_FILE)
+        for path in sorted(glob.glob(base + "*" + ext)):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue  # 強制終了で途中まで書かれた行
+        return records
+
+
+def make_record(entry, returncode, wall_sec, rusage, output_sizes, host=None):
+    """1ラン分の記録 (rusage は os.wait4 の結果。ru_maxrss は Linux では KiB)"""
+    record = {field: entry.get(field) for field in KEY_FIELDS}
+    record.update({
+        "label": entry["label"],
+        "num_nodes": entry.get("num_nodes"),
+        "returncode": returncode,
+        "wall_sec": round(wall_sec, 3),
+        "user_sec": round(rusage.ru_utime, 3) if rusage else None,
+        "sys_sec": round(rusage.ru_stime, 3) if rusage else None,
+        "max_rss_mb": round(rusage.ru_maxrss / 1024.0, 1) if rusage else None,
+        "host": host or os.uname().nodename,
+    })
+    for kind, size in output_sizes.items():
+        record[f"{kind}_bytes"] = size
+    return record
+
+
+def _group_key(record):
+    return record["pattern"], round(float(record["offered_load"]), 6)
+
+
+def _values(records, field):
+    return np.asarray([r[field] for r in records if r.get(field) is not None], dtype=float)
+
+
+def latest_records(records):
+    """ラベルごとの最新の成功記録 (再実行分で上書き)"""
+    latest = {}
+    for record in records:
+        if record.get("returncode") == 0:
+            latest[record["label"]] = record
+    return list(latest.values())
+
+
+class ResourceModel:
+    """台帳の実績から、1ランあたりの実行時間・メモリを見積もる"""
+
+    def __init__(self, records):
+        self.records = latest_records(records)
+        groups = collections.defaultdict(list)
+        for record in self.records:
+            groups[_group_key(record)].append(record)
+        self.wall_by_group = {key: float(_values(rs, "wall_sec").mean()) for key, rs in groups.items()}
+        # offered load × ノード数 あたりの実行時間 (実績の無いランの見積もりに使う)
+        unit = [r["wall_sec"] / (float(r["offered_load"]) * r["num_nodes"])
+                for r in self.records if r.get("num_nodes") and float(r["offered_load"]) > 0]
+        self.sec_per_load_node = float(np.median(unit)) if unit else None
+
+    def __bool__(self):
+        return bool(self.records)
+
+    def wall_sec(self, pattern, offered_load, num_nodes):
+        """ランの実行時間の見積もり [s] (実績が無ければ None)"""
+        key = (pattern, round(float(offered_load), 6))
+        if key in self.wall_by_group:
+            return self.wall_by_group[key]
+        if self.sec_per_load_node is not None:
+            return self.sec_per_load_node * float(offered_load) * num_nodes
+        return None
+
+    def mem_per_run_mb(self):
+        """1ランあたりのメモリの見積もり [MB] (最大RSS の 95 パーセンタイル × 余裕)"""
+        rss = _values(self.records, "max_rss_mb")
+        if len(rss) == 0:
+            return None
+        return float(np.percentile(rss, RSS_PERCENTILE)) * MEM_MARGIN
+
+    def max_wall_sec(self):
+        wall = _values(self.records, "wall_sec")
+        return float(wall.max()) if len(wall) else None
+
+
+def summarize(records):
+    """offered load × パターンごとの集計行"""
+    groups = collections.defaultdict(list)
+    for record in records:
+        groups[_group_key(record)].append(record)
+    rows = []
+    for (pattern, load), rs in sorted(groups.items()):
+        ok = latest_records(rs)
+        wall = _values(ok, "wall_sec")
+        cpu = np.asarray([r["user_sec"] + r["sys_sec"] for r in ok if r.get("user_sec") is not None])
+        rss = _values(ok, "max_rss_mb")
+        trace = _values(ok, "trace_bytes") / 1e6
+        rows.append({
+            "pattern": pattern,
+            "offered_load": load,
+            "runs": len(ok),
+            "failed": sum(1 for r in rs if r.get("returncode") != 0),
+            "wall_mean": wall.mean() if len(wall) else math.nan,
+            "wall_max": wall.max() if len(wall) else math.nan,
+            "cpu_total_h": cpu.sum() / 3600.0 if len(cpu) else math.nan,
+            "rss_max": rss.max() if len(rss) else math.nan,
+            "trace_mb_mean": trace.mean() if len(trace) else math.nan,
+            "trace_gb_total": trace.sum() / 1e3 if len(trace) else math.nan,
+        })
+    return rows
+
+
+def print_summary(records):
+    rows = summarize(records)
+    if not rows:
+        print("台帳に記録がありません。", file=sys.stderr)
+        return
+    header = (f"{'pattern':<12} {'load':>5} {'runs':>5} {'fail':>4} {'wall avg[s]':>11} {'wall max[s]':>11} "
+              f"{'cpu [h]':>8} {'RSS max[MB]':>11} {'trace avg[MB]':>13} {'trace [GB]':>10}")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['pattern']:<12} {row['offered_load']:>5.2f} {row['runs']:>5d} {row['failed']:>4d} "
+              f"{row['wall_mean']:>11.1f} {row['wall_max']:>11.1f} {row['cpu_total_h']:>8.2f} "
+              f"{row['rss_max']:>11.1f} {row['trace_mb_mean']:>13.1f} {row['trace_gb_total']:>10.2f}")
+    model = ResourceModel(records)
+    print("-" * len(header))
+    print(f"1ランあたりのメモリ見積もり (RSS p{RSS_PERCENTILE} × {MEM_MARGIN}): {model.mem_per_run_mb() or math.nan:.0f} MB")
+
+
+def sbatch_options(records, runs_per_cpu):
+    """
+    配列タスク1件あたりの sbatch オプション。
+    メモリは1コアあたり (= 1ラン分)、時間は最長ラン × runs_per_cpu × 余裕。
+    """
+    model = ResourceModel(records)
+    mem = model.mem_per_run_mb()
+    wall = model.max_wall_sec()
+    options = []
+    if mem is not None:
+        options.append(f"--mem-per-cpu={int(math.ceil(mem))}M")
+    if wall is not None:
+        minutes = int(math.ceil(wall * runs_per_cpu * TIME_MARGIN / 60.0))
+        options.append(f"--time={minutes // 60:02d}:{minutes % 60:02d}:00")
+    return options
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ランごとの資源使用量の台帳")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("summary", help="offered load × パターンごとのコストを表示する")
+    sbatch = sub.add_parser("sbatch", help="台帳から配列タスクの --mem-per-cpu / --time を出力する")
+    sbatch.add_argument("--runs-per-cpu", type=int, default=16, help="1コアあたりのラン数")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    records = Ledger.load()
+    if args.command == "summary":
+        print_summary(records)
+    elif args.command == "sbatch":
+        print(" ".join(sbatch_options(records, args.runs_per_cpu)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 #!/bin/bash
 
+# .config 1件分のシミュレーション (commandline/ から投入する)。
+# run_simulations.py 経由で実行し、実行時間・最大RSS・出力サイズを台帳 (run_ledger.jsonl) に記録する。
+
 CONFIG=$1
-./sim "$CONFIG"
+python3 ./script/run_simulations.py --force --workers 1 "$CONFIG"
@@ -0,0 +1,25 @@
+#!/bin/bash
+#SBATCH -o /home/arimoto/opt/scensim_env/scenargie_simulator/2.2/scenarios_linux/srm_interference/commandline/logs/%x_%A_%a.out
+#SBATCH -e /home/arimoto/opt/scensim_env/scenargie_simulator/2.2/scenarios_linux/srm_interference/commandline/logs/%x_%A_%a.err
+
+# 配列ジョブの1タスク分:
+# 共有タスクリストから claim-batch 件ずつランを取り出し、割り当てられたコア数だけ並列に実行する。
+# 取り出し位置は <タスクリスト>.cursor で全タスク共通なので、早く終わったタスクが残りを引き受ける。
+#
+# 引数: $1 = タスクリスト (sbatch_jobs.sh が作成)
+
+TASK_LIST=$1
+CMD_DIR=${CMD_DIR:-/home/arimoto/opt/scensim_env/scenargie_simulator/2.2/scenarios_linux/srm_interference/commandline}
+SCRIPT_DIR="$CMD_DIR/script"
+
+cd "$CMD_DIR" || {
+  echo "ERROR: cd failed: $CMD_DIR"
+  exit 1
+}
+
+echo "Array task: ${SLURM_ARRAY_JOB_ID:-local}_${SLURM_ARRAY_TASK_ID:-0} on $(hostname), cpus=${SLURM_CPUS_PER_TASK:-1}"
+
+python3 "$SCRIPT_DIR/run_simulations.py" \
+  --task-list "$TASK_LIST" \
+  --workers "${SLURM_CPUS_PER_TASK:-1}" \
+  --claim-batch "${CLAIM_BATCH:-1}"
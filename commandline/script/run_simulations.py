@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+シミュレーション実行スクリプト (xargs -P 5 の置き換え)
+
+機能:
+- 並列数を利用可能なコア数と空きメモリから決める (1ランあたりのメモリは台帳の実績から)。
+- 出力 (.stat, .trace) が揃っていて入力より新しいランはスキップする。
+- 台帳の実行時間 (無ければ offered load × ノード数) を実行コストの予測値とし、
+  重いランから順に投入する (LPT)。
+- 各ランの実行時間・CPU時間・最大RSS・終了コード・出力サイズを台帳 (run_ledger.jsonl) に追記する。
+- 開始・完了をジャーナル (run_journal.jsonl) に追記するため、途中で強制終了しても
+  再実行時に完了済みのランは失われない (開始記録だけのランは再実行する)。
+- --write-task-list で実行順のタスクリストを書き出し、--task-list で複数プロセス
+  (Slurm の配列タスク) から共有タスクリストのランを順に取り出して実行する。
+- --parse を付けると、完了したランのトレースをすぐに解析プロセスへ渡してカウンタ
+  (.counters.npz) に集約し、--trace-action に従って生のトレースを削除・圧縮
+  (gzip / zstd / xz) する。解析はシミュレーションの実行時間に隠れ、ディスク使用量も抑えられる。
+  --parse なしで --trace-action に圧縮方式を指定すると、圧縮だけを行う。
+  --bin-sec を付けると、計測区間を一定幅の時間ビンに分けたカウンタも同じ読み込みで保存する。
+- トレースを無効にした (.config の trace-enabled-tags が空の) ランは .stat だけで完了とみなし、解析にも回さない。
+
+実行方法 (commandline/ で ./sim を実行する):
+    python3 ./script/run_simulations.py [--workers N] [--configs-from stale_configs.txt]
+"""
+
+import argparse
+import collections
+import fcntl
+import glob
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+import catalog
+import run_ledger
+import trace_io
+import trace_parser
+
+# --- Configuration ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CMD_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))  # commandline/
+SIM_COMMAND = os.environ.get("SIM", "./sim")
+JOURNAL_FILE = os.path.join(CMD_DIR, "run_journal.jsonl")
+DEFAULT_MEM_PER_RUN_MB = 512
+INPUT_KINDS = ("config", "pos", "statconfig")
+OUTPUT_KINDS = ("stat", "trace")
+TRACE_TAGS_RE = re.compile(r"^(?:\[[^\]]*\]\s*)?trace-enabled-tags\s*=\s*(\S.*)?$")
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available_memory_bytes():
+    """/proc/meminfo の MemAvailable (取れなければ物理メモリ量)"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_workers(mem_per_run_mb):
+    """コア数と「空きメモリ / 1ランあたりのメモリ [MB]」の小さい方"""
+    workers = available_cpus()
+    mem = available_memory_bytes()
+    if mem is not None and mem_per_run_mb > 0:
+        workers = min(workers, max(1, int(mem // (mem_per_run_mb * 1024 * 1024))))
+    return max(1, workers)
+
+
+def count_pos_nodes(pos_path):
+    """.pos のノード数 (カタログにノード数が無い場合のみ使用)"""
+    node_ids = set()
+    with open(pos_path, "r") as f:
+        for line in f:
+            parts = line.split(None, 1)
+            if parts:
+                node_ids.add(parts[0])
+    return len(node_ids)
+
+
+def predicted_cost(run_catalog, entry, model=None):
+    """
+    ランの実行コストの予測値。
+    台帳に実績があれば実行時間の見積もり [s]、無ければ offered load × ノード数。
+    """
+    num_nodes = entry.get("num_nodes")
+    if not num_nodes:
+        try:
+            num_nodes = count_pos_nodes(run_catalog.path(entry, "pos"))
+        except OSError:
+            num_nodes = 1
+    if model:
+        wall = model.wall_sec(entry["pattern"], entry["offered_load"], num_nodes)
+        if wall is not None:
+            return wall
+    return float(entry["offered_load"]) * num_nodes
+
+
+class Journal:
+    """ランの開始・完了を追記するジャーナル (JSON Lines)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        ラベルごとの最後のイベントを返す。
+        配列タスクごとに分かれたジャーナル (run_journal.<job>_<task>.jsonl) もまとめて読む。
+        """
+        records = []
+        base, ext = os.path.splitext(JOURNAL_FILE)
+        for path in sorted(set(glob.glob(base + "*" + ext)) | {self.path}):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue  # 強制終了で途中まで書かれた行
+        last = {}
+        for record in sorted(records, key=lambda r: r.get("time", 0)):
+            last[record["label"]] = record
+        return last
+
+    def append(self, record):
+        line = json.dumps(record, sort_keys=True) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def output_stat(run_catalog, entry, kind):
+    """
+    出力ファイルの os.stat。
+    トレースは解析済み (カウンタ) や圧縮済みでもよい。
+    """
+    path = run_catalog.path(entry, kind)
+    if kind == "trace":
+        for candidate in trace_io.trace_candidates(path) + [run_catalog.path(entry, "counters")]:
+            if os.path.exists(candidate):
+                return os.stat(candidate)
+    return os.stat(path)
+
+
+def trace_enabled(config_path):
+    """.config でトレース出力が有効か (trace-enabled-tags が空でない行があるか)。読めなければ True"""
+    try:
+        with open(config_path, "r") as f:
+            for line in f:
+                match = TRACE_TAGS_RE.match(line.strip())
+                if match and match.group(1):
+                    return True
+    except OSError:
+        return True
+    return False
+
+
+def expected_outputs(run_catalog, entry):
+    """ランが出力するファイルの種別 (トレースを無効にしたランは .stat のみ)"""
+    if trace_enabled(run_catalog.path(entry, "config")):
+        return OUTPUT_KINDS
+    return tuple(kind for kind in OUTPUT_KINDS if kind != "trace")
+
+
+def outputs_complete(run_catalog, entry, last_event):
+    """
+    出力が揃っていて入力より新しければ True。
+    ジャーナルに開始記録しか無いラン (実行中に強制終了されたもの) は未完了とみなす。
+    """
+    if last_event is not None and last_event.get("event") != "done":
+        return False
+    if last_event is not None and last_event.get("returncode") != 0:
+        return False
+    try:
+        input_mtime = max(os.path.getmtime(run_catalog.path(entry, k)) for k in INPUT_KINDS)
+        for kind in expected_outputs(run_catalog, entry):
+            st = output_stat(run_catalog, entry, kind)
+            if st.st_size == 0 or st.st_mtime < input_mtime:
+                return False
+    except OSError:
+        return False
+    return True
+
+
+def config_label(config_path):
+    """.config のパス (commandline/ からの相対 or 絶対) をカタログのラベルに変換する"""
+    if os.path.isabs(config_path):
+        config_path = os.path.relpath(config_path, CMD_DIR)
+    label, ext = os.path.splitext(config_path)
+    return label.replace(os.sep, "/") if ext == ".config" else config_path
+
+
+def select_runs(run_catalog, args):
+    """実行対象のカタログエントリ"""
+    if args.configs:
+        labels = {config_label(c) for c in args.configs}
+    elif args.configs_from:
+        with open(args.configs_from, "r") as f:
+            labels = {config_label(line.strip()) for line in f if line.strip()}
+    else:
+        labels = None
+    runs = []
+    for entry in run_catalog:
+        if labels is not None and entry["label"] not in labels:
+            continue
+        if args.pattern and entry["pattern"] not in args.pattern:
+            continue
+        if args.load and round(float(entry["offered_load"]), 6) not in {round(l, 6) for l in args.load}:
+            continue
+        runs.append(entry)
+    return runs
+
+
+def output_sizes(run_catalog, entry):
+    """出力ファイルの大きさ [bytes] (無ければ None)"""
+    sizes = {}
+    for kind in OUTPUT_KINDS:
+        path = run_catalog.path(entry, kind)
+        if kind == "trace":
+            path = trace_io.find_trace(path) or path
+        try:
+            sizes[kind] = os.path.getsize(path)
+        except OSError:
+            sizes[kind] = None
+    return sizes
+
+
+class Runner:
+    """./sim を並列実行し、ジャーナルと台帳に記録する"""
+
+    def __init__(self, run_catalog, journal, sim_command, ledger=None):
+        self.run_catalog = run_catalog
+        self.journal = journal
+        self.sim_command = sim_command
+        self.ledger = ledger
+        self._procs = set()
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    def run_one(self, entry):
+        config_path = os.path.relpath(self.run_catalog.path(entry, "config"), CMD_DIR)
+        self.journal.append({"event": "start", "label": entry["label"], "time": time.time()})
+        start = time.perf_counter()
+        with self._lock:
+            if self._stopping:
+                return entry, None, 0.0
+            proc = subprocess.Popen([self.sim_command, config_path], cwd=CMD_DIR)
+            self._procs.add(proc)
+        # wait4 で子プロセスの資源使用量 (CPU時間, 最大RSS) も受け取る
+        try:
+            _, status, rusage = os.wait4(proc.pid, 0)
+            returncode = proc.returncode = os.waitstatus_to_exitcode(status)
+        except ChildProcessError:  # 中断処理 (terminate) 側で回収された
+            returncode, rusage = proc.wait(), None
+        with self._lock:
+            self._procs.discard(proc)
+        elapsed = time.perf_counter() - start
+        if not self._stopping:
+            self.journal.append({
+                "event": "done", "label": entry["label"], "time": time.time(),
+                "returncode": returncode, "wall_sec": round(elapsed, 3),
+            })
+            if self.ledger is not None:
+                record = run_ledger.make_record(entry, returncode, elapsed, rusage,
+                                                output_sizes(self.run_catalog, entry))
+                record["time"] = time.time()
+                self.ledger.append(record)
+        return entry, returncode, elapsed
+
+    @property
+    def stopping(self):
+        return self._stopping
+
+    def stop(self):
+        """実行中のシミュレーションを終了させる (ジャーナルには完了を書かない)"""
+        with self._lock:
+            self._stopping = True
+            for proc in self._procs:
+                proc.terminate()
+
+
+class ParsePipeline:
+    """完了したランのトレースを別プロセスでカウンタに集約・圧縮する"""
+
+    def __init__(self, run_catalog, workers, trace_action, parse=True, bin_sec=None):
+        self.run_catalog = run_catalog
+        self.trace_action = trace_action
+        self.parse = parse
+        self.bin_sec = bin_sec
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.failed = []
+
+    def submit(self, entry):
+        if not trace_enabled(self.run_catalog.path(entry, "config")):
+            return  # トレースを出力しないラン (.stat のみ)
+        num_nodes = entry.get("num_nodes") or count_pos_nodes(self.run_catalog.path(entry, "pos"))
+        future = self._executor.submit(
+            trace_parser.reduce_run,
+            self.run_catalog.path(entry, "trace"),
+            trace_parser.num_device_per_pan(num_nodes),
+            self.trace_action,
+            self.parse,
+            self.bin_sec,
+        )
+        future.add_done_callback(lambda f, label=entry["label"]: self._report(label, f))
+        with self._lock:
+            self._futures[entry["label"]] = future
+
+    def _report(self, label, future):
+        if future.cancelled():
+            return
+        try:
+            size, elapsed = future.result()
+        except Exception as e:
+            with self._lock:
+                self.failed.append(label)
+            print(f"Warning: failed to parse {label}.trace: {e}", file=sys.stderr)
+            return
+        action = "parsed" if self.parse else self.trace_action
+        print(f"  {action} {label}.trace ({size / 1e6:.1f} MB, {elapsed:.1f} s)", flush=True)
+
+    def close(self, cancel=False):
+        """未処理の解析を待つ (cancel=True なら未開始の解析を取り消す)"""
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+
+class LocalQueue:
+    """このプロセス内で実行順に取り出すキュー"""
+
+    def __init__(self, entries):
+        self._entries = collections.deque(entries)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def next(self):
+        with self._lock:
+            return self._entries.popleft() if self._entries else None
+
+
+class SharedTaskList:
+    """
+    複数プロセス (Slurm の配列タスクなど) で共有するタスクリスト。
+    取り出し位置は <タスクリスト>.cursor に保存し、flock で排他して batch 件ずつ確保する。
+    """
+
+    def __init__(self, path, run_catalog, batch=1):
+        self.path = path
+        self.cursor_path = path + ".cursor"
+        self.run_catalog = run_catalog
+        self.batch = max(1, batch)
+        with open(path, "r") as f:
+            self.labels = [config_label(line.strip()) for line in f if line.strip()]
+        self._local = collections.deque()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _claim(self):
+        with open(self.cursor_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                start = int(f.read().strip() or 0)
+                stop = min(start + self.batch, len(self.labels))
+                f.seek(0)
+                f.truncate()
+                f.write(str(stop))
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return self.labels[start:stop]
+
+    def next(self):
+        with self._lock:
+            while not self._local:
+                labels = self._claim()
+                if not labels:
+                    return None
+                for label in labels:
+                    entry = self.run_catalog.by_label(label)
+                    if entry is None:
+                        print(f"Warning: '{label}.config' is not in the run catalog; skipped", file=sys.stderr)
+                        continue
+                    self._local.append(entry)
+            return self._local.popleft()
+
+
+class _SkipComplete:
+    """取り出したランのうち、既に出力が揃っているもの (先行ジョブで完了済み) を飛ばす"""
+
+    def __init__(self, source, run_catalog, last_events, force):
+        self.source = source
+        self.run_catalog = run_catalog
+        self.last_events = last_events
+        self.force = force
+
+    def next(self):
+        while True:
+            entry = self.source.next()
+            if entry is None or self.force:
+                return entry
+            if not outputs_complete(self.run_catalog, entry, self.last_events.get(entry["label"])):
+                return entry
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def write_task_list(path, entries):
+    """実行順に並べた .config の一覧を書き出し、取り出し位置をリセットする"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        for entry in entries:
+            f.write(entry["label"] + ".config\n")
+    os.replace(tmp_path, path)
+    if os.path.exists(path + ".cursor"):
+        os.remove(path + ".cursor")
+
+
+def run_workers(runner, source, workers, total, pipeline=None):
+    """
+    workers 本のスレッドで source が空になるまで実行する。戻り値: (完了数, 失敗ラベル)
+    pipeline を渡すと、正常終了したランをすぐに解析に回す。
+    """
+    failed = []
+    done = [0]
+    print_lock = threading.Lock()
+
+    def worker_loop():
+        while True:
+            entry = source.next()
+            if entry is None or runner.stopping:
+                return
+            entry, returncode, elapsed = runner.run_one(entry)
+            if returncode is None:
+                return
+            with print_lock:
+                done[0] += 1
+                status = "ok" if returncode == 0 else f"FAILED (exit {returncode})"
+                if returncode != 0:
+                    failed.append(entry["label"])
+                print(f"[{done[0]}/{total}] {entry['label']}.config {status} ({elapsed:.1f} s)", flush=True)
+            if returncode == 0 and pipeline is not None:
+                pipeline.submit(entry)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(worker_loop) for _ in range(workers)]
+    try:
+        for future in futures:
+            while True:
+                try:
+                    future.result(timeout=1.0)
+                    break
+                except TimeoutError:
+                    continue
+    except KeyboardInterrupt:
+        # 終了処理中に重ねて届いたシグナルは無視する
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        print("\n中断します。実行中のシミュレーションを終了しています...", file=sys.stderr)
+        runner.stop()
+        executor.shutdown(wait=True, cancel_futures=True)
+        if pipeline is not None:
+            pipeline.close(cancel=True)
+        sys.exit(130)
+    executor.shutdown()
+    if pipeline is not None:
+        pipeline.close()
+    return done[0], failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="全 .config のシミュレーションを並列実行する")
+    parser.add_argument("configs", nargs="*", help="実行する .config (省略時はカタログの全ラン)")
+    parser.add_argument("--configs-from", default=None,
+                        help="実行する .config の一覧ファイル (例: stale_configs.txt)")
+    parser.add_argument("--pattern", action="append", default=None, help="対象パターン (複数指定可)")
+    parser.add_argument("--load", type=float, action="append", default=None, help="対象 offered load (複数指定可)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="並列数 (省略時はコア数と空きメモリから決める)")
+    parser.add_argument("--mem-per-run-mb", type=float, default=None,
+                        help="1ランあたりのメモリ見積もり (並列数の自動決定に使う。"
+                             f"省略時は台帳の実績、実績が無ければ {DEFAULT_MEM_PER_RUN_MB} MB)")
+    parser.add_argument("--sim", default=SIM_COMMAND, help="シミュレータのコマンド")
+    parser.add_argument("--force", action="store_true", help="出力が揃っているランも再実行する")
+    parser.add_argument("--dry-run", action="store_true", help="実行順を表示するだけで実行しない")
+    parser.add_argument("--write-task-list", default=None, metavar="PATH",
+                        help="実行せず、未完了のランを実行順に並べたタスクリストを書き出す")
+    parser.add_argument("--task-list", default=None, metavar="PATH",
+                        help="共有タスクリストから順にランを取り出して実行する (Slurm 配列ジョブ用)")
+    parser.add_argument("--claim-batch", type=int, default=1,
+                        help="共有タスクリストから一度に確保するラン数")
+    parser.add_argument("--parse", action="store_true",
+                        help="完了したランのトレースをすぐにカウンタ (.counters.npz) に集約する")
+    parser.add_argument("--parse-workers", type=int, default=1, help="解析・圧縮プロセス数")
+    parser.add_argument("--trace-action", choices=trace_parser.TRACE_ACTIONS, default="keep",
+                        help="完了後の生のトレースの扱い (delete は --parse 時のみ)")
+    parser.add_argument("--bin-sec", type=float, default=None,
+                        help="--parse 時に、計測区間をこの幅 [s] の時間ビンに分けたカウンタも保存する")
+    return parser.parse_args()
+
+
+def journal_path():
+    """Slurm のジョブ (配列タスク) ごとにジャーナルを分ける (共有FS上での同時追記を避ける)"""
+    base, ext = os.path.splitext(JOURNAL_FILE)
+    task_id = os.environ.get("SLURM_ARRAY_TASK_ID")
+    if task_id is None:
+        job_id = os.environ.get("SLURM_JOB_ID")
+        return f"{base}.{job_id}{ext}" if job_id else JOURNAL_FILE
+    job_id = os.environ.get("SLURM_ARRAY_JOB_ID", "local")
+    return f"{base}.{job_id}_{task_id}{ext}"
+
+
+def main():
+    args = parse_args()
+    run_catalog = catalog.load_catalog(CMD_DIR)
+    journal = Journal(journal_path())
+    last_events = journal.load()
+    model = run_ledger.ResourceModel(run_ledger.Ledger.load())
+    mem_per_run_mb = args.mem_per_run_mb or model.mem_per_run_mb() or DEFAULT_MEM_PER_RUN_MB
+    workers = args.workers or default_workers(mem_per_run_mb)
+    runner = Runner(run_catalog, journal, args.sim, run_ledger.Ledger())
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    if args.trace_action == "delete" and not args.parse:
+        print("Error: --trace-action delete requires --parse", file=sys.stderr)
+        sys.exit(1)
+    pipeline = None
+    if (args.parse or args.trace_action != "keep") and not (args.dry_run or args.write_task_list):
+        pipeline = ParsePipeline(run_catalog, args.parse_workers, args.trace_action, args.parse, args.bin_sec)
+
+    if args.task_list:
+        source = SharedTaskList(args.task_list, run_catalog, args.claim_batch)
+        print(f"タスクリストから実行します: {args.task_list} ({len(source)} runs, {workers}並列)")
+        start = time.perf_counter()
+        done, failed = run_workers(runner, _SkipComplete(source, run_catalog, last_events, args.force),
+                                   workers, len(source), pipeline)
+    else:
+        runs = select_runs(run_catalog, args)
+        if not runs:
+            print(f"警告: 実行対象の .config ファイルが '{CMD_DIR}' 内に見つかりません。")
+            return
+
+        if args.force:
+            pending = runs
+        else:
+            pending = [e for e in runs if not outputs_complete(run_catalog, e, last_events.get(e["label"]))]
+        # 予測コストの大きい順 (同じコストはラベル順) に投入する
+        costs = {e["label"]: predicted_cost(run_catalog, e, model) for e in pending}
+        pending.sort(key=lambda e: (-costs[e["label"]], e["label"]))
+
+        if args.write_task_list:
+            write_task_list(args.write_task_list, pending)
+            print(f"タスクリストを書き出しました: {args.write_task_list} ({len(pending)} runs)")
+            return
+
+        print(f"シミュレーションを開始します... (最大{workers}並列)")
+        print(f"対象ディレクトリ: {CMD_DIR}")
+        print(f"対象ファイル数: {len(runs)} (完了済みでスキップ: {len(runs) - len(pending)}, 実行: {len(pending)})")
+        print("--------------------------------------------------")
+        if args.dry_run:
+            for entry in pending:
+                print(f"{costs[entry['label']]:10.2f}  {entry['label']}.config")
+            return
+
+        start = time.perf_counter()
+        done, failed = run_workers(runner, LocalQueue(pending), workers, len(pending), pipeline)
+
+    print("--------------------------------------------------")
+    print(f"全てのシミュレーションが完了しました。({done} runs, {time.perf_counter() - start:.1f} s)")
+    if pipeline is not None and pipeline.failed:
+        print(f"解析に失敗したラン: {len(pipeline.failed)}", file=sys.stderr)
+        for label in pipeline.failed:
+            print(f"  {label}.trace", file=sys.stderr)
+    if failed:
+        print(f"失敗したラン: {len(failed)}", file=sys.stderr)
+        for label in failed:
+            print(f"  {label}.config", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
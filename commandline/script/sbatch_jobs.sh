@@ -1,16 +1,77 @@
 #!/bin/bash
-#SBATCH -o /home/arimoto/opt/scensim_env/scenargie_simulator/2.2/scenarios_linux/srm_interference/commandline/logs/%x_%j.out
-#SBATCH -e /home/arimoto/opt/scensim_env/scenargie_simulator/2.2/scenarios_linux/srm_interference/commandline/logs/%x_%j.err
 
-CMD_DIR=/home/arimoto/opt/scensim_env/scenargie_simulator/2.2/scenarios_linux/srm_interference/commandline
+# 機能:
+# 未完了の .config を Slurm に投入する。
+#
+# MODE=array (既定): 未完了のランを実行順に並べたタスクリストを作成し、配列ジョブとして投入する。
+#   各配列タスクは CPUS_PER_TASK 本のシミュレーションを並列に実行し、共有タスクリストから
+#   順にランを取り出す。投入するジョブ数は配列ジョブ1件だけになる。
+#     CPUS_PER_TASK   : 1配列タスクあたりのコア数 (= 同時実行数)         既定: 8
+#     RUNS_PER_CPU    : 1コアあたりに割り当てるランの目安 (配列サイズの決定) 既定: 16
+#     ARRAY_SIZE      : 配列タスク数 (指定時は上の目安より優先)
+#     MAX_CONCURRENT  : 同時に実行する配列タスク数の上限 (%N)             既定: 制限なし
+#     CLAIM_BATCH     : タスクリストから一度に確保するラン数               既定: 1
+#     RESOURCE_OPTS   : 配列タスクの資源要求 (例: "--mem-per-cpu=2G --time=04:00:00")
+#                       既定: 台帳 (run_ledger.jsonl) の実績から run_ledger.py sbatch で決める
+# MODE=single: 従来どおり .config ごとに run_one_sim.slurm.sh を1件ずつ投入する。
+#
+# SBATCH に sbatch の代わりのコマンドを指定できる (例: SBATCH=./script/fake_sbatch.sh でローカル実行)。
+
+CMD_DIR=${CMD_DIR:-/home/arimoto/opt/scensim_env/scenargie_simulator/2.2/scenarios_linux/srm_interference/commandline}
 SCRIPT_DIR="$CMD_DIR/script"
 CONFIG_DIR="$CMD_DIR"   # ← config があるディレクトリに応じて変更
+SBATCH=${SBATCH:-sbatch}
+MODE=${MODE:-array}
 
 cd "$CONFIG_DIR" || {
   echo "ERROR: cd failed: $CONFIG_DIR"
   exit 1
 }
 
+if [ "$MODE" = "array" ]; then
+  # -------------------------------
+  # タスクリストの作成 (未完了のランのみ、重い順)
+  # -------------------------------
+  mkdir -p "$CMD_DIR/tasks"
+  TASK_LIST="$CMD_DIR/tasks/tasks_$(date +%Y%m%d_%H%M%S).txt"
+  python3 "$SCRIPT_DIR/run_simulations.py" --write-task-list "$TASK_LIST" "$@" || exit 1
+
+  NUM_TASKS=$(wc -l < "$TASK_LIST")
+  echo "Current directory: $(pwd)"
+  echo "Number of runs to submit: $NUM_TASKS"
+  if [ "$NUM_TASKS" -eq 0 ]; then
+    echo "全てのランが完了済みです"
+    exit 0
+  fi
+
+  CPUS_PER_TASK=${CPUS_PER_TASK:-8}
+  RUNS_PER_CPU=${RUNS_PER_CPU:-16}
+  RUNS_PER_TASK=$((CPUS_PER_TASK * RUNS_PER_CPU))
+  ARRAY_SIZE=${ARRAY_SIZE:-$(( (NUM_TASKS + RUNS_PER_TASK - 1) / RUNS_PER_TASK ))}
+  ARRAY_SPEC="0-$((ARRAY_SIZE - 1))"
+  if [ -n "$MAX_CONCURRENT" ]; then
+    ARRAY_SPEC="$ARRAY_SPEC%$MAX_CONCURRENT"
+  fi
+
+  # 配列タスクごとのメモリ・時間 (台帳に実績が無ければ指定しない)
+  RESOURCE_OPTS=${RESOURCE_OPTS-$(python3 "$SCRIPT_DIR/run_ledger.py" sbatch --runs-per-cpu "$RUNS_PER_CPU")}
+
+  # -------------------------------
+  # 配列ジョブの投入 (1件)
+  # -------------------------------
+  echo "Submitting array job: --array=$ARRAY_SPEC --cpus-per-task=$CPUS_PER_TASK $RESOURCE_OPTS"
+  # shellcheck disable=SC2086
+  CMD_DIR="$CMD_DIR" CLAIM_BATCH="${CLAIM_BATCH:-1}" \
+    "$SBATCH" --array="$ARRAY_SPEC" --cpus-per-task="$CPUS_PER_TASK" $RESOURCE_OPTS \
+    --export=ALL "$SCRIPT_DIR/run_sim_array.slurm.sh" "$TASK_LIST"
+
+  echo "----------------------------------------"
+  echo "Task list: $TASK_LIST"
+  echo "Array tasks: $ARRAY_SIZE (runs: $NUM_TASKS)"
+  echo "配列ジョブを投入しました"
+  exit 0
+fi
+
 # -------------------------------
 # .config が存在するかチェック
 # -------------------------------
@@ -32,7 +93,7 @@ count=0
 
 for config in "${configs[@]}"; do
   echo "Submitting: $config"
-  sbatch "$SCRIPT_DIR/run_one_sim.slurm.sh" "$(realpath "$config")"
+  "$SBATCH" "$SCRIPT_DIR/run_one_sim.slurm.sh" "$(realpath "$config")"
   count=$((count + 1))
 done
 
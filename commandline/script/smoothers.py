@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+距離 vs PER 曲線の平滑化 (バックエンドを選べる共通インターフェース)
+
+機能:
+- smooth(x, y, method, frac, grid) で、選んだ方法の平滑化曲線を格子点 (既定は x の範囲を等分した点) で返す。
+- バックエンド (SMOOTHERS):
+  - lowess:        statsmodels の lowess (従来の出力。点数の2乗に近い時間がかかる)
+  - binned_lowess: 点を細かいビンの和 (件数, Σx, Σx², Σy, Σxy) にまとめ、格子点ごとの tricube 重みの局所線形回帰を
+                   ビンの和から求める LOWESS。帯域 (近い方から ceil(frac·N) 点) とロバスト化の反復は lowess と同じ
+  - kernel:        同じビンの和から求める Gauss 核の局所線形回帰 (帯域は一様な点で lowess と同程度の滑らかさ)
+  - kernel_ridge:  ランドマークを使う Nyström 近似の RBF カーネルリッジ回帰 (O(N·m²))
+  lowess 以外は点数 N に対して O(N + ビン数 × 格子点数) または O(N·m²) で、ほぼ線形の時間で終わる。
+- 格子点 (grid_for) と LOWESS と同じ近傍点数の帯域 (span_bandwidth) は bootstrap_bands でも使う。
+- 各バックエンドと lowess の差・処理時間は bench_smoothers.py で確認できる。
+"""
+
+import numpy as np
+
+DEFAULT_METHOD = "binned_lowess"
+DEFAULT_FRAC = 0.2
+DEFAULT_GRID_POINTS = 100
+CHUNK_POINTS = 8192       # span_bandwidth で一度に扱う点数の目安
+NUM_BINS = 2048           # binned_lowess / kernel のビン数
+LOWESS_ITERATIONS = 3     # ロバスト化の反復回数 (statsmodels の lowess の it と同じ)
+NUM_LANDMARKS = 64        # kernel_ridge のランドマーク数
+RIDGE_ALPHA = 1e-3        # kernel_ridge の正則化 (1点あたり)
+GAUSS_PER_SPAN = 0.19     # tricube の半幅 h (一様な点なら frac·範囲/2) と同程度の滑らかさになる Gauss 核の標準偏差 / (frac·範囲)
+
+
+def grid_for(x, num_points=DEFAULT_GRID_POINTS):
+    """x の範囲を等間隔に分けた格子点"""
+    x = np.asarray(x, dtype=float)
+    if x.size == 0:
+        return np.empty(0)
+    return np.linspace(x.min(), x.max(), num_points)
+
+
+def span_bandwidth(x, grid, frac):
+    """格子点ごとの帯域: LOWESS と同じく、近い方から ceil(frac·N) 番目の点までの距離"""
+    x = np.asarray(x, dtype=float)
+    k = min(len(x), max(2, int(np.ceil(frac * len(x)))))
+    h = np.empty(len(grid))
+    step = max(1, CHUNK_POINTS * 16 // max(len(x), 1))
+    for start in range(0, len(grid), step):
+        dist = np.abs(x[None, :] - grid[start:start + step, None])
+        h[start:start + step] = np.partition(dist, k - 1, axis=1)[:, k - 1]
+    # LOWESS と同じく、帯域の端の点の重みが 0 にならないよう少し広げる
+    return np.where(h > 0, h, np.finfo(float).eps) * 1.0000001
+
+
+def _bin_sums(x, y, weights, edges):
+    """ビンごとの和 (件数, Σx, Σx², Σy, Σxy) を重み付きで求める (ビン数, 5)"""
+    index = np.clip(np.searchsorted(edges, x, side="right") - 1, 0, len(edges) - 2)
+    num_bins = len(edges) - 1
+    wx = weights * x
+    return np.stack([
+        np.bincount(index, weights, num_bins),
+        np.bincount(index, wx, num_bins),
+        np.bincount(index, wx * x, num_bins),
+        np.bincount(index, weights * y, num_bins),
+        np.bincount(index, wx * y, num_bins),
+    ], axis=1)
+
+
+def _local_linear(sums, grid, kernel):
+    """
+    ビンの和から格子点での局所線形回帰の値を求める。
+    kernel(dx): ビンの平均位置 - 格子点 (ビン数, 格子点数) に対する重み
+    """
+    count, sx, sxx, sy, sxy = sums.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        center = np.where(count > 0, sx / np.where(count > 0, count, 1), 0.0)
+    w = kernel(center[:, None] - grid[None, :]) * (count > 0)[:, None]
+    g = grid[None, :]
+    s0 = (w * count[:, None]).sum(axis=0)
+    s1 = (w * (sx[:, None] - g * count[:, None])).sum(axis=0)
+    s2 = (w * (sxx[:, None] - 2 * g * sx[:, None] + g * g * count[:, None])).sum(axis=0)
+    t0 = (w * sy[:, None]).sum(axis=0)
+    t1 = (w * (sxy[:, None] - g * sy[:, None])).sum(axis=0)
+    det = s0 * s2 - s1 * s1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fit = (s2 * t0 - s1 * t1) / det
+        return np.where(det > 1e-12 * np.maximum(s0 * s2, 1e-300), fit, t0 / s0)
+
+
+def _edges(x):
+    lo, hi = float(np.min(x)), float(np.max(x))
+    if hi <= lo:
+        hi = lo + 1.0
+    return np.linspace(lo, hi, min(NUM_BINS, len(x)) + 1)
+
+
+def bisquare_weights(resid):
+    """LOWESS のロバスト化の重み: 残差の絶対値の中央値の6倍で bisquare"""
+    median = np.median(resid)
+    if median == 0:
+        scaled = (resid > 0).astype(float)
+    else:
+        scaled = np.minimum(resid / (6.0 * median), 1.0)
+    return (1.0 - scaled ** 2) ** 2
+
+
+def smooth_lowess(x, y, grid, frac):
+    from statsmodels.nonparametric.smoothers_lowess import lowess
+    return lowess(y, x, frac=frac, it=LOWESS_ITERATIONS, xvals=grid)
+
+
+def binned_lowess_fit(x, y, grid, frac):
+    """
+    binned_lowess の曲線と、最後の反復で使ったロバスト化の重み。
+    戻り値: (格子点での値, 点ごとの重み)
+    """
+    edges = _edges(x)
+    bandwidth = span_bandwidth(x, grid, frac)
+
+    def tricube(dx):
+        u = np.clip(np.abs(dx) / bandwidth[None, :], 0.0, 1.0)
+        return (1.0 - u ** 3) ** 3
+
+    weights = np.ones(len(x))
+    fit = _local_linear(_bin_sums(x, y, weights, edges), grid, tricube)
+    for _ in range(LOWESS_ITERATIONS):
+        # ロバスト化: 残差の中央値の6倍で bisquare 重み (残差は格子点の曲線を線形補間して求める)
+        valid = np.isfinite(fit)
+        if not valid.any():
+            break
+        weights = bisquare_weights(np.abs(y - np.interp(x, grid[valid], fit[valid])))
+        fit = _local_linear(_bin_sums(x, y, weights, edges), grid, tricube)
+    return fit, weights
+
+
+def smooth_binned_lowess(x, y, grid, frac):
+    return binned_lowess_fit(x, y, grid, frac)[0]
+
+
+def smooth_kernel(x, y, grid, frac):
+    sigma = GAUSS_PER_SPAN * frac * max(float(np.ptp(x)), np.finfo(float).eps)
+
+    def gauss(dx):
+        return np.exp(-0.5 * (dx / sigma) ** 2)
+
+    return _local_linear(_bin_sums(x, y, np.ones(len(x)), _edges(x)), grid, gauss)
+
+
+def smooth_kernel_ridge(x, y, grid, frac):
+    """
+    Nyström 近似の RBF カーネルリッジ回帰。
+    ランドマーク L (x の分位点) の核 Φ = K(x, L) で、(ΦᵀΦ + α·N·K(L, L)) β = Φᵀ (y - ȳ) を解く
+    """
+    sigma = GAUSS_PER_SPAN * frac * max(float(np.ptp(x)), np.finfo(float).eps)
+    landmarks = np.unique(np.quantile(x, np.linspace(0.0, 1.0, min(NUM_LANDMARKS, len(x)))))
+
+    def rbf(a, b):
+        return np.exp(-0.5 * ((a[:, None] - b[None, :]) / sigma) ** 2)
+
+    mean = float(np.mean(y))
+    phi = rbf(x, landmarks)
+    gram = phi.T @ phi + RIDGE_ALPHA * len(x) * rbf(landmarks, landmarks)
+    gram[np.diag_indices_from(gram)] += 1e-10 * np.trace(gram)
+    beta = np.linalg.solve(gram, phi.T @ (y - mean))
+    return mean + rbf(grid, landmarks) @ beta
+
+
+SMOOTHERS = {
+    "lowess": smooth_lowess,
+    "binned_lowess": smooth_binned_lowess,
+    "kernel": smooth_kernel,
+    "kernel_ridge": smooth_kernel_ridge,
+}
+
+
+def smooth(x, y, method=DEFAULT_METHOD, frac=DEFAULT_FRAC, grid=None):
+    """
+    x, y の平滑化曲線を格子点で求める。
+    戻り値: (格子点, 値)。点が2つ未満なら値は NaN
+    """
+    if method not in SMOOTHERS:
+        raise ValueError(f"unknown smoother: {method} (choose from {', '.join(SMOOTHERS)})")
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    grid = grid_for(x) if grid is None else np.asarray(grid, dtype=float)
+    if len(x) < 2:
+        return grid, np.full(len(grid), np.nan)
+    return grid, SMOOTHERS[method](x, y, grid, frac)
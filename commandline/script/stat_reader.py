@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+.stat の読み込み (トレースを使わない解析)
+
+機能:
+- ./sim が .statconfig (DrIotMac_* / DrIotCbr_* INF_TIME <計測区間>) に従って書き出す .stat を読む。
+  1行が1つの統計 "<統計名> <ノードID> <インスタンス名> <値>" ('#' 以降はコメント)。
+- 統計を trace_parser と同じカウンタ (COUNTER_NAMES × ノードID) に変換する。
+  PER は CBR のフロー (driotcbr_<送信元>_<宛先>) ごとの送信数・受信数から求め、
+  ACK・再送・チャネルアクセス失敗は DrIotMac_* のノードごとの統計を使う。
+  これにより per_from_counters / metrics_from_counters / parse_runs のキャッシュをそのまま使える。
+- 設定生成時に --no-trace でトレースを無効にすれば、シミュレータの出力 I/O と解析時間の大半が無くなる。
+
+注意:
+- 行の形式と統計名 (CBR_SENT / CBR_RECEIVED / MAC_STATS) は fake_sim.py が書き出す .stat に合わせたもので、
+  実際の ./sim (Scenargie) の .stat の出力とは照合していない。実機の .stat で名前・形式が違う場合に
+  全ノード PER 0 として黙って集計しないよう、CBR の統計が1つも無い .stat は ValueError にする。
+  照合できるまでは実験的な機能として、解析スクリプトの --source stat には EXPERIMENTAL_FLAG の指定を必須にする。
+- ここでの PER はアプリケーション層 (CBR) の送信数・受信数から求める値で、トレースの PER
+  (MAC の DataFrameDequeued / RxFrame) とは別の指標である (MAC のキューに入る前の破棄や
+  MAC より上の層での損失も含む)。解析スクリプトでは METRIC_LABEL を付けて区別する。
+"""
+
+import collections
+import re
+
+import numpy as np
+
+from trace_parser import COORDINATOR_IDS, COUNTER_NAMES
+
+# --source stat を使うときに必要なオプション (行の形式・統計名が実際の ./sim と照合できるまでは実験的な扱い)
+EXPERIMENTAL_FLAG = "--experimental-stat-source"
+EXPERIMENTAL_ERROR = ("--source stat is experimental: the .stat line format and statistic names follow fake_sim.py "
+                      f"and have not been checked against the real ./sim; pass {EXPERIMENTAL_FLAG} to use it anyway")
+
+# CBR のインスタンス名 (送信元・宛先ノードID)
+CBR_INSTANCE_RE = re.compile(r"^driotcbr_(\d+)_(\d+)$")
+
+# DrIotMac_* の統計 → カウンタ (デバイス, コーディネータ)
+MAC_STATS = {
+    "DrIotMac_AckFramesReceived": ("device_received_ack", None),
+    "DrIotMac_DataFramesTransmitted": ("device_tx_data", "coordinator_tx_data"),
+    "DrIotMac_FrameRetries": ("device_retransmissions", "coordinator_retransmissions"),
+    "DrIotMac_ChannelAccessFailures": ("device_access_failures", "coordinator_access_failures"),
+}
+CBR_SENT = "DrIotCbr_PacketsSent"
+CBR_RECEIVED = "DrIotCbr_PacketsReceived"
+# .stat から求めた PER の呼び名 (トレースの MAC の PER と区別する)
+METRIC_LABEL = "app"
+# PAN ごとの合計を添字 1, 2 に入れるカウンタ (trace_parser.EVENT_RULES の pan_totals と同じ)
+PAN_TOTAL_COUNTERS = ("coordinator_receive", "device_dequeued", "device_tx_data",
+                      "device_retransmissions", "device_access_failures")
+
+
+def read_stat(path):
+    """
+    .stat を読む。
+    戻り値: (統計名, ノードID, インスタンス名) → 値
+    """
+    stats = collections.defaultdict(float)
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split("#", 1)[0].split()
+            if len(parts) < 4:
+                continue
+            try:
+                stats[(parts[0], int(parts[1]), parts[2])] += float(parts[3])
+            except ValueError:
+                continue
+    return stats
+
+
+def stat_counters(path, num_device):
+    """
+    .stat からカウンタ (trace_parser.COUNTER_NAMES) を求める。CBR の統計が無ければ ValueError。
+    上り: device_dequeued / coordinator_receive は デバイス → コーディネータ の CBR 送信数 / 受信数 (送信元ごと)、
+    下り: coordinator_dequeued / device_receive は コーディネータ → デバイス の CBR 送信数 / 受信数 (宛先ごと)。
+    """
+    size = 3 * num_device
+    coordinators = {int(node) for node in COORDINATOR_IDS}
+    counters = {name: np.zeros(size, dtype=np.int64) for name in COUNTER_NAMES}
+
+    def add(name, index, value):
+        if 0 <= index < size:
+            counters[name][index] += int(value)
+
+    num_cbr = 0
+    for (stat, node, instance), value in read_stat(path).items():
+        if stat in MAC_STATS:
+            device_name, coordinator_name = MAC_STATS[stat]
+            name = coordinator_name if node in coordinators else device_name
+            if name is not None:
+                add(name, node, value)
+            continue
+        match = CBR_INSTANCE_RE.match(instance)
+        if match is None or stat not in (CBR_SENT, CBR_RECEIVED):
+            continue
+        src, dst = int(match.group(1)), int(match.group(2))
+        num_cbr += 1
+        if src in coordinators:
+            add("coordinator_dequeued" if stat == CBR_SENT else "device_receive", dst, value)
+        elif dst in coordinators:
+            add("device_dequeued" if stat == CBR_SENT else "coordinator_receive", src, value)
+
+    if num_cbr == 0:
+        raise ValueError(f"{path}: no {CBR_SENT} / {CBR_RECEIVED} statistics (unexpected .stat format)")
+
+    for name in PAN_TOTAL_COUNTERS:
+        counters[name][1] = counters[name][3:num_device + 3].sum()
+        counters[name][2] = counters[name][num_device + 3:].sum()
+    return counters
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+スイープ仕様 (JSON) の読み込みと遅延スイーププランナー
+
+機能:
+- PAN数、チャネルパターン、offered load、seed、格子配置、コーディネータ間距離を
+  JSONファイルで宣言的に記述する。
+- SweepPlanner はスイープ点を直積として展開せず、通し番号から都度デコードして
+  ストリームで返す。通し番号の範囲 (shard) を指定して複数マシンに分割できる。
+
+スイープ点の通し番号は (pattern, distance, offered_load, seed) の順で、seed が最も速く変化する。
+
+注意: 解析側 (trace_parser, stat_reader, results_db, interference_2pan_plot_results.py) は
+コーディネータが 1, 2 の 2 PAN を前提にしているため、当面 num_pan は 2 だけを受け付ける。
+"""
+
+import json
+import math
+from collections import namedtuple
+
+SweepPoint = namedtuple(
+    "SweepPoint", ["index", "pattern", "channels", "distance_m", "offered_load", "seed"]
+)
+
+COORDINATOR_LAYOUTS = ("line",)
+SUPPORTED_NUM_PAN = (2,)  # 解析側が対応している PAN 数
+
+
+class LinearAxis:
+    """start から stop まで step 刻みの値を、materialize せずに添字で返す軸"""
+
+    def __init__(self, start, stop, step, decimals=None):
+        if step <= 0:
+            raise ValueError(f"step must be positive: {step}")
+        self.start = start
+        self.step = step
+        self.decimals = decimals
+        self._len = int(math.floor((stop - start) / step + 0.5)) + 1
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        value = self.start + i * self.step
+        return round(value, self.decimals) if self.decimals is not None else value
+
+
+def _make_axis(value, name):
+    """JSONの値 (リスト or {start, stop, step} or {start, count}) から軸を作る"""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, dict):
+        if "count" in value:
+            start = int(value.get("start", 0))
+            return range(start, start + int(value["count"]))
+        if {"start", "stop", "step"} <= value.keys():
+            return LinearAxis(value["start"], value["stop"], value["step"], value.get("decimals"))
+    raise ValueError(f"Invalid sweep axis '{name}': {value!r}")
+
+
+def load_spec(path):
+    """スイープ仕様ファイルを読み込んで検証する"""
+    with open(path, "r") as f:
+        spec = json.load(f)
+    for key in ("num_pan", "patterns", "distances_m", "offered_loads", "seeds", "lattice"):
+        if key not in spec:
+            raise ValueError(f"Sweep spec '{path}' is missing '{key}'")
+    if spec["num_pan"] not in SUPPORTED_NUM_PAN:
+        raise ValueError(
+            f"Sweep spec '{path}' has num_pan {spec['num_pan']}, but the analysis scripts "
+            f"only support {SUPPORTED_NUM_PAN}"
+        )
+    for pattern in spec["patterns"]:
+        if len(pattern["channels"]) != spec["num_pan"]:
+            raise ValueError(
+                f"Pattern '{pattern['name']}' has {len(pattern['channels'])} channels "
+                f"but num_pan is {spec['num_pan']}"
+            )
+    lattice = spec["lattice"]
+    if len(lattice["unit_x"]) != len(lattice["unit_y"]):
+        raise ValueError("lattice.unit_x and lattice.unit_y must have the same length")
+    layout = spec.get("coordinator_layout", "line")
+    if layout not in COORDINATOR_LAYOUTS:
+        raise ValueError(f"Unknown coordinator_layout: {layout} (expected one of {COORDINATOR_LAYOUTS})")
+    return spec
+
+
+def parse_shard(text):
+    """'i/n' 形式の shard 指定を (i, n) に変換する"""
+    index, count = (int(v) for v in text.split("/"))
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{text}': expected 0 <= i < n")
+    return index, count
+
+
+class SweepPlanner:
+    """スイープ仕様から通し番号でスイープ点を引く遅延プランナー"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.num_pan = int(spec["num_pan"])
+        self.patterns = spec["patterns"]
+        self.distances = _make_axis(spec["distances_m"], "distances_m")
+        self.loads = _make_axis(spec["offered_loads"], "offered_loads")
+        self.seeds = _make_axis(spec["seeds"], "seeds")
+        self.lattice = spec["lattice"]
+        self._axes = (self.patterns, self.distances, self.loads, self.seeds)
+
+    @property
+    def num_device(self):
+        """1PANあたりのデバイス数"""
+        return len(self.lattice["unit_x"])
+
+    @property
+    def num_nodes(self):
+        return self.num_pan * (1 + self.num_device)
+
+    def __len__(self):
+        n = 1
+        for axis in self._axes:
+            n *= len(axis)
+        return n
+
+    def point(self, index):
+        """通し番号をデコードしてスイープ点を返す"""
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        digits = []
+        rest = index
+        for axis in reversed(self._axes):
+            rest, digit = divmod(rest, len(axis))
+            digits.append(digit)
+        p, d, l, s = reversed(digits)
+        pattern = self.patterns[p]
+        return SweepPoint(
+            index=index,
+            pattern=pattern["name"],
+            channels=tuple(pattern["channels"]),
+            distance_m=self.distances[d],
+            offered_load=self.loads[l],
+            seed=self.seeds[s],
+        )
+
+    def iter_points(self, start=0, stop=None):
+        """[start, stop) の範囲のスイープ点を順に返す"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for index in range(start, stop):
+            yield self.point(index)
+
+    def shard_range(self, shard_index, num_shards):
+        """shard i/n が担当する通し番号の範囲 [start, stop) を返す"""
+        total = len(self)
+        start = total * shard_index // num_shards
+        stop = total * (shard_index + 1) // num_shards
+        return start, stop
+
+    def coordinator_xy(self, distance_m):
+        """PANごとのコーディネータ座標 (line: x軸上に distance_m 間隔で並べる)"""
+        return [(p * distance_m, 0) for p in range(self.num_pan)]
+
+    def coordinator_id(self, pan):
+        return pan + 1
+
+    def device_ids(self, pan):
+        first = self.num_pan + pan * self.num_device + 1
+        return list(range(first, first + self.num_device))
+
+    def prefix(self, point):
+        """スイープ点の出力ファイル名prefix"""
+        return (
+            f"{point.pattern}_coord_dist_{point.distance_m}m"
+            f"_off_load{point.offered_load}_seed{point.seed}"
+        )
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+スイープの要約統計の逐次集計 (sweep_stats.npz)
+
+機能:
+- (prefix, distance_m, load, pan, 方向 up/down) ごとに、距離 x と PER y の件数・平均・2次の中心モーメント
+  (Σ(x-x̄)², Σ(y-ȳ)², Σ(x-x̄)(y-ȳ)) と PER のヒストグラムを持つ。distance_m はコーディネータ間距離。
+- ランを1つずつ (または結果表のランをまとめて) 足せる。足したランはカタログ上の識別 (prefix, distance_m, load, seed)
+  と内容の指紋 (run_fingerprint: カウンタと出力の種類 trace / stat のハッシュ) で覚えておき、同じランを二重に数えない。
+  指紋が違う同じランを足そうとすると ValueError (足したランの寄与は取り除けないので、集計し直す)。
+- モーメントは Chan らの式で合併するので、ワーカーや計算機ごとに集計したものを merge で1つにまとめられる
+  (同じランを含むもの同士は合併しない)。
+- interference_2pan_plot_results.py は実行のたびに結果表から集計し直して保存する
+  (再実行したラン・計測区間やパーサの変更・--source の切り替えが必ず反映される)。
+- 一時ファイル経由で原子的に .npz に保存する。
+
+実行方法 (commandline/ で実行):
+    python3 ./script/sweep_stats.py show sweep_stats.npz
+    python3 ./script/sweep_stats.py merge sweep_stats.npz part0/sweep_stats.npz part1/sweep_stats.npz
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+STATS_FILE = "sweep_stats.npz"
+STATS_VERSION = 2
+DIRECTIONS = ("up", "down")
+HIST_BINS = 20  # PER [0, 1] のヒストグラムのビン数
+# モーメントの列: 件数, x̄, ȳ, Σ(x-x̄)², Σ(y-ȳ)², Σ(x-x̄)(y-ȳ)
+N, MEAN_X, MEAN_Y, M2_X, M2_Y, C_XY = range(6)
+
+
+def batch_moments(x, y):
+    """1組の点のモーメント (6,)"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) == 0:
+        return np.zeros(6)
+    mx, my = x.mean(), y.mean()
+    dx, dy = x - mx, y - my
+    return np.array([len(x), mx, my, dx @ dx, dy @ dy, dx @ dy])
+
+
+def merge_moments(a, b):
+    """2組のモーメントの合併 (末尾の軸が6列。Chan らの式)"""
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    n = a[..., N] + b[..., N]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fb = np.where(n > 0, b[..., N] / n, 0.0)
+    dx = b[..., MEAN_X] - a[..., MEAN_X]
+    dy = b[..., MEAN_Y] - a[..., MEAN_Y]
+    cross = a[..., N] * fb  # na·nb/n
+    return np.stack([
+        n,
+        a[..., MEAN_X] + dx * fb,
+        a[..., MEAN_Y] + dy * fb,
+        a[..., M2_X] + b[..., M2_X] + dx * dx * cross,
+        a[..., M2_Y] + b[..., M2_Y] + dy * dy * cross,
+        a[..., C_XY] + b[..., C_XY] + dx * dy * cross,
+    ], axis=-1)
+
+
+def run_fingerprint(counters, source):
+    """
+    ランの内容の指紋: カウンタの配列 (計測区間・パーサの違いはカウンタに表れる) と出力の種類 (trace / stat) のハッシュ
+    """
+    digest = hashlib.sha1(str(source).encode())
+    digest.update(np.ascontiguousarray(counters, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def per_histogram(y):
+    index = np.clip((np.asarray(y, dtype=float) * HIST_BINS).astype(np.int64), 0, HIST_BINS - 1)
+    return np.bincount(index, minlength=HIST_BINS)
+
+
+class SweepStats:
+    """(prefix, distance_m, load, pan, 方向) → モーメントとヒストグラム。足したラン (run_key → 指紋) も持つ"""
+
+    def __init__(self):
+        self.moments = {}
+        self.histograms = {}
+        self.runs = {}
+
+    def __len__(self):
+        return len(self.runs)
+
+    @staticmethod
+    def key(prefix, distance_m, load, pan, direction):
+        return str(prefix), round(float(distance_m), 6), round(float(load), 6), int(pan), str(direction)
+
+    @staticmethod
+    def run_key(prefix, distance_m, load, seed):
+        return str(prefix), round(float(distance_m), 6), round(float(load), 6), int(seed)
+
+    def _is_new(self, run, fingerprint):
+        """まだ足していないランなら True、同じ内容で足し済みなら False、内容が違えば ValueError"""
+        if run not in self.runs:
+            return True
+        if self.runs[run] != fingerprint:
+            raise ValueError(f"run {run} has changed since it was added (fingerprint {self.runs[run]} -> "
+                             f"{fingerprint}); rebuild the stats")
+        return False
+
+    def _add(self, key, moments, histogram):
+        self.moments[key] = merge_moments(self.moments.get(key, np.zeros(6)), moments)
+        self.histograms[key] = self.histograms.get(key, np.zeros(HIST_BINS, dtype=np.int64)) + histogram
+
+    def add_run(self, prefix, distance_m, load, seed, fingerprint, pan_rows):
+        """
+        1ランの結果を足す。pan_rows: PAN番号 → (distance, up_per, down_per)。
+        同じ内容で足し済みなら何もせず False、内容 (指紋) が違えば ValueError
+        """
+        run = self.run_key(prefix, distance_m, load, seed)
+        if not self._is_new(run, fingerprint):
+            return False
+        for pan, (distance, up_per, down_per) in pan_rows.items():
+            for direction, per in zip(DIRECTIONS, (up_per, down_per)):
+                self._add(self.key(prefix, distance_m, load, pan, direction), batch_moments(distance, per),
+                          per_histogram(per))
+        self.runs[run] = fingerprint
+        return True
+
+    def add_table(self, table, fingerprints):
+        """
+        結果表 (sweep_table.SweepTable) のうち、まだ足していないランの行をまとめて足す。
+        fingerprints: run_key → 指紋 (表の全ランの分)。足し済みで指紋が違うランがあれば ValueError
+        戻り値: 足したランの数
+        """
+        run_ids = [self.run_key(*r) for r in zip(table["prefix"].tolist(), table["distance_m"].tolist(),
+                                                  table["load"].tolist(), table["seed"].tolist())]
+        status = {run: self._is_new(run, fingerprints[run]) for run in set(run_ids)}
+        new = np.array([status[run] for run in run_ids], dtype=bool)
+        if not new.any():
+            return 0
+        rows = table.take(new)
+        x = rows["distance"]
+        groups = set(zip(rows["prefix"].tolist(), rows["distance_m"].tolist(), rows["load"].tolist(),
+                         rows["pan"].tolist()))
+        for prefix, distance_m, load, pan in sorted(groups):
+            mask = rows.mask(prefix=prefix, distance_m=distance_m, load=load, pan=pan)
+            for direction, column in zip(DIRECTIONS, ("up_per", "down_per")):
+                per = rows[column][mask]
+                self._add(self.key(prefix, distance_m, load, pan, direction), batch_moments(x[mask], per),
+                          per_histogram(per))
+        added = [run for run, is_new in status.items() if is_new]
+        self.runs.update((run, fingerprints[run]) for run in added)
+        return len(added)
+
+    def merge(self, other):
+        """別に集計した SweepStats を足す。同じランを含む場合は ValueError"""
+        overlap = self.runs.keys() & other.runs.keys()
+        if overlap:
+            raise ValueError(f"{len(overlap)} runs are counted in both stats (e.g. {sorted(overlap)[0]})")
+        for key in other.moments:
+            self._add(key, other.moments[key], other.histograms[key])
+        self.runs.update(other.runs)
+
+    def get(self, prefix, distance_m, load, pan, direction):
+        """モーメント (6,)。まだ無ければ件数 0"""
+        return self.moments.get(self.key(prefix, distance_m, load, pan, direction), np.zeros(6))
+
+    def correlation(self, prefix, distance_m, load, pan, direction):
+        """距離と PER の相関係数 (np.corrcoef と同じ。点が無い・分散が 0 なら NaN)"""
+        m = self.get(prefix, distance_m, load, pan, direction)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return float(m[C_XY] / np.sqrt(m[M2_X] * m[M2_Y]))
+
+    def mean_per(self, prefix, distance_m, load, pan, direction):
+        m = self.get(prefix, distance_m, load, pan, direction)
+        return float(m[MEAN_Y]) if m[N] > 0 else float("nan")
+
+    def save(self, path):
+        """一時ファイル経由で原子的に書き出す"""
+        keys = sorted(self.moments)
+        runs = sorted(self.runs)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            stats_version=STATS_VERSION,
+            hist_bins=HIST_BINS,
+            prefix=np.asarray([k[0] for k in keys], dtype=str),
+            distance_m=np.asarray([k[1] for k in keys], dtype=float),
+            load=np.asarray([k[2] for k in keys], dtype=float),
+            pan=np.asarray([k[3] for k in keys], dtype=np.int64),
+            direction=np.asarray([k[4] for k in keys], dtype=str),
+            moments=np.asarray([self.moments[k] for k in keys], dtype=float).reshape(len(keys), 6),
+            histograms=np.asarray([self.histograms[k] for k in keys], dtype=np.int64).reshape(len(keys), HIST_BINS),
+            run_prefix=np.asarray([r[0] for r in runs], dtype=str),
+            run_distance_m=np.asarray([r[1] for r in runs], dtype=float),
+            run_load=np.asarray([r[2] for r in runs], dtype=float),
+            run_seed=np.asarray([r[3] for r in runs], dtype=np.int64),
+            run_fingerprint=np.asarray([self.runs[r] for r in runs], dtype=str),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """保存した集計を読む。形式が違えば ValueError"""
+        stats = cls()
+        with np.load(path) as data:
+            if int(data["stats_version"]) != STATS_VERSION or int(data["hist_bins"]) != HIST_BINS:
+                raise ValueError(f"{path}: incompatible stats file")
+            for i, key in enumerate(zip(data["prefix"].tolist(), data["distance_m"].tolist(), data["load"].tolist(),
+                                        data["pan"].tolist(), data["direction"].tolist())):
+                key = cls.key(*key)
+                stats.moments[key] = data["moments"][i]
+                stats.histograms[key] = data["histograms"][i]
+            runs = zip(data["run_prefix"].tolist(), data["run_distance_m"].tolist(), data["run_load"].tolist(),
+                       data["run_seed"].tolist())
+            stats.runs = {cls.run_key(*r): fingerprint for r, fingerprint in zip(runs, data["run_fingerprint"].tolist())}
+        return stats
+
+
+def print_stats(stats):
+    print(f"{len(stats)} runs")
+    print(f"{'prefix':<12} {'dist_m':>7} {'load':>5} {'pan':>3} {'dir':<5} {'n':>8} {'mean PER':>9} {'corr':>7}")
+    for key in sorted(stats.moments):
+        prefix, distance_m, load, pan, direction = key
+        m = stats.moments[key]
+        print(f"{prefix:<12} {distance_m:>7g} {load:>5.1f} {pan:>3} {direction:<5} {int(m[N]):>8} "
+              f"{stats.mean_per(*key):>9.4f} {stats.correlation(*key):>7.3f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="スイープの要約統計 (sweep_stats.npz) の表示・合併")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="(prefix, distance_m, load, pan, 方向) ごとの件数・平均 PER・相関係数を表示する")
+    show.add_argument("stats", help="集計ファイル (.npz)")
+    merge = sub.add_parser("merge", help="別々に集計したファイルを1つにまとめる")
+    merge.add_argument("output", help="書き出す集計ファイル (.npz)")
+    merge.add_argument("inputs", nargs="+", help="合併する集計ファイル (.npz)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        if args.command == "show":
+            print_stats(SweepStats.load(args.stats))
+            return
+        merged = SweepStats()
+        for path in args.inputs:
+            merged.merge(SweepStats.load(path))
+        merged.save(args.output)
+        print(f"Merged {len(args.inputs)} files ({len(merged)} runs) into {args.output}")
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+スイープ全体の結果表 (1行 = 1ラン × 1デバイス)
+
+機能:
+- ランごとのカウンタ (ラン × カウンタ × ノードID) と .pos の座標 (ラン × ノードID × xy) を
+  配列のまま結合し、列ごとの NumPy 配列の表 (prefix, distance_m, load, seed, pan, node, distance, up_per, down_per)
+  にまとめる。距離・PER はラン × デバイスの配列演算でまとめて求める。
+  distance_m はランのコーディネータ間距離 (カタログの distance_m)、distance はデバイスから干渉源のコーディネータまでの距離。
+  スイープの distances_m が複数あるときは、(prefix, distance_m, load) で選ばないと別の配置のランが混ざる。
+- プロット・相関・平滑化は表の行の選択 (select) と並べ替え (sorted_by) だけで取り出せる。
+- save / load で .npz に保存・読み込みできる。
+"""
+
+import numpy as np
+
+from trace_parser import COUNTER_NAMES
+
+COLUMNS = ("prefix", "distance_m", "load", "seed", "pan", "node", "distance", "up_per", "down_per")
+
+
+def read_positions(path, size):
+    """.pos の初期座標 (時刻 0 の行) を (size, 2) の配列にする (ノードIDが添字, 無いノードは NaN)"""
+    positions = np.full((size, 2), np.nan)
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) > 4 and parts[1] == "0":
+                try:
+                    node_id = int(parts[0])
+                    if 0 <= node_id < size and np.isnan(positions[node_id, 0]):
+                        positions[node_id] = float(parts[2]), float(parts[3])
+                except ValueError:
+                    continue
+    return positions
+
+
+def per_arrays(counters):
+    """
+    カウンタの配列 (..., len(COUNTER_NAMES), ノードID) から上り・下り PER の配列を求める。
+    trace_parser.per_from_counters と同じく小数第3位に丸め、送信数が 0 のノードは 0。
+    """
+    counters = np.asarray(counters)
+    index = {name: i for i, name in enumerate(COUNTER_NAMES)}
+    device_dequeued = counters[..., index["device_dequeued"], :].astype(float)
+    coordinator_dequeued = counters[..., index["coordinator_dequeued"], :].astype(float)
+    valid = (device_dequeued != 0) & (coordinator_dequeued != 0)
+    up = np.zeros(device_dequeued.shape)
+    down = np.zeros(device_dequeued.shape)
+    np.divide(device_dequeued - counters[..., index["coordinator_receive"], :], device_dequeued,
+              out=up, where=valid)
+    np.divide(coordinator_dequeued - counters[..., index["device_receive"], :], coordinator_dequeued,
+              out=down, where=valid)
+    return np.round(up, 3), np.round(down, 3)
+
+
+class SweepTable:
+    """列名 → 同じ長さの NumPy 配列"""
+
+    def __init__(self, columns):
+        self.columns = {name: np.asarray(columns[name]) for name in COLUMNS}
+
+    def __len__(self):
+        return len(self.columns["node"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def mask(self, **conditions):
+        """列の値が一致する行 (distance_m, load は浮動小数の誤差を許す)"""
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in conditions.items():
+            if name in ("distance_m", "load"):
+                mask &= np.isclose(self.columns[name], value)
+            else:
+                mask &= self.columns[name] == value
+        return mask
+
+    def take(self, rows):
+        return SweepTable({name: values[rows] for name, values in self.columns.items()})
+
+    def select(self, **conditions):
+        return self.take(self.mask(**conditions))
+
+    def sorted_by(self, name):
+        return self.take(np.argsort(self.columns[name], kind="stable"))
+
+    def save(self, path):
+        np.savez(path, **self.columns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({name: data[name] for name in COLUMNS})
+
+
+def build_table(runs, counters, positions, pans):
+    """
+    ランの列から結果表を作る。
+    runs: カタログのエントリ (pattern, distance_m, offered_load, seed) のリスト
+    counters: (ラン数, len(COUNTER_NAMES), ノードID) のカウンタ
+    positions: (ラン数, ノードID, 2) の座標
+    pans: (PAN番号, デバイスIDの列, 干渉源のコーディネータID) のリスト。距離は干渉源のコーディネータまで
+    """
+    num_runs = len(runs)
+    up, down = per_arrays(counters)
+    prefix = np.asarray([run["pattern"] for run in runs], dtype=str)
+    distance_m = np.asarray([float(run["distance_m"]) for run in runs])
+    load = np.asarray([float(run["offered_load"]) for run in runs])
+    seed = np.asarray([int(run["seed"]) for run in runs], dtype=np.int64)
+    parts = []
+    for pan, device_ids, interferer in pans:
+        device_ids = np.asarray(device_ids)
+        offset = positions[:, device_ids, :] - positions[:, [interferer], :]
+        distance = np.hypot(offset[..., 0], offset[..., 1])  # (ラン数, デバイス数)
+        num_dev = len(device_ids)
+        parts.append({
+            "prefix": np.repeat(prefix, num_dev),
+            "distance_m": np.repeat(distance_m, num_dev),
+            "load": np.repeat(load, num_dev),
+            "seed": np.repeat(seed, num_dev),
+            "pan": np.full(num_runs * num_dev, pan, dtype=np.int64),
+            "node": np.tile(device_ids, num_runs),
+            "distance": distance.ravel(),
+            "up_per": up[:, device_ids].ravel(),
+            "down_per": down[:, device_ids].ravel(),
+        })
+    if not parts:
+        return SweepTable({name: np.empty(0) for name in COLUMNS})
+    return SweepTable({name: np.concatenate([part[name] for part in parts]) for name in COLUMNS})
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+トレースファイルの入出力 (圧縮トレースの透過的な読み書き)
+
+機能:
+- .trace / .trace.gz / .trace.zst / .trace.xz のどれが置かれていても同じように読めるようにする。
+  圧縮トレースはディスクに展開せず、大きな読み込みバッファでストリーミング展開する。
+- iter_trace_blocks で行境界に揃えたバイト列のブロックを順に返す。
+  行ごとの str への変換をせずに、ブロック単位でまとめて解析するためのもの。
+- split_trace で非圧縮トレースを行境界に揃えたバイト範囲に分け、範囲ごとに別プロセスで読めるようにする。
+- 完了したランのトレースを gzip / zstd / xz で圧縮する (一時ファイル経由で原子的に置き換える)。
+- zstd には zstandard パッケージが必要 (無い環境では gzip / xz のみ使える)。
+"""
+
+import gzip
+import io
+import lzma
+import mmap
+import os
+import shutil
+
+try:
+    import zstandard
+except ImportError:  # zstd を使わなければ不要
+    zstandard = None
+
+READ_BUFFER_BYTES = 4 << 20
+BLOCK_BYTES = 16 << 20
+COPY_BUFFER_BYTES = 1 << 20
+
+# 圧縮方式 → 拡張子
+COMPRESSIONS = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+    "xz": ".xz",
+}
+# 圧縮方式ごとの既定の圧縮レベル (gzip/xz は速度優先, zstd は高速かつ高圧縮率)
+COMPRESSION_LEVELS = {
+    "gzip": 6,
+    "zstd": 10,
+    "xz": 1,
+}
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise RuntimeError("zstd-compressed traces need the 'zstandard' package (pip install zstandard)")
+
+
+def trace_candidates(trace_path):
+    """非圧縮 → 圧縮の順に、トレースが置かれうるパス"""
+    return [trace_path] + [trace_path + ext for ext in COMPRESSIONS.values()]
+
+
+def find_trace(trace_path):
+    """実際に存在するトレース (圧縮済みを含む) のパス。無ければ None"""
+    for path in trace_candidates(trace_path):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def open_trace(path, mode="r"):
+    """
+    トレースを開く。拡張子から圧縮方式を判断し、ストリーミングで展開する。
+    mode は "r" (テキスト) か "rb" (バイナリ)。
+    """
+    if path.endswith(COMPRESSIONS["gzip"]):
+        raw = gzip.open(path, "rb")
+    elif path.endswith(COMPRESSIONS["xz"]):
+        raw = lzma.open(path, "rb")
+    elif path.endswith(COMPRESSIONS["zstd"]):
+        _require_zstandard()
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_size=READ_BUFFER_BYTES, closefd=True)
+    else:
+        raw = open(path, "rb", buffering=0)
+    stream = io.BufferedReader(raw, buffer_size=READ_BUFFER_BYTES)
+    if mode == "rb":
+        return stream
+    return io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+
+
+def is_compressed(path):
+    return path.endswith(tuple(COMPRESSIONS.values()))
+
+
+def split_trace(path, max_parts, min_bytes=0):
+    """
+    非圧縮トレースを最大 max_parts 個の、行境界に揃えたバイト範囲 (start, stop) に分ける。
+    各範囲はおおよそ min_bytes 以上にする。圧縮トレースは途中から展開できないので [None] (分割しない)。
+    """
+    if is_compressed(path):
+        return [None]
+    size = os.path.getsize(path)
+    parts = max(1, min(max_parts, size // max(min_bytes, 1)))
+    if parts == 1:
+        return [(0, size)]
+    bounds = [0]
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for k in range(1, parts):
+            newline = mm.find(b"\n", max(k * size // parts - 1, bounds[-1]))
+            if newline < 0:
+                break
+            if newline + 1 > bounds[-1]:
+                bounds.append(newline + 1)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_trace_blocks(path, block_bytes=BLOCK_BYTES, byte_range=None):
+    """
+    トレースを行境界に揃えたブロックに分けて順に返す。
+    各ブロックは完全な行だけを含む (最後のブロックは改行で終わらないことがある)。
+    ブロックは bytes か、読んだ bytes を切り出す memoryview (行のコピーを避ける)。
+    非圧縮トレースは mmap の切り出しより速いので、バッファを介さずに block_bytes ずつ read する。
+    byte_range=(start, stop) なら非圧縮トレースのその範囲だけを読む (split_trace の範囲)。
+    """
+    if byte_range is not None and is_compressed(path):
+        raise ValueError(f"byte ranges are not supported for compressed traces: {path}")
+    with (open_trace(path, "rb") if is_compressed(path) else open(path, "rb", buffering=0)) as f:
+        remaining = None
+        if byte_range is not None:
+            start, end = byte_range
+            f.seek(start)
+            remaining = max(end - start, 0)
+        rest = b""
+        while remaining is None or remaining > 0:
+            chunk = f.read(block_bytes if remaining is None else min(block_bytes, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            if rest:
+                chunk = rest + chunk
+            newline = chunk.rfind(b"\n")
+            if newline < 0:
+                rest = chunk
+                continue
+            rest = chunk[newline + 1:]
+            yield memoryview(chunk)[:newline + 1]
+        if rest:
+            yield rest
+
+
+def compress_trace(trace_path, method="gzip", level=None):
+    """
+    トレースを圧縮して元のファイルを削除する。
+    戻り値: 圧縮後のパス
+    """
+    if method not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {method} (expected one of {tuple(COMPRESSIONS)})")
+    level = COMPRESSION_LEVELS[method] if level is None else level
+    out_path = trace_path + COMPRESSIONS[method]
+    tmp_path = out_path + ".tmp"
+    with open(trace_path, "rb") as src:
+        if method == "gzip":
+            with gzip.open(tmp_path, "wb", compresslevel=level) as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_BYTES)
+        elif method == "xz":
+            with lzma.open(tmp_path, "wb", preset=level) as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_BYTES)
+        else:
+            _require_zstandard()
+            with open(tmp_path, "wb") as dst:
+                zstandard.ZstdCompressor(level=level).copy_stream(src, dst, read_size=COPY_BUFFER_BYTES)
+    os.replace(tmp_path, out_path)
+    os.remove(trace_path)
+    return out_path
@@ -0,0 +1,958 @@
+# -*- coding: utf-8 -*-
+"""
+.trace の解析 (ノードごとのカウンタへの集約)
+
+機能:
+- .trace を1回読み、ノードごとのカウンタに集約する。数えるイベントは EVENT_RULES の表
+  (ノードの種類, イベント名, フレーム種別, 添字にする列, PAN 合計の有無) で宣言し、
+  表はブロックごとの1回の振り分けにまとめて実行する。指標を増やしても読み込みは1回のまま。
+- カウンタは .counters.npz としてトレースの隣に保存でき、PER はカウンタだけから計算できる。
+  PER 以外の指標 (ACK 率, 再送回数, CSMA のチャネルアクセス失敗率, PAN ごとの合計) は
+  metrics_from_counters で同じカウンタから求める。
+- 統計と同じ計測区間 (.statconfig の DrIotMac_* INF_TIME 開始 終了) の行だけを数える。
+  parse_trace_timeline は同じ1回の読み込みで、計測区間を一定幅の時間ビンに分けたカウンタも求める
+  (ビン数は区間とビン幅で決まり、メモリはトレースの大きさによらない)。
+  シミュレーション完了直後にカウンタへ集約しておけば、生のトレースは削除・圧縮してよい。
+- 解析スクリプトは、トレースより新しく、今の .statconfig と同じ計測区間で数えたカウンタがあれば
+  トレースを読まずにそれを使う (カウンタには数えた計測区間も保存する)。
+- 圧縮済みのトレース (.trace.gz / .trace.zst / .trace.xz) もそのまま読む (trace_io)。
+- parse_runs で多数のトレースをプロセスプールで並列に解析し、ランごとのカウンタを
+  1つの配列 (ラン × カウンタ × ノードID) にまとめる。結果は並列数によらず同じ。
+  counters_cache のキャッシュを渡せば、変わっていないトレースは解析しない。
+- ファイル数がプロセス数より少ないときは、大きな非圧縮トレースを行境界に揃えたバイト範囲に分けて
+  別々のプロセスで数え、カウンタを足し合わせる (カウンタは範囲ごとの和なので結果は同じ)。
+- トレースは行ごとに str へ変換せず、ブロック単位のバイト列を NumPy でまとめて
+  トークン分割し、必要な列 (parts[3], [5], [9], [11], [13], [15]) だけを取り出して数える。
+  行ごとに split する従来の実装は parse_trace_counters_lines として残す (検証・ベンチマーク用)。
+"""
+
+import collections
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from trace_io import COMPRESSIONS, compress_trace, find_trace, iter_trace_blocks, open_trace, split_trace
+
+PARSER_VERSION = 4
+COORDINATOR_IDS = ("1", "2")
+NUM_PAN = len(COORDINATOR_IDS)
+COUNTERS_SUFFIX = ".counters.npz"
+STATCONFIG_SUFFIX = ".statconfig"
+# 計測区間 (TEMPLATE.statconfig.j2 の "* DrIotMac_* INF_TIME <開始> <終了>")
+WINDOW_LINE_RE = re.compile(r"^\S+\s+DrIotMac_\S*\s+INF_TIME\s+(\S+)\s+(\S+)")
+TRACE_ACTIONS = ("keep", "delete") + tuple(COMPRESSIONS)
+
+# 数えるイベントの表。各規則が1つのカウンタ (ノードIDを添字とする配列) になる。
+#   node: "coordinator" / "device" (parts[3] がコーディネータ ID か)
+#   event: イベント名 (parts[9])、frame: フレーム種別 (parts[15], None なら問わない)
+#   index: 添字にする列 ("node": parts[3], "src": parts[11] の送信元, "dst": parts[15] の宛先)
+#   min_retry: Retry (parts[13]) がこの値以上の行だけ数える
+#   pan_totals: 添字 1, 2 に PAN ごとのデバイス合計も加える (コーディネータ ID と同じ添字)
+EventRule = collections.namedtuple(
+    "EventRule", ("counter", "node", "event", "frame", "index", "min_retry", "pan_totals"),
+    defaults=(None, "node", 0, False),
+)
+
+EVENT_RULES = (
+    # device → coordinator: コーディネータが受信した Data (送信元デバイスごと)
+    EventRule("coordinator_receive", "coordinator", "RxFrame", frame="Data", index="src", pan_totals=True),
+    # device → coordinator: デバイスの DataFrameDequeued
+    EventRule("device_dequeued", "device", "DataFrameDequeued", pan_totals=True),
+    # device → coordinator: デバイスが受信した ACK
+    EventRule("device_received_ack", "device", "RxFrame", frame="ACK"),
+    # coordinator → device: コーディネータの DataFrameDequeued (宛先デバイスごと)
+    EventRule("coordinator_dequeued", "coordinator", "DataFrameDequeued", index="dst"),
+    # coordinator → device: デバイスが受信した Data
+    EventRule("device_receive", "device", "RxFrame", frame="Data"),
+    # デバイスの Data 送信 (再送を含む) と、そのうちの再送
+    EventRule("device_tx_data", "device", "Tx-DATA", pan_totals=True),
+    EventRule("device_retransmissions", "device", "Tx-DATA", min_retry=1, pan_totals=True),
+    # CSMA のバックオフ失敗 (チャネルアクセス失敗)
+    EventRule("device_access_failures", "device", "ChannelAccessFailure", pan_totals=True),
+    # コーディネータの Data 送信・再送・チャネルアクセス失敗 (添字はコーディネータ ID)
+    EventRule("coordinator_tx_data", "coordinator", "Tx-DATA"),
+    EventRule("coordinator_retransmissions", "coordinator", "Tx-DATA", min_retry=1),
+    EventRule("coordinator_access_failures", "coordinator", "ChannelAccessFailure"),
+)
+# カウンタ名 (各ノードIDを添字とする配列)
+COUNTER_NAMES = tuple(rule.counter for rule in EVENT_RULES)
+# parse_trace_counters_lines が数えるカウンタ (従来の PER 用)
+PER_COUNTER_NAMES = COUNTER_NAMES[:5]
+
+
+def num_device_per_pan(num_nodes):
+    """ノード数 (コーディネータ込み) から PAN あたりのデバイス数を求める"""
+    return (int(num_nodes) - NUM_PAN) // NUM_PAN
+
+
+def counters_path(trace_path):
+    """トレースに対応するカウンタファイルのパス"""
+    base, ext = os.path.splitext(trace_path)
+    return (base if ext == ".trace" else trace_path) + COUNTERS_SUFFIX
+
+
+def statconfig_path(trace_path):
+    """トレースと同じランの .statconfig のパス"""
+    base, ext = os.path.splitext(trace_path)
+    return (base if ext == ".trace" else trace_path) + STATCONFIG_SUFFIX
+
+
+def read_measure_window(statconfig):
+    """.statconfig の DrIotMac_* の計測区間 (開始, 終了) [s]。無ければ None"""
+    try:
+        with open(statconfig, "r") as f:
+            for line in f:
+                match = WINDOW_LINE_RE.match(line.strip())
+                if match:
+                    return float(match.group(1)), float(match.group(2))
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def measure_window(trace_path):
+    """ランの計測区間 (.statconfig が無ければ None = 全区間)"""
+    return read_measure_window(statconfig_path(trace_path))
+
+
+def window_to_array(window):
+    """計測区間を保存用の配列 [開始, 終了] にする (None = 全区間は NaN)"""
+    return np.array(window if window is not None else (np.nan, np.nan), dtype=float)
+
+
+def window_from_array(values):
+    """window_to_array の逆"""
+    start, end = (float(v) for v in values)
+    return None if math.isnan(start) else (start, end)
+
+
+def time_bins(window, bin_sec):
+    """計測区間をビン幅 bin_sec で分けたときのビンの境界"""
+    num_bins = max(1, int(math.ceil((window[1] - window[0]) / bin_sec - 1e-9)))
+    return window[0] + bin_sec * np.arange(num_bins + 1)
+
+
+# 解析に使う列 (空白区切りのトークン番号)
+FIELD_TIME, FIELD_NODE, FIELD_MODEL, FIELD_EVENT, FIELD_PKT_ID, FIELD_RETRY, FIELD_FRAME = 0, 3, 5, 9, 11, 13, 15
+PARSE_BLOCK_BYTES = 1 << 20  # NumPy の一時配列がキャッシュに収まる大きさ
+MIN_RANGE_BYTES = 64 << 20   # 1つのトレースを分割して並列に解析するときの範囲の最小の大きさ
+
+
+def _pattern(text):
+    """先頭 8 バイトまでの文字列を (値, マスク) の uint64 にする (リトルエンディアン)"""
+    text = text[:8]
+    value = int.from_bytes(text.ljust(8, b"\0"), "little")
+    return np.uint64(value), np.uint64((1 << (8 * len(text))) - 1)
+
+
+def _patterns(text):
+    """文字列を 8 バイトずつの (値, マスク) の列にする (前方一致の判定用)"""
+    return tuple(_pattern(text[i:i + 8]) for i in range(0, len(text), 8))
+
+
+MODEL_MAC = _pattern(b"DrIotMac")
+ASCII_ZEROS = np.uint64(0x3030303030303030)
+ASCII_DOT = ord(".")
+SHIFT_8 = np.uint64(8)
+LOW7_BITS = np.uint64(0x7F7F7F7F7F7F7F7F)
+HIGH_BITS = np.uint64(0x8080808080808080)
+ABOVE_NINE = np.uint64(0x7676767676767676)  # 0x80 - 10: 足すと 10 以上のバイトの最上位ビットが立つ
+BYTE_ONES = np.uint64(0x0101010101010101)
+# 8 桁の数字列を 2 桁・4 桁・8 桁ずつまとめる (倍率, 下位側の桁のシフト, 残すビット)
+LEADING_INT_STEPS = tuple((np.uint64(scale), np.uint64(shift), np.uint64(mask)) for scale, shift, mask in (
+    (10, 8, 0x00FF00FF00FF00FF), (100, 16, 0x0000FFFF0000FFFF), (10000, 32, 0x00000000FFFFFFFF)))
+WINDOW_BITS = 57     # 区切りのビット列を 8 バイト単位で読むとき、どの位置からでも続けて読めるビット数
+
+
+def _words(a, w8, starts):
+    """各位置から 8 バイトを uint64 として読む (ブロック末尾を越える分は 0)"""
+    if len(starts) and starts[-1] > len(a) - 8:
+        clipped = np.minimum(starts, len(a) - 8)
+        return w8[clipped] >> ((starts - clipped).astype(np.uint64) * SHIFT_8)
+    return w8[starts]
+
+
+def _match(words, pattern):
+    value, mask = pattern
+    return (words & mask) == value
+
+
+def _leading_int_table():
+    """
+    先頭 2 バイト (リトルエンディアンの 16 ビット) → 数字列の値 × 4 + 桁数 (2 桁まで) の表。
+    ノードID・宛先・再送回数はほとんどが 2 桁までなので、表を1回引くだけで求まる
+    """
+    low, high = np.divmod(np.arange(1 << 16), 256)[::-1]
+    first, second = low - ord("0"), high - ord("0")
+    is_first, is_second = (first >= 0) & (first <= 9), (second >= 0) & (second <= 9)
+    ndigit = np.where(is_first, np.where(is_second, 2, 1), 0)
+    value = np.where(is_first, np.where(is_second, first * 10 + second, first), 0)
+    return value * 4 + ndigit
+
+
+LEADING_INT_TABLE = _leading_int_table()
+
+
+def _coordinator_table():
+    """先頭 2 バイト (リトルエンディアンの 16 ビット) → ノードIDのトークンがコーディネータ ID (1 文字) そのものか"""
+    high, low = np.divmod(np.arange(1 << 16), 256)
+    return np.isin(low, [ord(node_id) for node_id in COORDINATOR_IDS]) & (high <= 32)
+
+
+COORDINATOR_TABLE = _coordinator_table()
+
+
+def _leading_int_swar(words):
+    """8 バイトの先頭にある数字列 (最大 8 桁) を整数にする (SWAR)。戻り値: (値, 桁数)"""
+    x = words ^ ASCII_ZEROS  # 数字のバイトは 0-9 になる
+    # 一時配列を増やさないように、できるだけその場で演算する
+    nondigit = x & LOW7_BITS
+    nondigit += ABOVE_NINE
+    nondigit |= x
+    nondigit &= HIGH_BITS
+    # 最初の数字でないバイトより前のバイトを 0xFF にしたマスク (すべて数字なら全バイト)
+    keep = np.negative(nondigit)
+    keep &= nondigit
+    keep >>= np.uint64(7)
+    keep -= np.uint64(1)
+    ndigit = keep & BYTE_ONES
+    ndigit *= BYTE_ONES
+    ndigit >>= np.uint64(56)
+    # 数字列だけを残して上位バイト側に寄せる (下位の空きは 0)
+    x &= keep
+    x <<= np.uint64(64) - (ndigit << np.uint64(3))
+    for scale, shift, mask in LEADING_INT_STEPS:
+        low = x >> shift
+        x *= scale
+        x += low
+        x &= mask
+    return x.view(np.int64), ndigit.view(np.int64)
+
+
+def _leading_int(words):
+    """
+    8 バイトの先頭にある数字列 (最大 8 桁) を整数にする。
+    2 桁までは先頭 2 バイトの表 (LEADING_INT_TABLE) で求め、3 桁目も数字の行だけ SWAR で求め直す。
+    戻り値: (値, 桁数)
+    """
+    entry = LEADING_INT_TABLE[(words & np.uint64(0xFFFF)).view(np.int64)]
+    value, ndigit = entry >> 2, entry & 3
+    third = ((words >> np.uint64(16)) & np.uint64(0xFF)) - np.uint64(ord("0"))  # 数字でなければ 10 以上 (負は折り返す)
+    longer = np.flatnonzero((third < 10) & (ndigit == 2))
+    if len(longer):
+        value[longer], ndigit[longer] = _leading_int_swar(words[longer])
+    return value, ndigit
+
+
+def _times(a, w8, starts):
+    """時刻の列 ("12.345678901") を秒にする (整数部・小数部とも 8 桁まで)"""
+    whole, ndigit = _leading_int(_words(a, w8, starts))
+    dot = np.take(a, np.minimum(starts + ndigit, len(a) - 1)) == ASCII_DOT
+    frac, nfrac = _leading_int_swar(_words(a, w8, np.minimum(starts + ndigit + 1, len(a) - 1)))
+    return whole + np.where(dot, frac / 10.0 ** nfrac, 0.0)
+
+
+def _lowest_bit(bits):
+    """立っている最下位ビットの位置 (ビットが無ければ負)。2 のべき乗は float64 で正確に表せるので指数部から求める"""
+    low = bits & (np.uint64(0) - bits)
+    return (low.astype(np.float64).view(np.int64) >> 52) - 1023
+
+
+def _set_bits(words):
+    """ビット列 (uint64 の列、下位ビットが前) の立っているビットの位置 (昇順)"""
+    k = np.flatnonzero(words != 0)
+    bits = words[k]
+    base = 64 * k
+    found = []
+    while len(bits):
+        found.append(base + _lowest_bit(bits))
+        bits &= bits - np.uint64(1)
+        rest = bits != 0
+        bits, base = bits[rest], base[rest]
+    if len(found) == 1:
+        return found[0]
+    return np.sort(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+
+def _window(bitmap8, pos):
+    """区切りのビット列の pos ビット目から WINDOW_BITS ビット (下位ビットが pos)"""
+    return bitmap8[pos >> 3] >> (pos & 7).view(np.uint64)
+
+
+def _next_separator(bitmap8, pos, limit):
+    """pos より後ろの最初の区切りの位置 (limit までに無ければ limit)"""
+    result = np.full(len(pos), limit)
+    rows = np.arange(len(pos))
+    start = pos + 1
+    while len(rows):
+        inside = start < limit
+        rows, start = rows[inside], start[inside]
+        bits = _window(bitmap8, start)
+        hit = bits != 0
+        result[rows[hit]] = start[hit] + _lowest_bit(bits[hit])
+        rows, start = rows[~hit], start[~hit] + WINDOW_BITS
+    return result
+
+
+def _nth_separators(bitmap8, pos, counts, limit):
+    """
+    pos より後ろの区切りのうち counts 番目 (1 始まりの昇順の番号) の位置のリスト。
+    ふつうは pos からの 1 回の読み出しに収まるので、立っているビットを下から順に消して数える。
+    収まらない行だけ区切りを1つずつ求め直す (limit までに足りなければ limit)
+    """
+    bits = _window(bitmap8, pos + 1)
+    base = pos + (1 - 1023)  # 読み出しの先頭の位置から float64 の指数のバイアスを引いたもの (_lowest_bit)
+    found = []
+    done = 0
+    for count in counts:
+        for _ in range(count - done - 1):
+            bits &= bits - np.uint64(1)
+        rest = bits & (bits - np.uint64(1))
+        found.append(base + ((bits ^ rest).astype(np.float64).view(np.int64) >> 52))
+        bits = rest
+        done = count
+    short = np.flatnonzero(found[-1] <= pos)
+    if len(short):
+        sep = pos[short]
+        done = 0
+        for number, count in enumerate(counts):
+            for _ in range(count - done):
+                sep = _next_separator(bitmap8, sep, limit)
+            found[number][short] = sep
+            done = count
+    return found
+
+
+def _first_bytes_table(patterns):
+    """
+    先頭 2 バイト (リトルエンディアンの 16 ビット) → その 2 バイトで始まる名前の番号 (無ければ -1) の表。
+    patterns は名前ごとの _patterns。2 バイトで名前が1つに決まらなければ None
+    """
+    keys = np.arange(1 << 16, dtype=np.uint64)
+    table = np.full(1 << 16, -1)
+    for number, words in enumerate(patterns):
+        value, mask = words[0]
+        mask = mask & np.uint64(0xFFFF)
+        hit = (keys & mask) == (value & mask)
+        if (table[hit] >= 0).any():
+            return None
+        table[hit] = number
+    return table
+
+
+def _unique_prefixes(names, what):
+    """前方一致で照合する名前が互いの前方一致になっていないことを確かめる (1行が1つにだけ一致するように)"""
+    for name in names:
+        for other in names:
+            if name != other and other.startswith(name):
+                raise ValueError(f"{what} '{name}' is a prefix of '{other}'")
+    return tuple(names)
+
+
+class CompiledRules:
+    """
+    EVENT_RULES をブロック単位の振り分けにまとめたもの。
+    各行を (イベント, ノードの種類, フレーム種別, 再送回数の段階) の組 (カテゴリ) に分け、
+    添字にする列ごとに (カテゴリ, ノードID) の1回の bincount で数えてから規則ごとに足し合わせる
+    """
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        self.event_names = _unique_prefixes(list(dict.fromkeys(rule.event for rule in self.rules)), "event")
+        self.frame_names = _unique_prefixes(list(dict.fromkeys(rule.frame for rule in self.rules if rule.frame)), "frame")
+        self.events = [_patterns(name.encode()) for name in self.event_names]
+        self._event_table = _first_bytes_table(self.events)
+        # 名前の k 語目の (値, マスク) を名前の番号で引く表。名前より後ろの語はマスク 0 (常に一致)、
+        # 最後の列は候補の無い行 (-1) 用で、先頭の語が一致しない値・マスクにする
+        num_words = max(len(patterns) for patterns in self.events)
+        self._event_values = np.zeros((num_words, len(self.events) + 1), dtype=np.uint64)
+        self._event_masks = np.zeros((num_words, len(self.events) + 1), dtype=np.uint64)
+        self._event_values[0, -1] = 1
+        for number, patterns in enumerate(self.events):
+            for k, (value, mask) in enumerate(patterns):
+                self._event_values[k, number], self._event_masks[k, number] = value, mask
+        self._event_long = np.array([len(patterns) > 1 for patterns in self.events] + [False])
+        self.frames = [_pattern(name.encode()) for name in self.frame_names]
+        self.retry_levels = tuple(sorted({rule.min_retry for rule in self.rules if rule.min_retry > 0}))
+        # 再送回数 (最大の段階で打ち切る) → 段階の表
+        self.retry_table = np.searchsorted(self.retry_levels, np.arange(max(self.retry_levels, default=0) + 1),
+                                           side="right")
+        # フレーム種別・再送回数で分ける規則のあるイベント (それ以外のイベントの行はフレーム・再送回数を読まない)
+        self.frame_events = np.array([any(rule.event == name and rule.frame for rule in self.rules)
+                                      for name in self.event_names])
+        self.retry_events = np.array([any(rule.event == name and rule.min_retry > 0 for rule in self.rules)
+                                      for name in self.event_names])
+        self._flags = np.zeros(0, dtype=bool)
+
+        # カテゴリ = ((イベント × 2 + コーディネータか) × (フレーム種別 + 1) + フレーム) × (段階 + 1) + 再送回数の段階
+        self.shape = (len(self.event_names), 2, len(self.frame_names) + 1, len(self.retry_levels) + 1)
+        event, coordinator, frame, retry = (axis.ravel() for axis in np.indices(self.shape))
+        self.rule_categories = np.zeros((len(self.rules), event.size), dtype=bool)
+        for i, rule in enumerate(self.rules):
+            match = (event == self.event_names.index(rule.event)) & (coordinator == (rule.node == "coordinator"))
+            if rule.frame:
+                match &= frame == self.frame_names.index(rule.frame)
+            if rule.min_retry > 0:
+                match &= retry > self.retry_levels.index(rule.min_retry)
+            self.rule_categories[i] = match
+        # 添字にする列 → (その列で数えるカテゴリ, 規則の番号)
+        self.index_columns = {}
+        for i, rule in enumerate(self.rules):
+            categories, numbers = self.index_columns.setdefault(rule.index, (np.zeros(event.size, dtype=bool), []))
+            categories |= self.rule_categories[i]
+            numbers.append(i)
+
+    def _event_index(self, event_words):
+        """
+        イベント名の番号 (どれにも一致しない行は -1)。event_words(k, rows) は rows 行の、名前の k 語目と照合する語。
+        先頭 2 バイトの表 (_first_bytes_table) で候補の名前を1つに絞ってから先頭の語を照合し、
+        2語目以降は 2語以上の名前が候補の行だけを読む
+        """
+        first = event_words(0, slice(None))
+        if self._event_table is None:
+            index = np.full(len(first), -1)
+            for number, patterns in enumerate(self.events):
+                rows = np.flatnonzero(_match(first, patterns[0]))
+                for k in range(1, len(patterns)):
+                    rows = rows[_match(event_words(k, rows), patterns[k])]
+                index[rows] = number
+            return index
+        index = self._event_table[(first & np.uint64(0xFFFF)).view(np.int64)]
+        index[(first & self._event_masks[0][index]) != self._event_values[0][index]] = -1
+        rows = np.flatnonzero(self._event_long[index])
+        for k in range(1, len(self._event_masks)):
+            candidates = index[rows]
+            miss = (event_words(k, rows) & self._event_masks[k][candidates]) != self._event_values[k][candidates]
+            index[rows[miss]] = -1
+        return index
+
+    def _bitmaps(self, a):
+        """
+        ブロックの改行と、トークン区切り (空白・改行の直後に空白でない文字が来る位置) のビット列
+        (uint64 の列、下位ビットが前)。区切りは行ごとの split の区切りと同じ位置に立つ。
+        ブロックの末尾より後ろは空白として扱う。判定結果の一時配列は、ブロックごとに確保すると
+        ページフォールトが解析と同じくらい掛かるので使い回す
+        """
+        length = len(a)
+        size = (length + 64) // 64 * 64  # 末尾の次 (length) の位置まで含める
+        if len(self._flags) < size + 64:
+            self._flags = np.zeros(size + 64, dtype=bool)
+        flags = self._flags[:size + 64]
+        np.equal(a, 10, out=flags[:length])
+        flags[length:size] = False
+        newline = np.packbits(flags[:size], bitorder="little").view("<u8")
+        np.less_equal(a, 32, out=flags[:length])
+        flags[length:] = True
+        space = np.packbits(flags, bitorder="little").view("<u8")
+        # 区切りは空白で、次の位置が空白でない (次の位置のビットは 1 つ右、語の境目は次の語の最下位ビット)
+        separators = np.zeros(len(space), dtype=np.uint64)  # 最後の語は 8 バイト単位で読むための 0
+        separators[:-1] = space[:-1] & ~((space[:-1] >> np.uint64(1)) | (space[1:] << np.uint64(63)))
+        return newline, separators
+
+    def _token_rows(self, a, w8):
+        """
+        空白で区切ったトークンの番号 (FIELD_*) から、数える対象の行の値を求める。
+        行ごとの split と同じトークンになる (行は改行の直後のトークンから次の同じ区切りまで、トークンは 16 個以上)。
+        各行の必要な番号の区切りだけを区切りのビット列から数えて求める。
+        パケットID・再送回数・フレームはトークンの先頭の位置を返し、使う行だけ count_block で読む
+        """
+        length = len(a)
+        newline, separators = self._bitmaps(a)
+        bitmap8 = np.ndarray((len(separators) * 8 - 7,), dtype="<u8", buffer=separators, strides=(1,))
+        # 行の先頭: ブロックの先頭と改行の次の位置のうち、空白でない文字で始まるもの (区切りになっている改行の次)
+        start = _set_bits(newline & separators[:len(newline)]) + 1
+        if a[0] > 32:
+            start = np.concatenate(([0], start))
+        # 行の終わり = 次の行の直前の改行 (最後の行はブロックの末尾)
+        end = np.append(start[1:] - 1, length)
+
+        # DrIotMac の行のうち、いずれかの規則のイベントの行だけを残す
+        node_sep, model_sep = _nth_separators(bitmap8, start - 1, (FIELD_NODE, FIELD_MODEL), length)
+        rows = np.flatnonzero(_match(_words(a, w8, model_sep + 1), MODEL_MAC))
+        start, end, node_sep, model_sep = start[rows], end[rows], node_sep[rows], model_sep[rows]
+        event_sep, = _nth_separators(bitmap8, model_sep, (FIELD_EVENT - FIELD_MODEL,), length)
+        event = self._event_index(lambda k, rows: _words(a, w8, event_sep[rows] + 1 + 8 * k))
+        rows = np.flatnonzero(event >= 0)
+        if len(rows) < len(start):
+            start, end, node_sep, event_sep, event = (values[rows] for values in (start, end, node_sep, event_sep, event))
+        pkt_id_sep, retry_sep, frame_sep = _nth_separators(
+            bitmap8, event_sep, (FIELD_PKT_ID - FIELD_EVENT, FIELD_RETRY - FIELD_EVENT, FIELD_FRAME - FIELD_EVENT), length)
+        # トークンが足りない行 (フレームの区切りが次の行にある) は数えない
+        rows = np.flatnonzero(frame_sep < end)
+        if len(rows) < len(start):
+            start, node_sep, event, pkt_id_sep, retry_sep, frame_sep = (
+                values[rows] for values in (start, node_sep, event, pkt_id_sep, retry_sep, frame_sep))
+
+        node_words = _words(a, w8, node_sep + 1)
+        return {
+            "time": start,
+            "node": _leading_int(node_words)[0],
+            "is_coordinator": COORDINATOR_TABLE[(node_words & np.uint64(0xFFFF)).view(np.int64)],
+            "event": event,
+            "pkt_id": pkt_id_sep + 1,
+            "retry": retry_sep + 1,
+            "frame": frame_sep + 1,
+        }
+
+    def _index_values(self, column, a, w8, rows, selected=None):
+        """添字にする列の値 ("node": ノードID, "src": パケットIDの送信元, "dst": フレームの宛先)"""
+        if column == "node":
+            values = rows["node"]
+            return values if selected is None else values[selected]
+        starts = rows["pkt_id"] if column == "src" else rows["frame"]
+        return _leading_int(_words(a, w8, starts if selected is None else starts[selected]))[0]
+
+    def new_tables(self, size):
+        """
+        count_block で数える表 (添字にする列 → カテゴリ × (ノードID + 1) の数を平らにした配列)。
+        size 以上のノードIDは最後の列にまとめる (PAN 合計には含め、ノードごとのカウンタには含めない)
+        """
+        return {column: np.zeros(categories.size * (size + 1), dtype=np.int64)
+                for column, (categories, _) in self.index_columns.items()}
+
+    def counters(self, tables, size, sender_range1):
+        """表 (new_tables) から各規則のカウンタ (カウンタ名 → ノードIDを添字とする配列) を求める"""
+        counters = {}
+        for column, (categories, numbers) in self.index_columns.items():
+            table = tables[column].reshape(categories.size, size + 1)
+            for number in numbers:
+                rule = self.rules[number]
+                counts = table[self.rule_categories[number]].sum(axis=0)
+                values = counts[:size].copy()
+                if rule.pan_totals:
+                    in_pan1 = int(counts[sender_range1[0]:sender_range1[1]].sum())
+                    values[1] += in_pan1
+                    values[2] += int(counts.sum()) - in_pan1
+                counters[rule.counter] = values
+        return {rule.counter: counters[rule.counter] for rule in self.rules}
+
+    def count_block(self, block, tables, size, sender_range1, window=None, bins=None, binned=None):
+        """
+        1ブロック分のイベントを表 (new_tables) に加える。規則ごとのカウンタへの振り分けはブロックごとではなく
+        最後に1回だけ行う (counters)。
+        window=(開始, 終了) ならその区間の行だけを数える。
+        bins (time_bins の境界) を渡すと、binned (カウンタ名 → (ビン数, ノードID)) にもビンごとに加える。
+        """
+        if len(block) < 8:
+            return  # 16 個のトークンの行は入らない
+        a = np.frombuffer(block, dtype=np.uint8)
+        w8 = np.ndarray((len(a) - 7,), dtype="<u8", buffer=block, strides=(1,))
+        rows = self._token_rows(a, w8)
+        if window is not None:
+            t = _times(a, w8, rows["time"])
+            keep = (t >= window[0]) & (t < window[1])
+            rows = {name: values[keep] for name, values in rows.items()}
+            if binned is not None:
+                bin_index = np.searchsorted(bins, t[keep], side="right") - 1
+                num_bins = len(bins) - 1
+
+        # フレーム種別で分ける規則のあるイベントの行だけフレームを読む (それ以外の行は「その他」の種別)
+        frame_class = np.full(len(rows["event"]), len(self.frames))
+        with_frame = np.flatnonzero(self.frame_events[rows["event"]])
+        frame = _words(a, w8, rows["frame"][with_frame])
+        for number in range(len(self.frames) - 1, -1, -1):
+            frame_class[with_frame[_match(frame, self.frames[number])]] = number
+        category = (rows["event"] * 2 + rows["is_coordinator"]) * self.shape[2] + frame_class
+        category = category * self.shape[3]
+        if self.retry_levels:
+            with_retry = np.flatnonzero(self.retry_events[rows["event"]])
+            retry = _leading_int(_words(a, w8, rows["retry"][with_retry]))[0]
+            category[with_retry] += self.retry_table[np.minimum(retry, len(self.retry_table) - 1)]
+
+        # 添字にする列ごとに (カテゴリ, ノードID) を数える。ノードIDは全行で読んであるので全行を数え
+        # (規則に無いカテゴリの分は counters で使わない)、ほかの列はその列で数えるカテゴリの行だけを読む
+        stride = size + 1
+        for column, (categories, _) in self.index_columns.items():
+            selected = None if column == "node" else categories[category]
+            ids = np.minimum(self._index_values(column, a, w8, rows, selected), size)
+            codes = category * stride if selected is None else category[selected] * stride
+            codes += ids
+            tables[column] += np.bincount(codes, minlength=categories.size * stride)
+
+        if binned is None:
+            return
+        for number, rule in enumerate(self.rules):
+            mask = self.rule_categories[number][category]
+            ids = self._index_values(rule.index, a, w8, rows, mask)
+            rows_in_bin = bin_index[mask]
+            valid = (ids < size) & (rows_in_bin < num_bins)
+            counts = np.bincount(rows_in_bin[valid] * size + ids[valid], minlength=num_bins * size)
+            counts = counts.reshape(num_bins, size)
+            binned[rule.counter] += counts
+            if rule.pan_totals:
+                in_pan1 = counts[:, sender_range1[0]:sender_range1[1]].sum(axis=1)
+                binned[rule.counter][:, 1] += in_pan1
+                binned[rule.counter][:, 2] += np.bincount(rows_in_bin[rows_in_bin < num_bins], minlength=num_bins) - in_pan1
+
+
+COMPILED_RULES = CompiledRules(EVENT_RULES)
+
+
+def _count_trace(filepath, num_device, block_bytes, byte_range, window, bins=None):
+    size = 3 * num_device
+    sender_range1 = (3, num_device + 3)
+    tables = COMPILED_RULES.new_tables(size)
+    binned = None
+    if bins is not None:
+        binned = {name: np.zeros((len(bins) - 1, size), dtype=np.int64) for name in COUNTER_NAMES}
+    for block in iter_trace_blocks(find_trace(filepath) or filepath, block_bytes, byte_range):
+        COMPILED_RULES.count_block(block, tables, size, sender_range1, window, bins, binned)
+    return COMPILED_RULES.counters(tables, size, sender_range1), binned
+
+
+def parse_trace_counters(filepath, num_device, block_bytes=PARSE_BLOCK_BYTES, byte_range=None, window=None):
+    """
+    .trace をノードごとのカウンタに集約する。
+    添字 1, 2 には PAN ごとのデバイス合計を入れる (コーディネータ ID と同じ添字)。
+    filepath が .trace で、それが無く圧縮済みのトレースがあればそちらを読む。
+    byte_range=(start, stop) なら非圧縮トレースのその範囲 (trace_io.split_trace) だけを数える。
+    window=(開始, 終了) [s] ならその区間の行だけを数える (ランの計測区間は measure_window)。
+
+    window=None なら parse_trace_counters_lines と同じ結果になる。ただしモデル名・イベント名・
+    フレーム種別は部分一致ではなく前方一致で判定し、ノードID・宛先は 8 桁までとする
+    (Scenargie のトレースではどちらも同じ)。
+    """
+    return _count_trace(filepath, num_device, block_bytes, byte_range, window)[0]
+
+
+def parse_trace_timeline(filepath, num_device, bin_sec, window=None, block_bytes=PARSE_BLOCK_BYTES, byte_range=None):
+    """
+    計測区間のカウンタと、区間を bin_sec 秒ごとに分けたカウンタを1回の読み込みで求める。
+    window を省略するとランの .statconfig の計測区間を使う。
+    戻り値: (カウンタ, ビンごとのカウンタ (名前 → (ビン数, ノードID)), ビンの境界 [s])
+    """
+    window = window or measure_window(filepath)
+    if window is None:
+        raise ValueError(f"No measurement window for {filepath} (missing {statconfig_path(filepath)})")
+    bins = time_bins(window, bin_sec)
+    counters, binned = _count_trace(filepath, num_device, block_bytes, byte_range, window, bins)
+    return counters, binned, bins
+
+
+def timeline_metrics(binned, bins):
+    """
+    ビンごとのカウンタから、ビンごとのノード別 PER とスループット [frames/s] を計算する。
+    PER はビン内で送信キューから取り出した数と受信数の比なので、ビン境界をまたぐ送信の分だけずれる。
+    """
+    width = np.diff(bins)[:, None]
+    metrics = metrics_from_counters(binned)
+    return {
+        "up_per": metrics["up_per"],
+        "down_per": metrics["down_per"],
+        "up_throughput": binned["coordinator_receive"] / width,
+        "down_throughput": binned["device_receive"] / width,
+    }
+
+
+def parse_trace_counters_lines(filepath, num_device):
+    """
+    .trace を PER 用のカウンタ (PER_COUNTER_NAMES) に集約する (行ごとに split する従来の実装)。
+    添字 1, 2 には PAN ごとのデバイス合計を入れる (コーディネータ ID と同じ添字)。
+    filepath が .trace で、それが無く圧縮済みのトレースがあればそちらを読む。
+    """
+    counters = {name: [0 for _ in range(3 * num_device)] for name in PER_COUNTER_NAMES}
+    coordinator_receive = counters["coordinator_receive"]
+    device_dequeued = counters["device_dequeued"]
+    device_received_ack = counters["device_received_ack"]
+    coordinator_dequeued = counters["coordinator_dequeued"]
+    device_receive = counters["device_receive"]
+
+    SENDER_ID_RANGE1 = [int(i) for i in range(3, num_device + 3)]
+
+    with open_trace(find_trace(filepath) or filepath) as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+
+            #coordinator
+            if "DrIotMac" in parts[5] and parts[3] in COORDINATOR_IDS:
+                #coordinatorが送信機
+                if "DataFrameDequeued" in parts[9]:
+                    coordinator_dequeued[int(parts[15])] += 1
+
+                #coordinatorが受信機
+                if "RxFrame" in parts[9]:
+                    devicenum_ber = int(parts[11].split('_')[0])
+                    if "Data" in parts[15]:
+                        coordinator_receive[devicenum_ber] += 1
+                        if devicenum_ber in SENDER_ID_RANGE1:
+                            coordinator_receive[1] += 1
+                        else:
+                            coordinator_receive[2] += 1
+
+            #device
+            if "DrIotMac" in parts[5] and parts[3] not in COORDINATOR_IDS:
+                devicenum_ber = int(parts[3])
+                if "DataFrameDequeued" in parts[9]:
+                    device_dequeued[devicenum_ber] += 1
+                    if devicenum_ber in SENDER_ID_RANGE1:
+                        device_dequeued[1] += 1
+                    else:
+                        device_dequeued[2] += 1
+
+                if "RxFrame" in parts[9]:
+                    if "ACK" in parts[15]:
+                        device_received_ack[devicenum_ber] += 1
+                    if "Data" in parts[15]:
+                        device_receive[devicenum_ber] += 1
+
+    return {name: np.asarray(values, dtype=np.int64) for name, values in counters.items()}
+
+
+def per_from_counters(counters):
+    """カウンタからノードごとの上り・下り PER (送信元デバイスIDを添字とするリスト) を計算する"""
+    size = len(counters["device_dequeued"])
+    up_data_pdr_list = [0 for _ in range(size)]
+    down_data_pdr_list = [0 for _ in range(size)]
+    device_dequeued = counters["device_dequeued"].tolist()
+    coordinator_dequeued = counters["coordinator_dequeued"].tolist()
+    coordinator_receive = counters["coordinator_receive"].tolist()
+    device_receive = counters["device_receive"].tolist()
+    for device_id in range(size):
+        if device_dequeued[device_id] != 0 and coordinator_dequeued[device_id] != 0:
+            up_data_pdr_list[device_id] = round((device_dequeued[device_id] - coordinator_receive[device_id]) / device_dequeued[device_id], 3)
+            down_data_pdr_list[device_id] = round((coordinator_dequeued[device_id] - device_receive[device_id]) / coordinator_dequeued[device_id], 3)
+    return up_data_pdr_list, down_data_pdr_list
+
+
+def _ratio(numerator, denominator):
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan), where=denominator > 0)
+
+
+def _with_pan_totals(values):
+    """デバイスごとの値の添字 1, 2 に PAN ごとの合計を入れる (最後の軸がノードID)"""
+    values = np.array(values, dtype=np.int64)
+    num_device = values.shape[-1] // 3
+    values[..., 1] = values[..., 3:num_device + 3].sum(axis=-1)
+    values[..., 2] = values[..., num_device + 3:].sum(axis=-1)
+    return values
+
+
+def metrics_from_counters(counters):
+    """
+    カウンタからノードごとの指標を計算する (分母が 0 の要素は NaN)。
+    デバイスの指標の添字 1, 2 は PAN ごとの合計から求めた値、コーディネータの指標は添字 1, 2 のみ有効。
+    """
+    coordinator_frames = counters["coordinator_tx_data"] - counters["coordinator_retransmissions"]
+    return {
+        "up_per": 1.0 - _ratio(counters["coordinator_receive"], counters["device_dequeued"]),
+        "down_per": 1.0 - _ratio(counters["device_receive"], counters["coordinator_dequeued"]),
+        # 送信した Data 1回あたりに受信できた ACK
+        "ack_ratio": _ratio(_with_pan_totals(counters["device_received_ack"]), counters["device_tx_data"]),
+        # 送信キューから取り出した Data 1つあたりの再送回数・チャネルアクセス失敗回数
+        "retries_per_frame": _ratio(counters["device_retransmissions"], counters["device_dequeued"]),
+        "access_failure_rate": _ratio(counters["device_access_failures"], counters["device_dequeued"]),
+        # コーディネータは Data の初回送信 1回あたり
+        "coordinator_retries_per_frame": _ratio(counters["coordinator_retransmissions"], coordinator_frames),
+        "coordinator_access_failure_rate": _ratio(counters["coordinator_access_failures"], coordinator_frames),
+    }
+
+
+def node_parse_trace_file(filepath, num_device):
+    """
+    .trace から上り・下り PER のリストを求める。
+    load_run_counters と同じく、.statconfig の計測区間の行だけを数える (.statconfig が無ければ全行)
+    """
+    return per_from_counters(parse_trace_counters(filepath, num_device, window=measure_window(filepath)))
+
+
+def save_counters(path, counters, num_device, window=None, binned=None, bins=None):
+    """カウンタ (とビンごとのカウンタ) を、数えた計測区間 window とともに一時ファイル経由で原子的に書き出す"""
+    tmp_path = path + ".tmp.npz"
+    extra = {}
+    if binned is not None:
+        extra = {f"binned_{name}": values for name, values in binned.items()}
+        extra["bins"] = bins
+    np.savez(tmp_path, parser_version=PARSER_VERSION, num_device=num_device, window=window_to_array(window),
+             **counters, **extra)
+    os.replace(tmp_path, path)
+
+
+def load_counters(path, num_device):
+    """カウンタと、数えた計測区間を読む。パーサのバージョンかデバイス数が違えば (None, None)"""
+    try:
+        with np.load(path) as data:
+            if int(data["parser_version"]) != PARSER_VERSION or int(data["num_device"]) != num_device:
+                return None, None
+            return {name: data[name] for name in COUNTER_NAMES}, window_from_array(data["window"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def load_timeline(path, num_device):
+    """カウンタファイルのビンごとのカウンタ、ビンの境界、計測区間。無ければ (None, None, None)"""
+    try:
+        with np.load(path) as data:
+            if int(data["parser_version"]) != PARSER_VERSION or int(data["num_device"]) != num_device:
+                return None, None, None
+            if "bins" not in data:
+                return None, None, None
+            binned = {name: data[f"binned_{name}"] for name in COUNTER_NAMES}
+            return binned, data["bins"], window_from_array(data["window"])
+    except (OSError, KeyError, ValueError):
+        return None, None, None
+
+
+def counters_array(counters):
+    """カウンタ (名前 → 配列) を (len(COUNTER_NAMES), ノードID) の配列にまとめる"""
+    return np.stack([np.asarray(counters[name], dtype=np.int64) for name in COUNTER_NAMES])
+
+
+def counters_dict(array):
+    """counters_array の逆"""
+    return {name: array[i] for i, name in enumerate(COUNTER_NAMES)}
+
+
+def load_fresh_counters(trace_path, num_device):
+    """
+    トレースより新しく、今の .statconfig と同じ計測区間で数えたカウンタがあればそれ、無ければ None。
+    トレースが削除・圧縮済みで無ければ解析し直せないので、保存されているカウンタをそのまま使う
+    """
+    sidecar = counters_path(trace_path)
+    if not os.path.exists(sidecar):
+        return None
+    counters, window = load_counters(sidecar, num_device)
+    actual = find_trace(trace_path)
+    if actual is None:
+        return counters
+    if os.path.getmtime(sidecar) < os.path.getmtime(actual) or window != measure_window(trace_path):
+        return None
+    return counters
+
+
+def load_run_counters(trace_path, num_device):
+    """ランのカウンタを返す (load_fresh_counters があればそれ、無ければトレースを解析する)"""
+    counters = load_fresh_counters(trace_path, num_device)
+    if counters is not None:
+        return counters
+    return parse_trace_counters(trace_path, num_device, window=measure_window(trace_path))
+
+
+def load_run_per(trace_path, num_device):
+    """ランの上り・下り PER を返す (load_run_counters のカウンタから計算する)"""
+    return per_from_counters(load_run_counters(trace_path, num_device))
+
+
+def _parse_run(trace_path, num_device, byte_range=None):
+    start = time.perf_counter()
+    if byte_range is None:
+        counters = load_run_counters(trace_path, num_device)
+    else:
+        counters = parse_trace_counters(trace_path, num_device, byte_range=byte_range, window=measure_window(trace_path))
+    return counters_array(counters), time.perf_counter() - start
+
+
+def _run_ranges(trace_path, num_device, parts):
+    """ランを何個のバイト範囲に分けて解析するか ([None] なら分けずに load_run_counters)"""
+    if parts <= 1 or load_fresh_counters(trace_path, num_device) is not None:
+        return [None]
+    actual = find_trace(trace_path)
+    if actual is None:
+        return [None]
+    return split_trace(actual, parts, MIN_RANGE_BYTES)
+
+
+def parse_runs(trace_paths, num_device, workers=1, verbose=True, cache=None):
+    """
+    複数ランのカウンタをプロセスプールで並列に求める。
+    戻り値: (len(trace_paths), len(COUNTER_NAMES), 3 * num_device) の int64 配列。
+    行は trace_paths の順 (完了順ではない) なので、並列数によらず同じ結果になる。
+    ファイル数が workers より少なければ、大きなトレースはバイト範囲に分けて並列に数える。
+    cache (counters_cache.CountersCache) を渡すと、指紋が一致するランは解析せずにそれを使い、
+    解析したランはキャッシュに加える (保存は呼び出し側で cache.save())。
+    """
+    out = np.zeros((len(trace_paths), len(COUNTER_NAMES), 3 * num_device), dtype=np.int64)
+    start = time.perf_counter()
+    total = 0.0
+
+    keys = [None] * len(trace_paths)
+    todo = []
+    for i, path in enumerate(trace_paths):
+        if cache is not None:
+            keys[i] = cache.key(path)
+            cached = cache.get(path, keys[i]) if keys[i] is not None else None
+            if cached is not None:
+                out[i] = cached
+                continue
+        todo.append(i)
+    if verbose and cache is not None:
+        print(f"  {len(trace_paths) - len(todo)} of {len(trace_paths)} runs found in the counters cache")
+
+    parts_per_run = -(-workers // len(todo)) if todo else 1
+    tasks = [(i, byte_range) for i in todo for byte_range in _run_ranges(trace_paths[i], num_device, parts_per_run)]
+    remaining = collections.Counter(i for i, _ in tasks)
+    elapsed_by_run = collections.Counter()
+    done = 0
+
+    def finish(i, array, elapsed):
+        nonlocal total, done
+        out[i] += array
+        total += elapsed
+        elapsed_by_run[i] += elapsed
+        remaining[i] -= 1
+        if remaining[i]:
+            return
+        done += 1
+        if cache is not None and keys[i] is not None:
+            cache.put(trace_paths[i], keys[i], out[i].copy())
+        if verbose:
+            print(f"  [{done}/{len(todo)}] parsed {os.path.basename(trace_paths[i])} "
+                  f"({elapsed_by_run[i]:.2f} s)", flush=True)
+
+    if workers <= 1 or len(tasks) <= 1:
+        for i, byte_range in tasks:
+            finish(i, *_parse_run(trace_paths[i], num_device, byte_range))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            futures = {executor.submit(_parse_run, trace_paths[i], num_device, byte_range): i
+                       for i, byte_range in tasks}
+            for future in as_completed(futures):
+                finish(futures[future], *future.result())
+    if verbose and todo:
+        print(f"Parsed {len(todo)} traces ({len(tasks)} tasks) with {max(1, min(workers, len(tasks)))} workers: "
+              f"{time.perf_counter() - start:.1f} s (sum of per-task {total:.1f} s)")
+    return out
+
+
+def parse_trace_counters_parallel(filepath, num_device, workers):
+    """
+    1つのトレースをバイト範囲に分けて workers プロセスで数える
+    (parse_trace_counters(window=measure_window(filepath)) と同じ結果)
+    """
+    return counters_dict(parse_runs([filepath], num_device, workers, verbose=False)[0])
+
+
+def has_run_result(trace_path):
+    """トレース (圧縮済みを含む) かカウンタのどちらかがあれば True"""
+    return find_trace(trace_path) is not None or os.path.exists(counters_path(trace_path))
+
+
+def reduce_run(trace_path, num_device, trace_action="keep", parse=True, bin_sec=None):
+    """
+    完了したランのトレースをカウンタに集約して保存し (parse=True のとき)、
+    bin_sec を指定すると計測区間のビンごとのカウンタも保存する。
+    trace_action に従ってトレースを削除・圧縮する。
+    戻り値: (トレースの大きさ [bytes], 処理時間 [s])
+    """
+    start = time.perf_counter()
+    size = os.path.getsize(trace_path)
+    if parse:
+        window = measure_window(trace_path)
+        if bin_sec and window is not None:
+            counters, binned, bins = parse_trace_timeline(trace_path, num_device, bin_sec, window)
+            save_counters(counters_path(trace_path), counters, num_device, window, binned, bins)
+        else:
+            counters = parse_trace_counters(trace_path, num_device, window=window)
+            save_counters(counters_path(trace_path), counters, num_device, window)
+    if trace_action == "delete":
+        os.remove(trace_path)
+    elif trace_action in COMPRESSIONS:
+        compress_trace(trace_path, trace_action)
+    return size, time.perf_counter() - start
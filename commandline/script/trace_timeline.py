@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+計測区間内の時間変化 (時間ビンごとの PER / スループット) の表示
+
+機能:
+- ランのトレースを1回読み、計測区間 (.statconfig の INF_TIME) を --bin-sec 秒ごとに分けて
+  PAN ごとの上り・下り PER とスループット [frames/s] を表示する。
+- run_simulations.py --parse --bin-sec で同じビン幅のカウンタが保存済みなら、トレースを読まずにそれを使う。
+- --plot で時間変化のグラフを plots/ に保存する。
+
+実行方法 (commandline/ で実行):
+    python3 ./script/trace_timeline.py interf_coord_dist_1200m_off_load0.5_seed0.trace --bin-sec 5
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from trace_io import find_trace
+from trace_parser import counters_path, load_timeline, measure_window, parse_trace_timeline
+
+# --- Configuration ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PLOT_OUTPUT_DIR = os.path.join(SCRIPT_DIR, "..", "plots")
+DEFAULT_NUM_DEVICE = 12  # interference_2pan_plot_results.py の NUM_DEV_GROUP
+
+
+def load_or_parse_timeline(trace_path, num_device, bin_sec):
+    """
+    保存済みのビンごとのカウンタ (ビン幅が同じもの) があればそれ、無ければトレースを解析する。
+    .statconfig の計測区間が保存時と変わっていれば、トレースがある限り解析し直す
+    """
+    binned, bins, window = load_timeline(counters_path(trace_path), num_device)
+    exists = find_trace(trace_path) is not None
+    if (binned is not None and np.allclose(np.diff(bins), bin_sec)
+            and (not exists or window == measure_window(trace_path))):
+        return binned, bins
+    if not exists:
+        raise FileNotFoundError(f"trace not found: {trace_path}")
+    return parse_trace_timeline(trace_path, num_device, bin_sec)[1:]
+
+
+def pan_timeline(binned, bins, num_device):
+    """ビンごとの PAN 別の上り・下り PER とスループット [frames/s]"""
+    width = np.diff(bins)
+    pans = (slice(3, num_device + 3), slice(num_device + 3, 3 * num_device))
+    rows = {}
+    for pan, devices in enumerate(pans, 1):
+        up_sent = binned["device_dequeued"][:, devices].sum(axis=1)
+        up_received = binned["coordinator_receive"][:, devices].sum(axis=1)
+        down_sent = binned["coordinator_dequeued"][:, devices].sum(axis=1)
+        down_received = binned["device_receive"][:, devices].sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rows[f"pan{pan}_up_per"] = np.where(up_sent > 0, 1.0 - up_received / up_sent, np.nan)
+            rows[f"pan{pan}_down_per"] = np.where(down_sent > 0, 1.0 - down_received / down_sent, np.nan)
+        rows[f"pan{pan}_up_tput"] = up_received / width
+        rows[f"pan{pan}_down_tput"] = down_received / width
+    return rows
+
+
+def print_timeline(trace_path, rows, bins):
+    print(f"\n{trace_path}")
+    names = list(rows)
+    print(f"{'t [s]':>13} " + " ".join(f"{name:>15}" for name in names))
+    for i in range(len(bins) - 1):
+        values = " ".join(f"{rows[name][i]:>15.3f}" for name in names)
+        print(f"{bins[i]:>6.1f}-{bins[i + 1]:<6.1f} {values}")
+
+
+def plot_timeline(trace_path, rows, bins):
+    import matplotlib.pyplot as plt
+
+    centers = (bins[:-1] + bins[1:]) / 2.0
+    plt.figure(figsize=(10, 6))
+    for name, values in rows.items():
+        if name.endswith("_per"):
+            plt.plot(centers, values, marker="o", label=name)
+    plt.xlabel("Time [s]")
+    plt.ylabel("PER")
+    plt.title(os.path.basename(trace_path))
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    os.makedirs(PLOT_OUTPUT_DIR, exist_ok=True)
+    filename = os.path.splitext(os.path.basename(trace_path))[0] + "_timeline.png"
+    plt.savefig(os.path.join(PLOT_OUTPUT_DIR, filename), dpi=150)
+    plt.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="計測区間内の時間ビンごとの PER / スループットを表示する")
+    parser.add_argument("traces", nargs="+", help="ランのトレース (.trace。圧縮済み・カウンタのみでもよい)")
+    parser.add_argument("--bin-sec", type=float, default=1.0, help="時間ビンの幅 [s]")
+    parser.add_argument("--num-device", type=int, default=DEFAULT_NUM_DEVICE, help="PAN あたりのデバイス数")
+    parser.add_argument("--plot", action="store_true", help="時間変化のグラフを plots/ に保存する")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for trace_path in args.traces:
+        try:
+            binned, bins = load_or_parse_timeline(trace_path, args.num_device, args.bin_sec)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        rows = pan_timeline(binned, bins, args.num_device)
+        print_timeline(trace_path, rows, bins)
+        if args.plot:
+            plot_timeline(trace_path, rows, bins)
+
+
+if __name__ == "__main__":
+    main()